@@ -0,0 +1,250 @@
+"""
+Admission control: shed excess calls with ``RESOURCE_EXHAUSTED`` before
+they queue.
+
+gRPC queues every call it cannot run yet without bound.  Past saturation
+the threaded server's 10 executor threads fall further and further behind
+and every caller waits; the asyncio server piles coroutines onto the
+database pool instead.  ``AdmissionController`` measures how loaded the
+server is as a ``pressure`` between 0 and 1 (and over), the highest of:
+
+- calls being handled / ``ADMISSION_MAX_IN_FLIGHT``
+- calls queued for an executor thread / ``ADMISSION_MAX_QUEUE`` (threaded)
+- callers waiting for a database connection / ``ADMISSION_MAX_POOL_WAITERS``
+
+and each call is admitted only while the pressure is below the share of
+its method's priority class: with the default shares ``1.0,0.75,0.5``,
+``ListPolls`` (class 2) is turned away once the server is half loaded,
+while votes (class 0) still get the rest.  Priorities come from
+``ADMISSION_PRIORITIES`` (``Method=class,...``, merged over
+``DEFAULT_PRIORITIES``); ``exempt`` methods are neither counted nor shed.
+``WatchPollResults`` is exempt by default: its streams are idle most of
+their life and have their own cap (``WATCH_MAX_STREAMS``).
+
+The decision is made when the call arrives.  A shed call is still answered
+by an executor thread (threaded mode), but only to send the status, which
+takes microseconds instead of the call's whole handling time.
+"""
+
+import os
+import threading
+
+import grpc
+
+from metrics import rebuild_handler
+from shedding import OVERLOADED
+
+EXEMPT = "exempt"
+DEFAULT_PRIORITIES = {
+    "CastVote": 0,
+    "BulkCastVote": 0,
+    "ClosePoll": 0,
+    "CreatePoll": 1,
+    "GetPollResults": 1,
+    "ListPolls": 2,
+    "StreamPolls": 2,
+    "WatchPollResults": EXEMPT,
+}
+DEFAULT_SHARES = (1.0, 0.75, 0.5)
+
+
+def parse_priorities(value):
+    """``"CastVote=0,ListPolls=exempt"`` -> ``{"CastVote": 0, "ListPolls": "exempt"}``."""
+    priorities = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        method, _, priority = item.partition("=")
+        priority = priority.strip()
+        priorities[method.strip()] = EXEMPT if priority == EXEMPT else int(priority)
+    return priorities
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight=0, priorities=None, shares=DEFAULT_SHARES, default_priority=1):
+        self.max_in_flight = max_in_flight
+        self.priorities = dict(DEFAULT_PRIORITIES, **(priorities or {}))
+        self.shares = tuple(shares)
+        self.default_priority = default_priority
+
+        self._lock = threading.Lock()
+        self._signals = []       ## (name, value fn, limit)
+        self._in_flight = 0
+        self._admitted = [0] * len(self.shares)
+        self._rejected = [0] * len(self.shares)
+
+    @classmethod
+    def from_env(cls, max_in_flight=200):
+        return cls(
+            max_in_flight=int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", max_in_flight)),
+            priorities=parse_priorities(os.environ.get("ADMISSION_PRIORITIES")),
+            shares=[float(s) for s in os.environ.get("ADMISSION_SHARES", ",".join(map(str, DEFAULT_SHARES))).split(",")],
+        )
+
+    def add_signal(self, name, fn, limit):
+        """Count ``fn()`` against ``limit`` in the pressure (a limit of 0 leaves it out)."""
+        if limit > 0:
+            self._signals.append((name, fn, limit))
+
+    def add_env_signal(self, name, fn, env, default):
+        self.add_signal(name, fn, int(os.environ.get(env, default)))
+
+    @property
+    def enabled(self):
+        return self.max_in_flight > 0 or bool(self._signals)
+
+    def priority(self, method):
+        """Priority class of ``/package.Service/Method``, or ``EXEMPT``."""
+        priority = self.priorities.get(method.rpartition("/")[2], self.default_priority)
+        if priority == EXEMPT:
+            return EXEMPT
+        return min(priority, len(self.shares) - 1)
+
+    def pressure(self):
+        ## signals are read without the lock, an instant's skew doesn't matter here
+        pressure = self._in_flight / self.max_in_flight if self.max_in_flight > 0 else 0.0
+        for _, fn, limit in self._signals:
+            pressure = max(pressure, fn() / limit)
+        return pressure
+
+    def admit(self, priority):
+        """True if a call of ``priority`` that just arrived may run."""
+        if priority == EXEMPT:
+            return True
+        admitted = self.pressure() < self.shares[priority]
+        with self._lock:
+            if admitted:
+                self._admitted[priority] += 1
+            else:
+                self._rejected[priority] += 1
+        return admitted
+
+    ## counted from the handler starting, not from admit(): gRPC never runs
+    ## the handler of a call cancelled while it was queued
+    def enter(self):
+        with self._lock:
+            self._in_flight += 1
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self):
+        pressure = self.pressure()
+        with self._lock:
+            stats = {"in_flight": self._in_flight, "pressure": pressure,
+                     "admitted": sum(self._admitted), "rejected": sum(self._rejected)}
+            for priority in range(len(self.shares)):
+                stats[f"admitted_p{priority}"] = self._admitted[priority]
+                stats[f"rejected_p{priority}"] = self._rejected[priority]
+        for name, fn, _ in self._signals:
+            stats[name] = fn()
+        return stats
+
+
+def _rejecting_handler(handler):
+    """``handler`` answering ``RESOURCE_EXHAUSTED`` without running the servicer."""
+    def wrap(behavior, streaming_response):
+        if streaming_response:
+            def reject_stream(request, context):
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, OVERLOADED)
+                yield
+            return reject_stream
+
+        def reject(request, context):
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, OVERLOADED)
+        return reject
+
+    return rebuild_handler(handler, wrap)
+
+
+def _async_rejecting_handler(handler):
+    def wrap(behavior, streaming_response):
+        if streaming_response:
+            async def reject_stream(request, context):
+                await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, OVERLOADED)
+                yield
+            return reject_stream
+
+        async def reject(request, context):
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, OVERLOADED)
+        return reject
+
+    return rebuild_handler(handler, wrap)
+
+
+class AdmissionInterceptor(grpc.ServerInterceptor):
+    """Threaded server: decides when the call arrives, before it waits for an executor thread."""
+
+    def __init__(self, controller):
+        self.controller = controller
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        priority = self.controller.priority(handler_call_details.method)
+        if priority == EXEMPT:
+            return handler
+        if not self.controller.admit(priority):
+            return _rejecting_handler(handler)
+        enter, release = self.controller.enter, self.controller.release
+
+        def wrap(behavior, streaming_response):
+            if streaming_response:
+                def stream(request, context):
+                    enter()
+                    try:
+                        yield from behavior(request, context)
+                    finally:
+                        release()
+                return stream
+
+            def unary(request, context):
+                enter()
+                try:
+                    return behavior(request, context)
+                finally:
+                    release()
+            return unary
+
+        return rebuild_handler(handler, wrap)
+
+
+class AsyncAdmissionInterceptor(grpc.aio.ServerInterceptor):
+    """asyncio server: the same decision; there is no executor queue to measure."""
+
+    def __init__(self, controller):
+        self.controller = controller
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        priority = self.controller.priority(handler_call_details.method)
+        if priority == EXEMPT:
+            return handler
+        if not self.controller.admit(priority):
+            return _async_rejecting_handler(handler)
+        enter, release = self.controller.enter, self.controller.release
+
+        def wrap(behavior, streaming_response):
+            if streaming_response:
+                async def stream(request, context):
+                    enter()
+                    try:
+                        async for response in behavior(request, context):
+                            yield response
+                    finally:
+                        release()
+                return stream
+
+            async def unary(request, context):
+                enter()
+                try:
+                    return await behavior(request, context)
+                finally:
+                    release()
+            return unary
+
+        return rebuild_handler(handler, wrap)
@@ -0,0 +1,517 @@
+"""
+asyncio (grpc.aio) server mode.
+
+The threaded server runs every RPC on one of ``MAX_WORKERS`` executor threads
+and blocks that thread on psycopg2 I/O, so at most ``MAX_WORKERS`` calls are
+in flight per node.  Here the servicers are coroutines on an asyncpg pool:
+an RPC waiting on the database only parks a coroutine, so one process keeps
+thousands of calls in flight while the pool bounds the database backends.
+
+Enabled with ``GRPC_SERVER_MODE=aio``; the threaded mode stays the default.
+"""
+
+import asyncio
+import os
+import signal
+import uuid as uuid_lib
+
+import asyncpg
+import grpc
+
+import polling_pb2
+import polling_pb2_grpc
+import pagination
+import tally_shards
+import tracing
+import deadlines
+from admission import AdmissionController, AsyncAdmissionInterceptor
+from duplicate_filter import KNOWN, SAMPLE, DuplicateVoteFilter
+from final_results import FinalResultsCache
+from deadlines import AsyncDeadlineInterceptor, BudgetedPool
+from metrics import AsyncMetricsInterceptor, RpcMetrics, TimedPool, metrics_port, phase, start_http_server
+from option_ids import MAX_OPTIONS, resolve_vote, result_fields, tally_counts
+from poll_cache import PollMetadataCache
+from replica_router import PRIMARY_LSN_SQL, AsyncReplicaRouter, parse_lsn, parse_replica_hosts
+from results_cache import ResultsCache
+from results_watch import PENDING_CALL_OPTIONS, AsyncResultsWatchHub, WatchLimitExceeded
+from tracing import Tracer
+from vote_batcher import DUPLICATE, POLL_CLOSED, VOTED, vote_outcomes
+
+
+BULK_VOTE_CHUNK = int(os.environ.get("BULK_VOTE_CHUNK", 1000))
+BULK_VOTE_MAX = int(os.environ.get("BULK_VOTE_MAX", 100000))
+
+## same statement as the threaded server's VoteBatcher, asyncpg placeholders
+INSERT_VOTES_SQL = """
+    WITH open_polls AS (
+        SELECT uuid FROM poll WHERE uuid = ANY($3::uuid[]) AND status = 'open' FOR SHARE
+    ), inserted AS (
+        INSERT INTO vote (userID, option_id, uuid)
+        SELECT v.userID, v.option_id, v.uuid
+        FROM unnest($1::text[], $2::smallint[], $3::uuid[]) AS v(userID, option_id, uuid)
+        JOIN open_polls USING (uuid)
+        ON CONFLICT (uuid, userID) DO NOTHING
+        RETURNING uuid, userID
+    )
+    SELECT uuid, userID FROM inserted
+    UNION ALL
+    SELECT uuid, NULL FROM open_polls
+"""
+TALLY_SQL = "SELECT option_id, SUM(votes)::bigint FROM vote_tally WHERE uuid = $1 GROUP BY option_id"
+
+
+async def insert_votes(conn, votes):
+    """Write ``(poll_uuid, user_id, option_id)`` votes in one statement -> one vote_batcher outcome each."""
+    rows = await conn.fetch(
+        INSERT_VOTES_SQL,
+        [user_id for _, user_id, _ in votes],
+        [option_id for _, _, option_id in votes],
+        [poll_uuid for poll_uuid, _, _ in votes],
+    )
+    return vote_outcomes([(str(uuid_lib.UUID(poll_uuid)), user_id) for poll_uuid, user_id, _ in votes], rows)
+
+
+def _with_deadline(kwargs):
+    if kwargs.get("timeout") is None:
+        kwargs["timeout"] = deadlines.time_left()
+    return kwargs
+
+
+class TimedConnection(asyncpg.Connection):
+    """
+    Counts queries as the running RPC's ``db`` phase (metrics.py).  Only the
+    public methods: asyncpg's own type introspection runs inside them.
+    Cursor fetches (``StreamPolls``) are left in ``app``.
+
+    Each query gets the call's time left as its ``timeout`` (deadlines.py);
+    asyncpg cancels it on the server when that runs out.
+    """
+
+    async def execute(self, query, *args, **kwargs):
+        with phase("db", statement=query):
+            return await super().execute(query, *args, **_with_deadline(kwargs))
+
+    async def executemany(self, command, *args, **kwargs):
+        with phase("db", statement=command):
+            return await super().executemany(command, *args, **_with_deadline(kwargs))
+
+    async def fetch(self, query, *args, **kwargs):
+        with phase("db", statement=query):
+            return await super().fetch(query, *args, **_with_deadline(kwargs))
+
+    async def fetchrow(self, query, *args, **kwargs):
+        with phase("db", statement=query):
+            return await super().fetchrow(query, *args, **_with_deadline(kwargs))
+
+    async def fetchval(self, query, *args, **kwargs):
+        with phase("db", statement=query):
+            return await super().fetchval(query, *args, **_with_deadline(kwargs))
+
+
+async def create_db_pool(db_config, **overrides):
+    options = dict(
+        min_size=int(os.environ.get("AIO_DB_POOL_MIN", 1)),
+        max_size=int(os.environ.get("AIO_DB_POOL_SIZE", 20)),
+        ## recycle connections that sat idle, they may be dead after a DB restart
+        max_inactive_connection_lifetime=float(os.environ.get("DB_POOL_HEALTH_CHECK", 30)),
+    )
+    options.update(overrides)
+    ## acquire waits and queries are timed into the RPC they run for (metrics.py),
+    ## and limited to its deadline (deadlines.py)
+    return BudgetedPool(TimedPool(await asyncpg.create_pool(
+        database=db_config["dbname"],
+        user=db_config["user"],
+        password=db_config["password"],
+        host=db_config["host"],
+        port=db_config["port"],
+        connection_class=TimedConnection,
+        **options,
+    )))
+
+
+async def create_replica_router(pool, db_config):
+    replicas = {}
+    for host, port in parse_replica_hosts(os.environ.get("DB_REPLICA_HOSTS", "db-replica")):
+        ## min_size=0: a replica that is down must not stop the server from starting
+        replicas[f"{host}:{port}"] = await create_db_pool(
+            dict(db_config, host=host, port=port), min_size=0,
+            timeout=float(os.environ.get("DB_REPLICA_CONNECT_TIMEOUT", 2)),
+        )
+    return AsyncReplicaRouter(
+        pool, replicas,
+        max_lag=float(os.environ.get("REPLICA_MAX_LAG", 1.0)),
+        check_interval=float(os.environ.get("REPLICA_CHECK_INTERVAL", 1.0)),
+    ).start()
+
+
+def invalid_token(context, error):
+    context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+    context.set_details(str(error))
+
+
+async def fetch_poll_meta(pool, poll_cache, poll_uuid):
+    meta = poll_cache.get(poll_uuid)
+    if meta is not None:
+        return meta
+    with tracing.span("poll_meta.load"):
+        async with pool.acquire() as conn:
+            data = await conn.fetchrow("SELECT poll_questions, status, options FROM poll WHERE uuid=$1", poll_uuid)
+    if data is None:
+        return None
+    return poll_cache.put(poll_uuid, *data)
+
+
+class AsyncPollServiceImpl(polling_pb2_grpc.PollServiceServicer):
+
+    def __init__(self, pool, router, results_cache, poll_cache, final_cache, dup_filter):
+        self.pool = pool
+        self.router = router
+        self.results_cache = results_cache
+        self.poll_cache = poll_cache
+        self.final_cache = final_cache
+        self.dup_filter = dup_filter
+
+    async def CreatePoll(self, request, context):
+        if len(request.options) > MAX_OPTIONS:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"at most {MAX_OPTIONS} options per poll")
+            return polling_pb2.PollResponse()
+        async with self.pool.acquire() as conn:
+            i = await conn.fetchrow(
+                "INSERT INTO poll (poll_questions, options, tally_shards) VALUES ($1, $2, $3) RETURNING uuid, poll_questions, options, status, create_at_time",
+                request.poll_questions, list(request.options), tally_shards.shard_count(request.tally_shards),
+            )
+            ## statements outside a transaction commit on their own, this runs after
+            token = await conn.fetchval(PRIMARY_LSN_SQL)
+        self.poll_cache.put(str(i[0]), i[1], i[3], i[2])
+        return polling_pb2.PollResponse(uuid=str(i[0]), poll_questions=i[1], options=i[2], status=i[3], create_at_time=str(i[4]),
+                                        consistency_token=token)
+
+    async def ListPolls(self, request, context):
+        limit = pagination.page_size(request.page_size)
+        where, params = "", []
+        if request.page_token:
+            try:
+                created, last_uuid = pagination.decode_page_token(request.page_token)
+            except ValueError as e:
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                context.set_details(str(e))
+                return polling_pb2.ListPollsResponse()
+            where, params = "WHERE (create_at_time, uuid) < ($1, $2::uuid)", [created, last_uuid]
+
+        async def fetch_page(conn):
+            return await conn.fetch(
+                f"SELECT uuid, poll_questions, options, status, create_at_time FROM poll {where} "
+                f"ORDER BY create_at_time DESC, uuid DESC LIMIT {limit + 1}",
+                *params,
+            )
+
+        try:
+            polls_data = await self.router.read(fetch_page, request.consistency_token)
+        except ValueError as e:
+            invalid_token(context, e)
+            return polling_pb2.ListPollsResponse()
+        next_page_token = ""
+        if len(polls_data) > limit:
+            polls_data = polls_data[:limit]
+            next_page_token = pagination.encode_page_token(polls_data[-1][4], polls_data[-1][0])
+        polls_list = [polling_pb2.PollResponse(uuid=str(r[0]), poll_questions=r[1], options=r[2], status=r[3], create_at_time=str(r[4])) for r in polls_data]
+        return polling_pb2.ListPollsResponse(polls=polls_list, next_page_token=next_page_token)
+
+    async def StreamPolls(self, request, context):
+        chunk = pagination.chunk_size(request.chunk_size)
+        try:
+            pool = self.router.read_pool(request.consistency_token)
+        except ValueError as e:
+            invalid_token(context, e)
+            return
+        async with pool.acquire() as conn:
+            ## asyncpg cursors live inside a transaction and prefetch `chunk` rows at a time
+            async with conn.transaction(readonly=True):
+                async for r in conn.cursor(
+                    "SELECT uuid, poll_questions, options, status, create_at_time FROM poll "
+                    "ORDER BY create_at_time DESC, uuid DESC",
+                    prefetch=chunk,
+                ):
+                    yield polling_pb2.PollResponse(uuid=str(r[0]), poll_questions=r[1], options=r[2], status=r[3], create_at_time=str(r[4]))
+
+    async def ClosePoll(self, request, context):
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                ## waits for votes in flight on this poll and holds off new ones, so
+                ## the tally read next is final (see final_results.py)
+                options = await conn.fetchval("SELECT options FROM poll WHERE uuid=$1 FOR UPDATE", request.uuid)
+                if options is None:
+                    context.set_code(grpc.StatusCode.NOT_FOUND)
+                    context.set_details("poll not found")
+                    return polling_pb2.PollResponse()
+                counts = tally_counts(len(options), await conn.fetch(TALLY_SQL, request.uuid))
+                ## closing twice keeps the first snapshot
+                data = await conn.fetchrow(
+                    "UPDATE poll SET status = 'close', final_results = COALESCE(final_results, $2::bigint[]) WHERE uuid=$1 "
+                    "RETURNING uuid, poll_questions, options, status, create_at_time, final_results",
+                    request.uuid, counts,
+                )
+            token = await conn.fetchval(PRIMARY_LSN_SQL)
+        self.poll_cache.put(request.uuid, data[1], data[3], data[2])
+        self.results_cache.invalidate(request.uuid)
+        self.final_cache.put(request.uuid, data[1], data[2], data[5])
+        self.dup_filter.drop(request.uuid)
+        return polling_pb2.PollResponse(
+            uuid=str(data[0]),
+            poll_questions=data[1],
+            options=data[2],
+            status=data[3],
+            create_at_time=str(data[4]),
+            consistency_token=token,
+        )
+
+
+class AsyncVoteServiceImpl(polling_pb2_grpc.VoteServiceServicer):
+
+    def __init__(self, pool, results_cache, poll_cache, dup_filter):
+        self.pool = pool
+        self.results_cache = results_cache
+        self.poll_cache = poll_cache
+        self.dup_filter = dup_filter
+        ## newest token handed out, for replies that skip the database
+        self.commit_lsn = ""
+
+    def _advance(self, token):
+        if token and (not self.commit_lsn or parse_lsn(token) > parse_lsn(self.commit_lsn)):
+            self.commit_lsn = token
+        return token
+
+    async def CastVote(self, request, context):
+        meta = await fetch_poll_meta(self.pool, self.poll_cache, request.uuid)
+        option_id, rejected = resolve_vote(meta, request)
+        if rejected:
+            return polling_pb2.VoteResponse(status=rejected)
+        seen = self.dup_filter.lookup(request.uuid, request.userID)
+        if seen == KNOWN:
+            return polling_pb2.VoteResponse(status="duplicate_vote", consistency_token=self.commit_lsn)
+        with self.results_cache.writing((request.uuid,)):
+            async with self.pool.acquire() as conn:
+                outcome, = await insert_votes(conn, [(request.uuid, request.userID, option_id)])
+                ## a second round trip on purpose: pg_current_wal_lsn() in the INSERT itself is
+                ## read before its commit record is written, and a replica replayed only up to
+                ## there doesn't show the vote yet.  The threaded batcher reads it after commit too.
+                token = self._advance(await conn.fetchval(PRIMARY_LSN_SQL))
+            if outcome == VOTED:
+                self.results_cache.apply_vote(request.uuid, option_id)
+        if outcome == POLL_CLOSED:
+            ## closed on the other node since the metadata was cached
+            self.poll_cache.put(request.uuid, meta.question, 'close', meta.options)
+            self.dup_filter.drop(request.uuid)
+            return polling_pb2.VoteResponse(status="Poll Closed", consistency_token=token)
+        self.dup_filter.record(request.uuid, request.userID, inserted=outcome == VOTED, sampled=seen == SAMPLE)
+        if outcome == DUPLICATE:
+            return polling_pb2.VoteResponse(status="duplicate_vote", consistency_token=token)
+        return polling_pb2.VoteResponse(status="Vote Successfully!", consistency_token=token)
+
+    async def BulkCastVote(self, request_iterator, context):
+        statuses, chunk, metas, token = [], [], {}, self.commit_lsn
+        async for request in request_iterator:
+            if len(statuses) + len(chunk) >= BULK_VOTE_MAX:
+                context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+                context.set_details(f"at most {BULK_VOTE_MAX} votes per BulkCastVote call")
+                return polling_pb2.BulkCastVoteResponse()
+            chunk.append(request)
+            if len(chunk) >= BULK_VOTE_CHUNK:
+                chunk_statuses, token = await self._cast_chunk(chunk, metas, token)
+                statuses += chunk_statuses
+                chunk = []
+        chunk_statuses, token = await self._cast_chunk(chunk, metas, token)
+        statuses += chunk_statuses
+        return polling_pb2.BulkCastVoteResponse(
+            results=[polling_pb2.VoteResponse(status=status) for status in statuses],
+            accepted=statuses.count("Vote Successfully!"),
+            consistency_token=token,
+        )
+
+    async def _cast_chunk(self, chunk, metas, token):
+        """Statuses for ``chunk`` and the consistency token after its insert."""
+        statuses, valid = [], []
+        for i, request in enumerate(chunk):
+            if request.uuid not in metas:
+                metas[request.uuid] = await fetch_poll_meta(self.pool, self.poll_cache, request.uuid)
+            option_id, rejected = resolve_vote(metas[request.uuid], request)
+            if not rejected:
+                seen = self.dup_filter.lookup(request.uuid, request.userID)
+                if seen == KNOWN:
+                    rejected = "duplicate_vote"
+                else:
+                    valid.append((i, option_id, seen == SAMPLE))
+            statuses.append(rejected)
+        if not valid:
+            return statuses, token
+        with self.results_cache.writing({chunk[i].uuid for i, _, _ in valid}):
+            async with self.pool.acquire() as conn:
+                outcomes = await insert_votes(conn, [(chunk[i].uuid, chunk[i].userID, option_id) for i, option_id, _ in valid])
+                ## after the commit, as in CastVote
+                token = self._advance(await conn.fetchval(PRIMARY_LSN_SQL))
+            for (i, option_id, _), outcome in zip(valid, outcomes):
+                if outcome == VOTED:
+                    self.results_cache.apply_vote(chunk[i].uuid, option_id)
+        for (i, option_id, sampled), outcome in zip(valid, outcomes):
+            if outcome == POLL_CLOSED:
+                statuses[i] = "Poll Closed"
+                continue
+            self.dup_filter.record(chunk[i].uuid, chunk[i].userID, inserted=outcome == VOTED, sampled=sampled)
+            statuses[i] = "duplicate_vote" if outcome == DUPLICATE else "Vote Successfully!"
+        return statuses, token
+
+
+class AsyncResultServiceImpl(polling_pb2_grpc.ResultServiceServicer):
+
+    def __init__(self, pool, router, results_cache, poll_cache, final_cache, watch_hub):
+        self.pool = pool
+        self.router = router
+        self.results_cache = results_cache
+        self.poll_cache = poll_cache
+        self.final_cache = final_cache
+        self.watch_hub = watch_hub
+
+    async def GetPollResults(self, request, context):
+        ## a closed poll's results can't change, whatever the consistency token
+        cached = self.final_cache.get(request.uuid)
+        if cached is None:
+            ## a consistency token asks for a database read that has seen that write
+            cached = None if request.consistency_token else self.results_cache.get(request.uuid)
+        if cached is not None:
+            question, options, counts = cached
+            return polling_pb2.PollResultResponse(uuid=request.uuid, poll_questions=question,
+                                                  **result_fields(options, counts, request.counts_only))
+
+        token = self.results_cache.load_token(request.uuid)
+        meta = await fetch_poll_meta(self.pool, self.poll_cache, request.uuid)
+        if meta is None:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details("Poll not found")
+            return polling_pb2.PollResultResponse()
+        if not meta.is_open:
+            final = await self.fetch_final_results(request)
+            if final is not None:
+                self.final_cache.put(request.uuid, meta.question, meta.options, final)
+                return polling_pb2.PollResultResponse(uuid=request.uuid, poll_questions=meta.question,
+                                                      **result_fields(meta.options, final, request.counts_only))
+
+        async def fetch_tally(conn):
+            return await conn.fetch(TALLY_SQL, request.uuid)
+
+        try:
+            ## served by a replica unless none is fresh enough
+            vote_counts, on_primary = await self.router.read_with_source(fetch_tally, request.consistency_token)
+        except ValueError as e:
+            invalid_token(context, e)
+            return polling_pb2.PollResultResponse()
+        question = meta.question
+        counts = tally_counts(len(meta.options), vote_counts)
+        ## a replica may not have replayed votes this node already counted into
+        ## the cache; votes bump entries in place, so such an entry stays short
+        if on_primary:
+            self.results_cache.put(request.uuid, question, meta.options, counts, token)
+        return polling_pb2.PollResultResponse(uuid=request.uuid, poll_questions=question,
+                                              **result_fields(meta.options, counts, request.counts_only))
+
+    async def fetch_final_results(self, request):
+        """The snapshot ClosePoll stored, None if this read can't see it yet."""
+        async def fetch(conn):
+            return await conn.fetchval("SELECT final_results FROM poll WHERE uuid = $1", request.uuid)
+
+        try:
+            return await self.router.read(fetch, request.consistency_token)
+        except ValueError:
+            ## malformed token: the tally read below reports it
+            return None
+
+    async def WatchPollResults(self, request, context):
+        meta = await fetch_poll_meta(self.pool, self.poll_cache, request.uuid)
+        if meta is None:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details("Poll not found")
+            return
+        try:
+            ## a cancelled client cancels this coroutine, which closes the generator
+            async for results in self.watch_hub.updates(request.uuid):
+                yield polling_pb2.PollResultResponse(uuid=request.uuid, poll_questions=meta.question, results=results)
+        except WatchLimitExceeded as e:
+            context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+            context.set_details(str(e))
+
+
+async def serve(port, db_config, name="gRPC Voting server"):
+    pool = await create_db_pool(db_config)
+    results_cache = ResultsCache.from_env()
+    poll_cache = PollMetadataCache.from_env()
+    final_cache = FinalResultsCache.from_env()
+    router = await create_replica_router(pool, db_config)
+    ## known voters per poll; rebuilt in the background, votes are served meanwhile
+    dup_filter = DuplicateVoteFilter.from_env()
+    preload = None
+    if os.environ.get("DUP_FILTER_PRELOAD", "1") == "1":
+        preload = asyncio.ensure_future(dup_filter.preload(router.read_pool()))
+    ## watch streams are just coroutines here, so no cap unless WATCH_MAX_STREAMS is set
+    watch_hub = AsyncResultsWatchHub(
+        pool,
+        interval=float(os.environ.get("WATCH_RESULTS_INTERVAL_MS", 500)) / 1000,
+        max_watchers=int(os.environ.get("WATCH_MAX_STREAMS", 0)),
+    ).start()
+
+    rpc_metrics = RpcMetrics()
+    rpc_metrics.registry.add_stats({
+        "db-pool": lambda: {"size": pool.get_size(), "idle": pool.get_idle_size(), "max_size": pool.get_max_size(),
+                            "waiting": pool.waiting},
+        "results-cache": results_cache.stats,
+        "poll-cache": poll_cache.stats,
+        "final-results": final_cache.stats,
+        "dup-filter": dup_filter.stats,
+        "results-watch": watch_hub.stats,
+        "replicas": router.stats,
+    })
+    tracer = Tracer.from_env(f"polling:{port}")
+    if tracer is not None:
+        rpc_metrics.registry.add_stats({"tracing": tracer.stats})
+
+    ## priority-aware shedding; coroutines are cheap, so the pool queue is what to watch
+    admission = AdmissionController.from_env(max_in_flight=2000)
+    admission.add_env_signal("pool_waiters", lambda: pool.waiting, "ADMISSION_MAX_POOL_WAITERS", 2 * pool.get_max_size())
+    interceptors = [AsyncMetricsInterceptor(rpc_metrics, tracer)]
+    if admission.enabled:
+        interceptors.append(AsyncAdmissionInterceptor(admission))
+        rpc_metrics.registry.add_stats({"admission": admission.stats})
+    ## stop working for calls whose client is gone or out of time
+    interceptors.append(AsyncDeadlineInterceptor())
+
+    ## 0 = no cap, otherwise excess calls fail fast with RESOURCE_EXHAUSTED
+    max_rpcs = int(os.environ.get("AIO_MAX_CONCURRENT_RPCS", 0)) or None
+    server = grpc.aio.server(maximum_concurrent_rpcs=max_rpcs, interceptors=interceptors,
+                             options=[("grpc.so_reuseport", 1)] + PENDING_CALL_OPTIONS)
+    polling_pb2_grpc.add_PollServiceServicer_to_server(AsyncPollServiceImpl(pool, router, results_cache, poll_cache, final_cache, dup_filter), server)
+    polling_pb2_grpc.add_VoteServiceServicer_to_server(AsyncVoteServiceImpl(pool, results_cache, poll_cache, dup_filter), server)
+    polling_pb2_grpc.add_ResultServiceServicer_to_server(AsyncResultServiceImpl(pool, router, results_cache, poll_cache, final_cache, watch_hub), server)
+
+    server.add_insecure_port(f'[::]:{port}')
+    await server.start()
+
+    print(f"{name} (asyncio) started on port {port}.")
+    ## scrapes are served from a thread, stats() only read counters
+    http_port = metrics_port(port)
+    if http_port:
+        start_http_server(rpc_metrics.registry, http_port)
+        print(f"Metrics on http://0.0.0.0:{http_port}/metrics")
+
+    ## drain in-flight RPCs on SIGTERM (docker stop / worker supervisor)
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, lambda: asyncio.ensure_future(server.stop(5)))
+    try:
+        await server.wait_for_termination()
+    finally:
+        await server.stop(5)
+        if preload is not None:
+            preload.cancel()
+        await watch_hub.stop()
+        await router.stop()
+        await pool.close()
+        if tracer is not None:
+            tracer.close()
@@ -0,0 +1,362 @@
+"""
+Thread-safe PostgreSQL connection pool shared by the gRPC servicers.
+
+Every RPC used to open its own psycopg2 connection (TCP + auth + backend
+fork) and close it again.  The pool keeps up to ``maxconn`` connections open
+and hands them out to the executor threads, so it should be sized to the
+server's ``ThreadPoolExecutor(max_workers=...)``.
+
+Connections are health checked on checkout and thrown away when they break,
+so the pool recovers on its own after the database restarts.
+
+Checkouts and the connections' statements are timed into the RPC they run
+for (``metrics.phase``): ``pool_wait`` and ``db``, and traced as spans.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+import deadlines
+from deadlines import DeadlineExceeded
+from metrics import completed_phase, phase
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became free within ``checkout_timeout``."""
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """
+    Counts statements and server-side cursor fetches as the RPC's ``db``
+    phase; a plain cursor's rows are already on the client.
+
+    Within an RPC, each statement is limited to the call's time left
+    (``SET LOCAL statement_timeout``, sent in the same round trip) and is
+    cancelled if the client cancels the call (deadlines.py).
+    """
+
+    @contextmanager
+    def _budgeted(self, query=None):
+        """
+        -> the query to send, with the call's statement timeout; raises
+        ``DeadlineExceeded`` if the call is already over.  Without a query
+        (a FETCH) the timeout set for the DECLARE still holds.
+        """
+        budget = deadlines.current()
+        if budget is None:
+            yield query
+            return
+        budget.check()
+        timeout_sql = budget.statement_timeout_sql() if query is not None else None
+        if timeout_sql is not None:
+            ## a plain cursor sends both in one round trip, psycopg2 wraps a
+            ## named cursor's query in DECLARE so it gets its own
+            if self.name is None and isinstance(query, str):
+                query = f"{timeout_sql}; {query}"
+            else:
+                cur = psycopg2.extensions.cursor(self.connection)
+                cur.execute(timeout_sql)
+                cur.close()
+        with budget.running(self.connection):
+            yield query
+
+    def execute(self, query, vars=None):
+        with phase("db", statement=query), self._budgeted(query) as query:
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with phase("db", statement=query), self._budgeted(query) as query:
+            return super().executemany(query, vars_list)
+
+    def fetchone(self):
+        if self.name is None:
+            return super().fetchone()
+        with phase("db", statement="FETCH"), self._budgeted():
+            return super().fetchone()
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        if self.name is None:
+            return super().fetchmany(size)
+        with phase("db", statement="FETCH"), self._budgeted():
+            return super().fetchmany(size)
+
+    def fetchall(self):
+        if self.name is None:
+            return super().fetchall()
+        with phase("db", statement="FETCH"), self._budgeted():
+            return super().fetchall()
+
+
+class TimedConnection(psycopg2.extensions.connection):
+    """Hands out ``TimedCursor``s and times commit / rollback."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cursor_factory = TimedCursor
+
+    def commit(self):
+        with phase("db", statement="COMMIT"):
+            return super().commit()
+
+    def rollback(self):
+        with phase("db", statement="ROLLBACK"):
+            return super().rollback()
+
+
+class DBConnectionPool:
+    def __init__(self, maxconn, minconn=0, checkout_timeout=30.0,
+                 health_check_interval=30.0, **conn_kwargs):
+        self.maxconn = maxconn
+        self.minconn = minconn
+        self.checkout_timeout = checkout_timeout
+        ## idle connections older than this get a "SELECT 1" before reuse
+        self.health_check_interval = health_check_interval
+        self._conn_kwargs = conn_kwargs
+
+        self._cond = threading.Condition()
+        self._idle = []          ## [(conn, generation, last_used)]
+        self._size = 0           ## open connections, idle + checked out
+        ## bumped whenever a connection turns out to be dead (e.g. DB restart),
+        ## idle connections from an older generation are recycled on checkout
+        self._generation = 0
+        self._conn_generation = {}
+
+        ## counters, see stats()
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._waiting = 0        ## callers blocked in getconn right now
+
+        for _ in range(minconn):
+            conn = self._connect()
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, self._generation, time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(connection_factory=TimedConnection, **self._conn_kwargs)
+        with self._cond:
+            self._created += 1
+            self._conn_generation[id(conn)] = self._generation
+        return conn
+
+    def _close(self, conn):
+        with self._cond:
+            self._conn_generation.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """
+        Check a connection out, waiting up to ``checkout_timeout``, or less
+        if the RPC it is for has less time left.
+        """
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        budget = deadlines.current()
+        if budget is not None:
+            budget.check()
+            if budget.deadline is not None:
+                deadline = min(deadline, budget.deadline)
+        waited = 0.0
+        checking = 0.0      ## health checks, already counted as ``db``
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        if budget is not None and budget.expired:
+                            raise DeadlineExceeded("call deadline exceeded waiting for a database connection")
+                        raise PoolTimeout(
+                            f"no database connection free after {self.checkout_timeout}s")
+                    wait_start = time.monotonic()
+                    self._waiting += 1
+                    try:
+                        ## wakes up now and then to notice a cancelled call
+                        self._cond.wait(min(remaining, deadlines.CANCEL_CHECK_INTERVAL) if budget is not None else remaining)
+                    finally:
+                        self._waiting -= 1
+                    waited += time.monotonic() - wait_start
+                    if budget is not None and budget.cancelled:
+                        raise DeadlineExceeded("call cancelled waiting for a database connection")
+                if self._idle:
+                    conn, generation, last_used = self._idle.pop()
+                    stale = generation != self._generation
+                else:
+                    ## reserve a slot, connect outside the lock
+                    conn = None
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                check_start = time.monotonic()
+                healthy = not stale and self._is_healthy(conn, last_used)
+                checking += time.monotonic() - check_start
+                if not healthy:
+                    self._discard(conn)
+                    continue
+
+            self._record_checkout(waited)
+            ## connecting included: it's all time without a connection
+            completed_phase("pool_wait", time.monotonic() - start - checking)
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection; broken or ``discard``ed ones are closed."""
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                ## a BEGIN cancelled half way (deadlines.py) leaves a failed transaction
+                ## psycopg2 doesn't know it started, and rollback() doesn't end it
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    discard = True
+            except psycopg2.Error:
+                discard = True
+        if discard or conn.closed:
+            self._discard(conn)
+            return
+        with self._cond:
+            generation = self._conn_generation.get(id(conn), self._generation)
+            self._idle.append((conn, generation, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        self._close(conn)
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def _record_checkout(self, wait):
+        with self._cond:
+            self._checkouts += 1
+            self._wait_time += wait
+            if wait:
+                self._waits += 1
+            if wait > self._max_wait:
+                self._max_wait = wait
+
+    def invalidate(self):
+        """Recycle every idle connection, e.g. after the database restarted."""
+        with self._cond:
+            self._generation += 1
+            idle, self._idle = self._idle, []
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for one unit of work.
+
+        Commits when the block exits normally and rolls back on an exception.
+        If the connection broke (``conn.closed``) it is assumed the database
+        restarted, so every idle connection is recycled along with it.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            if conn.closed:
+                ## the server went away; the idle connections are dead too
+                self.putconn(conn, discard=True)
+                self.invalidate()
+                raise
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self.putconn(conn, discard=True)
+                raise
+            self.putconn(conn)
+            raise
+        else:
+            self.putconn(conn)
+
+    @property
+    def waiting(self):
+        """Callers blocked waiting for a connection right now."""
+        return self._waiting
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "max_size": self.maxconn,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "waited_checkouts": self._waits,
+                "wait_time_total": self._wait_time,
+                "wait_time_max": self._max_wait,
+                "timeouts": self._timeouts,
+                "connections_created": self._created,
+                "connections_discarded": self._discarded,
+            }
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _, _ in idle:
+            self._close(conn)
+
+
+def start_stats_reporter(pool, interval, name="db-pool", extra=None):
+    """
+    Print pool stats every ``interval`` seconds from a daemon thread.
+
+    ``extra`` maps a label to another ``stats()`` callable (caches, batcher...)
+    printed on the same tick.
+    """
+    def report():
+        while True:
+            time.sleep(interval)
+            s = pool.stats()
+            print(f"[{name}] in_use={s['in_use']}/{s['max_size']} idle={s['idle']} "
+                  f"checkouts={s['checkouts']} waited={s['waited_checkouts']} "
+                  f"wait_total={s['wait_time_total']:.3f}s wait_max={s['wait_time_max']:.3f}s "
+                  f"timeouts={s['timeouts']} discarded={s['connections_discarded']}", flush=True)
+            for label, stats in (extra or {}).items():
+                values = " ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}"
+                                  for k, v in stats().items())
+                print(f"[{label}] {values}", flush=True)
+
+    thread = threading.Thread(target=report, name=f"{name}-stats", daemon=True)
+    thread.start()
+    return thread
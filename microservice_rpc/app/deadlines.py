@@ -0,0 +1,332 @@
+"""
+Deadlines and cancellation: stop working for callers that are gone.
+
+A client that times out or cancels a call used to leave the servicer
+running: the thread kept waiting for a pool connection and the statement
+ran to completion on a database backend, for nobody, at exactly the time
+the server was too busy.  ``DeadlineInterceptor`` (threaded) and
+``AsyncDeadlineInterceptor`` (``GRPC_SERVER_MODE=aio``) give every call a
+``CallBudget`` from ``context.time_remaining()``, kept in a context
+variable like the metrics timings, and:
+
+- skip the handler if the call expired or was cancelled while queued
+- bound connection checkouts and vote-batch waits by the time left
+- send the time left to Postgres as ``SET LOCAL statement_timeout``
+  before each statement (``db_pool.TimedCursor``), so a query the caller
+  can't wait for is stopped by the server; asyncpg gets it as the query
+  ``timeout``, which cancels the query on the server the same way
+- cancel the statement running for a call when the client cancels it
+  (``connection.cancel()``; grpc.aio cancels the handler's task, and
+  asyncpg cancels its query along with it)
+
+A call that runs out of time ends with ``DEADLINE_EXCEEDED``, one whose
+client went away with ``CANCELLED``.  Calls without a deadline are only
+cancelled.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import grpc
+import psycopg2.extensions
+
+from metrics import rebuild_handler
+
+_budget = ContextVar("rpc_budget", default=None)
+
+## Postgres reads statement_timeout = 0 as "no timeout"
+MIN_STATEMENT_TIMEOUT_MS = 1
+## the threaded server reports a call without a deadline as this far off, and more
+NO_DEADLINE = 365 * 24 * 3600
+## how often a wait for a connection or a vote batch looks whether its call was cancelled
+CANCEL_CHECK_INTERVAL = 0.1
+
+
+class DeadlineExceeded(Exception):
+    """The call ran out of time, or its client cancelled it: stop working for it."""
+
+
+class CallBudget:
+    __slots__ = ("deadline", "cancelled", "_lock", "_conn", "_finished")
+
+    def __init__(self, time_remaining=None):
+        if time_remaining is None or time_remaining >= NO_DEADLINE:
+            self.deadline = None
+        else:
+            self.deadline = time.monotonic() + time_remaining
+        self.cancelled = False
+        self._lock = threading.Lock()
+        self._conn = None
+        self._finished = False
+
+    def remaining(self):
+        """Seconds left, None without a deadline."""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    @property
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def check(self):
+        if self.cancelled:
+            raise DeadlineExceeded("call cancelled by the client")
+        if self.expired:
+            raise DeadlineExceeded("call deadline exceeded")
+
+    def statement_timeout_sql(self):
+        """``SET LOCAL statement_timeout`` for the time left, None without a deadline."""
+        remaining = self.remaining()
+        if remaining is None:
+            return None
+        return f"SET LOCAL statement_timeout = {max(MIN_STATEMENT_TIMEOUT_MS, int(remaining * 1000))}"
+
+    @contextmanager
+    def running(self, conn):
+        """``conn`` runs a statement for this call: ``cancel`` interrupts it."""
+        with self._lock:
+            self._conn = conn
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._conn = None
+
+    def finish(self):
+        """The handler is done; the call ending after this is not a cancellation."""
+        with self._lock:
+            self._finished = True
+
+    def cancel(self):
+        """gRPC callback once the call is over, for whatever reason."""
+        with self._lock:
+            ## a deadline is enforced by statement_timeout and the waits' own timeouts
+            if self._finished or self.expired:
+                return
+            ## the client went away from a handler still at work
+            self.cancelled = True
+            if self._conn is not None:
+                try:
+                    self._conn.cancel()
+                except psycopg2.Error:
+                    pass
+
+
+def current():
+    """The ``CallBudget`` of the RPC running in this context, if any."""
+    return _budget.get()
+
+
+def remaining():
+    budget = _budget.get()
+    return None if budget is None else budget.remaining()
+
+
+def expired():
+    budget = _budget.get()
+    return budget is not None and budget.expired
+
+
+def check():
+    """Raise ``DeadlineExceeded`` if the running RPC is out of time or cancelled."""
+    budget = _budget.get()
+    if budget is not None:
+        budget.check()
+
+
+def time_left():
+    """
+    Seconds the running RPC can still wait for something, None without a
+    deadline; raises ``DeadlineExceeded`` if it has none left or was cancelled.
+    """
+    budget = _budget.get()
+    if budget is None:
+        return None
+    budget.check()
+    return budget.remaining()
+
+
+def wait(future):
+    """
+    ``future.result()``, given up on with ``DeadlineExceeded`` once the
+    running RPC is out of time or cancelled.  The work itself goes on: a
+    vote batch commits whether or not its caller still waits.
+    """
+    budget = _budget.get()
+    if budget is None:
+        return future.result()
+    while True:
+        budget.check()
+        remaining = budget.remaining()
+        try:
+            return future.result(CANCEL_CHECK_INTERVAL if remaining is None else min(remaining, CANCEL_CHECK_INTERVAL))
+        except concurrent.futures.TimeoutError:
+            pass
+
+
+class BudgetedPool:
+    """
+    An asyncpg pool (aio_server.py) whose ``acquire`` gives up when the
+    running RPC runs out of time, like ``DBConnectionPool.getconn``.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def acquire(self, timeout=None):
+        return _BudgetedAcquire(self._pool, timeout)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+class _BudgetedAcquire:
+    def __init__(self, pool, timeout):
+        self._pool = pool
+        self._timeout = timeout
+        self._acquire = None
+
+    async def __aenter__(self):
+        timeout = time_left()
+        self._acquire = self._pool.acquire(timeout=self._timeout)
+        if timeout is None:
+            return await self._acquire.__aenter__()
+        ## not acquire(timeout=): asyncpg would reuse it to reset the connection on release
+        return await asyncio.wait_for(self._acquire.__aenter__(), timeout)
+
+    async def __aexit__(self, *exc_info):
+        ## the pool resets the connection on release: not a query of the call's
+        token = _budget.set(None)
+        try:
+            return await self._acquire.__aexit__(*exc_info)
+        finally:
+            _budget.reset(token)
+
+
+def _status(budget):
+    if budget.cancelled:
+        return grpc.StatusCode.CANCELLED, "call cancelled by the client"
+    return grpc.StatusCode.DEADLINE_EXCEEDED, "deadline exceeded"
+
+
+class DeadlineInterceptor(grpc.ServerInterceptor):
+    """Threaded server; ``psycopg2`` raises ``QueryCanceledError`` for a timed out or cancelled statement."""
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+
+        def begin(context):
+            budget = CallBudget(context.time_remaining())
+            ## False: the call is already over
+            if not context.add_callback(budget.cancel):
+                budget.cancel()
+            return budget
+
+        def ran_out(budget, error):
+            if isinstance(error, DeadlineExceeded):
+                return True
+            return isinstance(error, psycopg2.extensions.QueryCanceledError) and (
+                budget.cancelled or budget.deadline is not None)
+
+        def wrap(behavior, streaming_response):
+            if streaming_response:
+                def stream(request, context):
+                    budget = begin(context)
+                    try:
+                        budget.check()
+                        responses = behavior(request, context)
+                        while True:
+                            budget.check()
+                            ## only around each step, as in MetricsInterceptor
+                            token = _budget.set(budget)
+                            try:
+                                response = next(responses)
+                            except StopIteration:
+                                break
+                            finally:
+                                _budget.reset(token)
+                            yield response
+                    except Exception as e:
+                        if not ran_out(budget, e):
+                            raise
+                        context.abort(*_status(budget))
+                    finally:
+                        budget.finish()
+                return stream
+
+            def unary(request, context):
+                budget = begin(context)
+                token = _budget.set(budget)
+                try:
+                    budget.check()
+                    return behavior(request, context)
+                except Exception as e:
+                    if not ran_out(budget, e):
+                        raise
+                    context.abort(*_status(budget))
+                finally:
+                    budget.finish()
+                    _budget.reset(token)
+            return unary
+
+        return rebuild_handler(handler, wrap)
+
+
+class AsyncDeadlineInterceptor(grpc.aio.ServerInterceptor):
+    """
+    asyncio server: asyncpg raises ``asyncio.TimeoutError`` when a query or
+    checkout runs out of time.  grpc.aio cancels the handler's task itself
+    when the client cancels, and ends the call at its deadline: a handler
+    out of time just stops, sending a status then would race gRPC's own.
+    """
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+
+        def begin(context):
+            budget = CallBudget(context.time_remaining())
+            ## grpc.aio runs each call in a context of its own, never reset
+            _budget.set(budget)
+            return budget
+
+        def stop(budget, context, error):
+            if not isinstance(error, DeadlineExceeded) and not (
+                    isinstance(error, asyncio.TimeoutError) and budget.expired):
+                return
+            ## for the metrics; gRPC sends DEADLINE_EXCEEDED itself
+            context.set_code(grpc.StatusCode.DEADLINE_EXCEEDED)
+            raise asyncio.CancelledError() from error
+
+        def wrap(behavior, streaming_response):
+            if streaming_response:
+                async def stream(request, context):
+                    budget = begin(context)
+                    try:
+                        budget.check()
+                        async for response in behavior(request, context):
+                            yield response
+                    except Exception as e:
+                        stop(budget, context, e)
+                        raise
+                return stream
+
+            async def unary(request, context):
+                budget = begin(context)
+                try:
+                    budget.check()
+                    return await behavior(request, context)
+                except Exception as e:
+                    stop(budget, context, e)
+                    raise
+            return unary
+
+        return rebuild_handler(handler, wrap)
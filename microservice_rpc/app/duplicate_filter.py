@@ -0,0 +1,265 @@
+"""
+In-memory prefilter for repeat votes.
+
+Refresh spam and client retries send the same ``(poll, userID)`` again and
+again; each one used to take a slot in a vote batch only for the database to
+skip it on the ``(uuid, userID)`` primary key.  ``DuplicateVoteFilter``
+remembers, per poll, the voters the database has confirmed (their vote was
+inserted, or hit the primary key), and ``CastVote`` / ``BulkCastVote``
+answer ``duplicate_vote`` for them without touching the database.
+
+Only confirmed voters go in, so a voter the filter doesn't know about is
+simply sent to the database, which stays the source of truth: polls evicted
+to stay within the memory budget, votes cast through the other app node and
+polls never loaded all fall through to the INSERT as before.
+
+Voters are stored as 64-bit fingerprints of the userID, per poll in a
+sorted array of 8-byte ints (see ``_Fingerprints``), not as Python strings.
+Two userIDs of one poll sharing a fingerprint would make the second look
+like a repeat; with n voters on a poll that is a ~n / 2**64 chance per new
+voter.  ``verify_rate`` of the filter's rejections are sent to the database
+anyway and counted as ``verified`` / ``false_positives``: a "duplicate"
+the database accepts was a false positive, and it is recorded as a normal
+vote.
+
+``load`` rebuilds the filter from the ``vote`` rows of open polls, until the
+memory budget is full.
+"""
+
+import os
+import random
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from itertools import chain
+
+from poll_keys import poll_key
+
+_MASK = (1 << 64) - 1
+## per-poll bookkeeping on top of the fingerprints (dict entry, object, array header)
+_POLL_OVERHEAD = 300
+## an int object plus its share of the set's table
+_RECENT_ENTRY_BYTES = 64
+_MIN_RECENT = 64
+
+KNOWN, SAMPLE = "known", "sample"
+
+PRELOAD_SQL = ("SELECT v.uuid, v.userID FROM vote v JOIN poll p ON p.uuid = v.uuid "
+               "WHERE p.status = 'open'")
+
+
+def _fingerprint(user_id):
+    return hash(user_id) & _MASK
+
+
+class _Fingerprints:
+    """
+    A poll's voters as 64-bit fingerprints: a sorted array (8 bytes each)
+    searched by bisection, plus a set of recent adds that is merged into the
+    array once it outgrows an eighth of it.
+    """
+    __slots__ = ("merged", "recent")
+
+    def __init__(self):
+        self.merged = array('Q')
+        self.recent = set()
+
+    @property
+    def count(self):
+        return len(self.merged) + len(self.recent)
+
+    @property
+    def nbytes(self):
+        return _POLL_OVERHEAD + self.merged.itemsize * len(self.merged) + _RECENT_ENTRY_BYTES * len(self.recent)
+
+    def __contains__(self, fp):
+        if fp in self.recent:
+            return True
+        i = bisect_left(self.merged, fp)
+        return i < len(self.merged) and self.merged[i] == fp
+
+    def update(self, fps):
+        """Add fingerprints not in the set yet (a repeat would only waste its 8 bytes)."""
+        self.recent.update(fps)
+        self._maybe_merge()
+
+    def _maybe_merge(self):
+        if len(self.recent) > max(_MIN_RECENT, len(self.merged) >> 3):
+            self.merged = array('Q', sorted(chain(self.merged, self.recent)))
+            self.recent = set()
+
+
+class DuplicateVoteFilter:
+    def __init__(self, max_bytes=64 * 1024 * 1024, verify_rate=0.01):
+        self.max_bytes = max_bytes
+        self.verify_rate = verify_rate
+
+        self._lock = threading.Lock()
+        self._polls = OrderedDict()     ## uuid -> _Fingerprints, least recently used first
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._verified = 0
+        self._false_positives = 0
+        self._preloaded = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_bytes=int(os.environ.get("DUP_FILTER_MAX_BYTES", 64 * 1024 * 1024)),
+            verify_rate=float(os.environ.get("DUP_FILTER_VERIFY_RATE", 0.01)),
+        )
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @property
+    def full(self):
+        return self._bytes >= self.max_bytes
+
+    def lookup(self, poll_uuid, user_id):
+        """
+        ``KNOWN`` if ``user_id`` is known to have voted on the poll (answer
+        ``duplicate_vote`` right away), ``SAMPLE`` for the few known voters
+        sent to the database anyway to measure false positives, None if the
+        database has to decide.
+        """
+        if not self.enabled:
+            return None
+        key = poll_key(poll_uuid)
+        with self._lock:
+            voters = self._polls.get(key)
+            if voters is None or _fingerprint(user_id) not in voters:
+                self._misses += 1
+                return None
+            self._polls.move_to_end(key)
+            self._hits += 1
+        return SAMPLE if random.random() < self.verify_rate else KNOWN
+
+    def record(self, poll_uuid, user_id, inserted, sampled=False):
+        """
+        The database answered for ``user_id``: its vote was ``inserted`` or
+        hit the primary key.  ``sampled``: ``lookup`` returned ``SAMPLE``.
+        """
+        if not self.enabled:
+            return
+        key = poll_key(poll_uuid)
+        with self._lock:
+            if sampled:
+                self._verified += 1
+                self._false_positives += inserted
+            fp = _fingerprint(user_id)
+            voters = self._polls.get(key)
+            ## a sampled or raced repeat is already in
+            if voters is None or fp not in voters:
+                self._add(key, (fp,))
+
+    def _add(self, key, fps):
+        voters = self._polls.get(key)
+        if voters is None:
+            voters = self._polls[key] = _Fingerprints()
+            self._bytes += voters.nbytes
+        before = voters.nbytes
+        voters.update(fps)
+        self._bytes += voters.nbytes - before
+        self._polls.move_to_end(key)
+        ## whole polls go, oldest first; their voters fall through to the database
+        while self._polls and self._bytes > self.max_bytes:
+            _, evicted = self._polls.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self._evictions += 1
+
+    def drop(self, poll_uuid):
+        """The poll closed: no vote on it reaches the filter anymore."""
+        with self._lock:
+            voters = self._polls.pop(poll_key(poll_uuid), None)
+            if voters is not None:
+                self._bytes -= voters.nbytes
+
+    def load(self, pool, batch=10000):
+        """
+        Rebuild from the votes of open polls, stopping once the memory budget
+        is full.  Runs alongside live votes: entries are only ever confirmed
+        voters, whichever side adds them first.
+        """
+        if not self.enabled:
+            return 0
+        loaded = 0
+        with pool.connection() as conn:
+            cur = conn.cursor(name="dup_filter_preload")
+            cur.itersize = batch
+            cur.execute(PRELOAD_SQL)
+            while not self.full:
+                rows = cur.fetchmany(batch)
+                if not rows:
+                    break
+                self._load_rows(rows)
+                loaded += len(rows)
+            cur.close()
+            conn.rollback()
+        return loaded
+
+    async def load_async(self, pool, batch=1000):
+        """``load`` for an asyncpg pool."""
+        if not self.enabled:
+            return 0
+        loaded = 0
+        async with pool.acquire() as conn:
+            async with conn.transaction(readonly=True):
+                cursor = await conn.cursor(PRELOAD_SQL)
+                while not self.full:
+                    rows = await cursor.fetch(batch)
+                    if not rows:
+                        break
+                    ## small batches: the event loop serves RPCs between them
+                    self._load_rows(rows)
+                    loaded += len(rows)
+        return loaded
+
+    def start_preload(self, pool):
+        """``load`` on a daemon thread, so the server takes votes meanwhile."""
+        def run():
+            try:
+                print(f"[dup-filter] preloaded {self.load(pool)} votes", flush=True)
+            except Exception as e:
+                print(f"[dup-filter] preload failed: {e}", flush=True)
+
+        thread = threading.Thread(target=run, name="dup-filter-preload", daemon=True)
+        thread.start()
+        return thread
+
+    async def preload(self, pool):
+        """``load_async`` as a background task."""
+        try:
+            print(f"[dup-filter] preloaded {await self.load_async(pool)} votes", flush=True)
+        except Exception as e:
+            print(f"[dup-filter] preload failed: {e}", flush=True)
+
+    def _load_rows(self, rows):
+        by_poll = {}
+        for poll_uuid, user_id in rows:
+            by_poll.setdefault(poll_uuid, []).append(_fingerprint(user_id))
+        with self._lock:
+            for poll_uuid, fps in by_poll.items():
+                self._add(str(poll_uuid), fps)
+            self._preloaded += len(rows)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "polls": len(self._polls),
+                "voters": sum(voters.count for voters in self._polls.values()),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "preloaded": self._preloaded,
+                "verified": self._verified,
+                "false_positives": self._false_positives,
+                "false_positive_rate": self._false_positives / self._verified if self._verified else 0.0,
+            }
@@ -0,0 +1,71 @@
+"""
+Frozen final results for closed polls.
+
+Once ``ClosePoll`` commits, a poll's tally can never change, so ``ClosePoll``
+stores the final counts in ``poll.final_results`` (votes per option id) in
+the same transaction
+that closes it, and ``GetPollResults`` serves closed polls from that
+snapshot instead of summing the tally shards again.
+
+The close locks the poll row ``FOR UPDATE`` before reading the tally.  Vote
+inserts hold ``FOR SHARE`` on the open polls they write to (see
+``vote_batcher.INSERT_VOTES_SQL``), so the close waits for votes already in
+flight to commit and they are in the snapshot; votes that arrive while it
+runs queue behind it, then see the poll closed and are rejected.
+
+The snapshot never goes stale, so ``FinalResultsCache`` keeps it per process
+with no expiry, bounded only by entry count.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from poll_keys import poll_key
+
+
+class FinalResultsCache:
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   ## uuid -> (question, options, counts), least recently used first
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(max_entries=int(os.environ.get("FINAL_RESULTS_CACHE_MAX_ENTRIES", 100000)))
+
+    def get(self, poll_uuid):
+        """Return ``(question, options, counts)`` or None on a miss."""
+        key = poll_key(poll_uuid)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0], entry[1], list(entry[2])
+
+    def put(self, poll_uuid, question, options, counts):
+        if self.max_entries <= 0:
+            return
+        key = poll_key(poll_uuid)
+        with self._lock:
+            self._entries[key] = (question, tuple(options), tuple(counts))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
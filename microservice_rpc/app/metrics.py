@@ -0,0 +1,476 @@
+"""
+Per-RPC latency metrics, served in the Prometheus text format.
+
+``MetricsInterceptor`` (threaded server) and ``AsyncMetricsInterceptor``
+(``GRPC_SERVER_MODE=aio``) wrap every handler and record, per method:
+
+- ``grpc_server_handling_seconds``: time from the call reaching the server
+  to its last message (a histogram)
+- ``grpc_server_handled_total``: finished calls by status code
+- ``grpc_server_in_flight``: calls currently being handled
+- ``polling_rpc_phase_seconds``: the same time split into phases:
+
+  ``queue``       waiting for a free executor thread (threaded mode only)
+  ``pool_wait``   checking a database connection out of the pool
+  ``db``          running SQL, fetching rows and committing
+  ``vote_batch``  waiting for the vote batcher's group commit (threaded CastVote)
+  ``app``         everything else: validation, caches, building protobufs
+
+The phases of a call add up to its handling time.  Given a ``tracing.Tracer``,
+the interceptors also open a server span for sampled calls and every phase
+becomes a child span.  The database layers report
+into the call they run for through a context variable: ``db_pool`` times
+psycopg2 cursors and checkouts, ``TimedPool`` and ``aio_server.TimedConnection``
+do the same for asyncpg.  Work outside an RPC (the vote flusher, the watch
+poller, the replica checks) is not counted.
+
+``start_http_server`` serves ``GET /metrics`` from a daemon thread, on
+``METRICS_PORT`` (50051 + 1000 for the primary, 50052 + 1000 for the
+backup; 0 turns it off).  The ``stats()`` of the pool, caches and batcher
+are exported there too, as ``polling_component_stat`` gauges.
+"""
+
+import asyncio
+import contextvars
+import http.server
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import grpc
+
+import tracing
+
+## seconds; RPCs are ms-scale, watch / stream calls can run for minutes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 60.0)
+PHASES = ("queue", "pool_wait", "db", "vote_batch", "app")
+
+_timings = contextvars.ContextVar("rpc_timings", default=None)
+
+
+def metrics_port(grpc_port):
+    """``METRICS_PORT``, or the gRPC port + 1000; +100 per worker process (``GRPC_WORKERS``)."""
+    port = int(os.environ.get("METRICS_PORT", grpc_port + 1000))
+    if port <= 0:
+        return 0
+    ## 100 apart, so the primary's workers don't take the backup's port
+    return port + 100 * int(os.environ.get("GRPC_WORKER_SLOT", 0))
+
+
+def observe_phase(phase, seconds):
+    """Add ``seconds`` to ``phase`` of the RPC running in this context, if any."""
+    timings = _timings.get()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+def completed_phase(name, seconds):
+    """``phase`` for a block timed by the caller, which just ended."""
+    observe_phase(name, seconds)
+    tracing.record_span(name, seconds, phase=name)
+
+
+@contextmanager
+def phase(name, **attributes):
+    """Time the block as ``name``; a traced call also gets a span for it (tracing.py)."""
+    start = time.perf_counter()
+    with tracing.span(name, phase=name, **attributes):
+        try:
+            yield
+        finally:
+            observe_phase(name, time.perf_counter() - start)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return str(int(value))
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, l)} {_format_value(v)}"
+                                for l, v in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                ## per-bucket (not cumulative) counts, sum, count
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            i = 0
+            while i < len(self.buckets) and value > self.buckets[i]:
+                i += 1
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = [(l, list(e[0]), e[1], e[2]) for l, e in self._values.items()]
+        lines = self.header()
+        names = self.labelnames + ("le",)
+        for labels, counts, total, count in values:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._gauge_functions = []   ## (name, help, fn), read on every scrape
+        self._stats = {}             ## component -> stats() callable
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def gauge_function(self, name, help_text, fn):
+        self._gauge_functions.append((name, help_text, fn))
+
+    def add_stats(self, components):
+        """``{label: stats callable}``, like ``db_pool.start_stats_reporter``'s ``extra``."""
+        self._stats.update(components)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for name, help_text, fn in self._gauge_functions:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {_format_value(fn())}"]
+        if self._stats:
+            lines += ["# HELP polling_component_stat Numeric stats() fields of the pool, caches and batcher",
+                      "# TYPE polling_component_stat gauge"]
+            for component, stats in self._stats.items():
+                for key, value in stats().items():
+                    if isinstance(value, (int, float)):
+                        labels = _format_labels(("component", "stat"), (component, key))
+                        lines.append(f"polling_component_stat{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class RpcMetrics:
+    """The per-RPC metrics both interceptors record into."""
+
+    def __init__(self, registry=None):
+        self.registry = registry or Registry()
+        labels = ("grpc_service", "grpc_method")
+        self.handling = self.registry.register(Histogram(
+            "grpc_server_handling_seconds", "Time from a call reaching the server to its last message", labels))
+        self.phases = self.registry.register(Histogram(
+            "polling_rpc_phase_seconds", "Handling time per phase: " + ", ".join(PHASES), labels + ("phase",)))
+        self.handled = self.registry.register(Counter(
+            "grpc_server_handled_total", "Calls finished, by status code", labels + ("grpc_code",)))
+        self.in_flight = self.registry.register(Gauge(
+            "grpc_server_in_flight", "Calls being handled", labels))
+
+    def start(self, method):
+        """Call accepted: -> the labels and timings ``finish`` takes."""
+        service, _, name = method.lstrip("/").rpartition("/")
+        labels = (service.rpartition(".")[2], name)
+        self.in_flight.inc(labels)
+        return labels, {}
+
+    def finish(self, labels, timings, elapsed, code):
+        self.in_flight.dec(labels)
+        self.handled.inc(labels + (code,))
+        self.handling.observe(labels, elapsed)
+        accounted = 0.0
+        for name, seconds in timings.items():
+            self.phases.observe(labels + (name,), seconds)
+            accounted += seconds
+        self.phases.observe(labels + ("app",), max(0.0, elapsed - accounted))
+
+    def watch_executor(self, executor):
+        """Export the threaded server's executor backlog (calls waiting for a thread)."""
+        self.registry.gauge_function(
+            "polling_executor_queue_depth", "Calls queued for a free executor thread",
+            lambda: executor._work_queue.qsize())
+
+
+def _status_code(context, error):
+    code = context.code()
+    ## the client went away mid-stream (or, aio, the call ran out of time: deadlines.py)
+    if code is None and isinstance(error, (GeneratorExit, asyncio.CancelledError)):
+        return "CANCELLED"
+    if code is None:
+        return "OK" if error is None else "UNKNOWN"
+    if isinstance(code, grpc.StatusCode):
+        return code.name
+    return str(code)
+
+
+def rebuild_handler(handler, wrap):
+    """``handler`` with its behavior replaced by ``wrap(behavior, streaming_response)``."""
+    if handler.request_streaming and handler.response_streaming:
+        factory, behavior = grpc.stream_stream_rpc_method_handler, handler.stream_stream
+    elif handler.request_streaming:
+        factory, behavior = grpc.stream_unary_rpc_method_handler, handler.stream_unary
+    elif handler.response_streaming:
+        factory, behavior = grpc.unary_stream_rpc_method_handler, handler.unary_stream
+    else:
+        factory, behavior = grpc.unary_unary_rpc_method_handler, handler.unary_unary
+    return factory(wrap(behavior, handler.response_streaming),
+                   request_deserializer=handler.request_deserializer,
+                   response_serializer=handler.response_serializer)
+
+
+def _activate(timings, span):
+    return _timings.set(timings), (tracing.attach(span) if span is not None else None)
+
+
+def _deactivate(tokens):
+    timings_token, span_token = tokens
+    _timings.reset(timings_token)
+    if span_token is not None:
+        tracing.detach(span_token)
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """Threaded server: runs when the call arrives, before it waits for an executor thread."""
+
+    def __init__(self, rpc_metrics, tracer=None):
+        self.metrics = rpc_metrics
+        self.tracer = tracer
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        arrived, arrived_ns = time.perf_counter(), time.time_ns()
+        method = handler_call_details.method
+        sampled = self.tracer.sample(handler_call_details.invocation_metadata) if self.tracer else None
+
+        def begin(request):
+            labels, timings = self.metrics.start(method)
+            timings["queue"] = time.perf_counter() - arrived
+            span = None
+            if sampled is not None:
+                span = self.tracer.server_span(sampled, method, arrived_ns, request)
+                span.child("queue", start_ns=arrived_ns, attributes={"phase": "queue"}).end()
+            return labels, timings, span
+
+        def end(labels, timings, span, context, error):
+            ## a cancelled WatchPollResults ends its stream without an error
+            code = "CANCELLED" if error is None and not context.is_active() else _status_code(context, error)
+            self.metrics.finish(labels, timings, time.perf_counter() - arrived, code)
+            if span is not None:
+                span.set_attribute("rpc.grpc.status_code", code)
+                span.end("OK" if code == "OK" else "ERROR")
+
+        def wrap(behavior, streaming_response):
+            if streaming_response:
+                def stream(request, context):
+                    labels, timings, span = begin(request)
+                    responses, error = behavior(request, context), None
+                    try:
+                        while True:
+                            ## only around each step: a cancelled stream may be
+                            ## closed later from another thread
+                            tokens = _activate(timings, span)
+                            try:
+                                response = next(responses)
+                            except StopIteration:
+                                break
+                            finally:
+                                _deactivate(tokens)
+                            yield response
+                    except BaseException as e:
+                        error = e
+                        raise
+                    finally:
+                        end(labels, timings, span, context, error)
+                return stream
+
+            def unary(request, context):
+                labels, timings, span = begin(request)
+                tokens, error = _activate(timings, span), None
+                try:
+                    return behavior(request, context)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    _deactivate(tokens)
+                    end(labels, timings, span, context, error)
+            return unary
+
+        return rebuild_handler(handler, wrap)
+
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    """asyncio server: calls don't queue for a thread, so there is no ``queue`` phase."""
+
+    def __init__(self, rpc_metrics, tracer=None):
+        self.metrics = rpc_metrics
+        self.tracer = tracer
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = handler_call_details.method
+        sampled = self.tracer.sample(handler_call_details.invocation_metadata) if self.tracer else None
+
+        ## grpc.aio runs each call in a context of its own, so the timings are
+        ## set for the rest of the call and never reset
+        def begin(request):
+            labels, timings = self.metrics.start(method)
+            span = None
+            if sampled is not None:
+                span = self.tracer.server_span(sampled, method, time.time_ns(), request)
+            _activate(timings, span)
+            return time.perf_counter(), labels, timings, span
+
+        def end(start, labels, timings, span, context, error):
+            code = _status_code(context, error)
+            self.metrics.finish(labels, timings, time.perf_counter() - start, code)
+            if span is not None:
+                span.set_attribute("rpc.grpc.status_code", code)
+                span.end("OK" if code == "OK" else "ERROR")
+
+        def wrap(behavior, streaming_response):
+            if streaming_response:
+                async def stream(request, context):
+                    start, labels, timings, span = begin(request)
+                    error = None
+                    try:
+                        async for response in behavior(request, context):
+                            yield response
+                    except BaseException as e:
+                        error = e
+                        raise
+                    finally:
+                        end(start, labels, timings, span, context, error)
+                return stream
+
+            async def unary(request, context):
+                start, labels, timings, span = begin(request)
+                error = None
+                try:
+                    return await behavior(request, context)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    end(start, labels, timings, span, context, error)
+            return unary
+
+        return rebuild_handler(handler, wrap)
+
+
+class _TimedAcquire:
+    def __init__(self, pool, acquire):
+        self._pool = pool
+        self._acquire = acquire
+
+    async def __aenter__(self):
+        self._pool.waiting += 1
+        try:
+            with phase("pool_wait"):
+                return await self._acquire.__aenter__()
+        finally:
+            self._pool.waiting -= 1
+
+    async def __aexit__(self, *exc_info):
+        return await self._acquire.__aexit__(*exc_info)
+
+
+class TimedPool:
+    """
+    An asyncpg pool whose ``async with pool.acquire()`` counts as ``pool_wait``;
+    ``waiting`` is the number of acquires in progress.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self.waiting = 0
+
+    def acquire(self, *args, **kwargs):
+        return _TimedAcquire(self, self._pool.acquire(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(registry, port):
+    """Serve ``registry`` on ``http://0.0.0.0:<port>/metrics`` from a daemon thread."""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = http.server.ThreadingHTTPServer(("0.0.0.0", port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,59 @@
+"""
+Option ids: the compact encoding votes are stored and counted in.
+
+A poll's options get ids when it is created: the position of each option in
+``poll.options``, which never changes.  ``vote`` and ``vote_tally`` store
+that id as a ``SMALLINT`` instead of the option text, ``poll.final_results``
+is a ``BIGINT[]`` indexed by it, and the in-process caches keep a list of
+counts per poll instead of an option -> count dict.
+
+Clients can vote with ``CastVoteRequest.option_index`` and ask for
+``PollRequest.counts_only`` to get the counts back in option order.  The
+string API keeps working: ``select_options`` is translated to its id through
+the poll metadata cache, and ``results`` is rebuilt from the options and
+counts when the reply goes out.
+"""
+
+## option ids are SMALLINT in the database
+MAX_OPTIONS = 32767
+
+
+def resolve_vote(meta, request):
+    """CastVoteRequest -> ``(option_id, None)``, or ``(None, status)`` if it can't be counted."""
+    if meta is None:
+        return None, "Poll Not Found"
+    if not meta.is_open:
+        return None, "Poll Closed"
+    if request.HasField("option_index"):
+        if 0 <= request.option_index < len(meta.options):
+            return request.option_index, None
+        return None, "Invalid Option"
+    option_id = meta.option_index.get(request.select_options)
+    if option_id is None:
+        return None, "Invalid Option"
+    return option_id, None
+
+
+def tally_counts(n_options, rows):
+    """``(option_id, votes)`` rows -> votes per option, in option order."""
+    counts = [0] * n_options
+    for option_id, votes in rows:
+        if 0 <= option_id < n_options:
+            counts[option_id] = int(votes)
+    return counts
+
+
+def results_map(options, counts):
+    """The string API's ``{option: votes}``."""
+    results = {}
+    for option, count in zip(options, counts):
+        ## a repeated option text only ever gets votes under its first id
+        results[option] = results.get(option, 0) + count
+    return results
+
+
+def result_fields(options, counts, counts_only):
+    """``PollResultResponse`` keyword arguments for the tally."""
+    if counts_only:
+        return {"counts": counts}
+    return {"results": results_map(options, counts)}
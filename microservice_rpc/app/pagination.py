@@ -0,0 +1,43 @@
+"""
+Keyset pagination helpers for ListPolls / StreamPolls.
+
+Pages are ordered by ``(create_at_time, uuid)`` descending and the page token
+is the key of the last poll on the previous page, so every page is an index
+range scan on ``poll_created_uuid_idx`` however deep the client pages.
+"""
+
+import base64
+import os
+import uuid as uuid_lib
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = int(os.environ.get("LIST_POLLS_DEFAULT_PAGE_SIZE", 100))
+MAX_PAGE_SIZE = int(os.environ.get("LIST_POLLS_MAX_PAGE_SIZE", 1000))
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_POLLS_CHUNK_SIZE", 500))
+
+
+def page_size(requested):
+    if requested <= 0:
+        return DEFAULT_PAGE_SIZE
+    return min(requested, MAX_PAGE_SIZE)
+
+
+def chunk_size(requested):
+    if requested <= 0:
+        return STREAM_CHUNK_SIZE
+    return min(requested, MAX_PAGE_SIZE)
+
+
+def encode_page_token(create_at_time, poll_uuid):
+    raw = f"{create_at_time.isoformat()}|{poll_uuid}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_page_token(token):
+    """-> (create_at_time, uuid); ValueError if the token is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token.encode()).decode()
+        created, poll_uuid = raw.split("|")
+        return datetime.fromisoformat(created), str(uuid_lib.UUID(poll_uuid))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"invalid page_token: {token!r}") from e
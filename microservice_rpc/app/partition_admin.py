@@ -0,0 +1,155 @@
+"""
+Inspect and grow the hash partitions of the vote table.
+
+    python partition_admin.py status                        # partitions, rows, size
+    python partition_admin.py split --partition vote_m16_r3  # split one in two
+    python partition_admin.py split --all                    # double the partition count
+    python partition_admin.py check-pruning                  # uuid queries hit one partition
+
+A hash partition with MODULUS m, REMAINDER r is split into (2m, r) and
+(2m, r + m), which between them hold exactly its rows.  Partitions with
+different moduli can coexist, so hot partitions can be split on their own.
+The split detaches the partition and copies its rows in one transaction:
+votes wait on the vote table's lock until it commits, so split one
+partition at a time on a busy database.  Rows are copied straight into the
+new partitions, which doesn't fire the tally triggers on `vote`.
+"""
+
+import argparse
+import json
+import re
+import sys
+
+import psycopg2
+
+from primary_server import DB_CONFIG
+
+PARTITIONS_SQL = """
+    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint, pg_total_relation_size(c.oid)
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'vote'::regclass
+    ORDER BY c.relname
+"""
+BOUND_RE = re.compile(r"modulus (\d+), remainder (\d+)")
+
+## queries that filter on the poll uuid; each must scan one partition.
+## inserts (CastVote, BulkCastVote, the vote batcher) are routed row by row
+## and their ON CONFLICT check only probes the target partition's index.
+PRUNED_QUERIES = {
+    "tally_admin verify/rebuild --poll": "SELECT option_id, COUNT(*) FROM vote WHERE uuid = %(poll)s GROUP BY option_id",
+    "duplicate vote lookup": "SELECT 1 FROM vote WHERE uuid = %(poll)s AND userID = %(user)s",
+    "votes of a poll": "SELECT userID, option_id, vote_time FROM vote WHERE uuid = %(poll)s",
+}
+
+
+def partitions(cur):
+    """-> [(name, modulus, remainder, estimated rows, bytes)]"""
+    cur.execute(PARTITIONS_SQL)
+    rows = []
+    for name, bound, tuples, size in cur.fetchall():
+        modulus, remainder = map(int, BOUND_RE.search(bound).groups())
+        rows.append((name, modulus, remainder, max(tuples, 0), size))
+    return rows
+
+
+def status(conn):
+    cur = conn.cursor()
+    rows = partitions(cur)
+    conn.rollback()
+    print(f"{'Partition':<20}{'Modulus':>8}{'Remainder':>10}{'Rows (est.)':>14}{'Size (MB)':>12}")
+    for name, modulus, remainder, tuples, size in rows:
+        print(f"{name:<20}{modulus:>8}{remainder:>10}{tuples:>14}{size / 1024 / 1024:>12.1f}")
+    print(f"📦 {len(rows)} partitions")
+
+
+def split(conn, name):
+    cur = conn.cursor()
+    found = [p for p in partitions(cur) if p[0] == name]
+    if not found:
+        conn.rollback()
+        print(f"❌ {name} is not a partition of vote")
+        return False
+    _, modulus, remainder, _, _ = found[0]
+    halves = [(modulus * 2, remainder), (modulus * 2, remainder + modulus)]
+    cur.execute(f"ALTER TABLE vote DETACH PARTITION {name}")
+    for new_modulus, new_remainder in halves:
+        new_name = f"vote_m{new_modulus}_r{new_remainder}"
+        cur.execute(
+            f"CREATE TABLE {new_name} PARTITION OF vote "
+            f"FOR VALUES WITH (MODULUS {new_modulus}, REMAINDER {new_remainder})"
+        )
+        cur.execute(
+            f"INSERT INTO {new_name} (userID, option_id, vote_time, uuid) "
+            f"SELECT userID, option_id, vote_time, uuid FROM {name} "
+            f"WHERE satisfies_hash_partition('vote'::regclass, %s, %s, uuid)",
+            (new_modulus, new_remainder),
+        )
+        print(f"🔧 {name} -> {new_name}: {cur.rowcount} votes")
+    cur.execute(f"DROP TABLE {name}")
+    conn.commit()
+    for new_modulus, new_remainder in halves:
+        cur.execute(f"ANALYZE vote_m{new_modulus}_r{new_remainder}")
+        conn.commit()
+    return True
+
+
+def scanned_partitions(plan):
+    """Relation names scanned anywhere in an EXPLAIN (FORMAT JSON) plan."""
+    names = set()
+    if "Relation Name" in plan:
+        names.add(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        names |= scanned_partitions(child)
+    return names
+
+
+def check_pruning(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT uuid FROM poll LIMIT 1")
+    row = cur.fetchone()
+    params = {"poll": str(row[0]) if row else "00000000-0000-0000-0000-000000000000", "user": "partition_check"}
+    ok = True
+    for label, query in PRUNED_QUERIES.items():
+        cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+        plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        scanned = scanned_partitions(plan[0]["Plan"])
+        if len(scanned) <= 1:
+            print(f"✅ {label}: {', '.join(scanned) or 'no partition'}")
+        else:
+            ok = False
+            print(f"❌ {label}: scans {len(scanned)} partitions")
+    conn.rollback()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and split the hash partitions of the vote table")
+    parser.add_argument("command", choices=["status", "split", "check-pruning"])
+    parser.add_argument("--partition", help="split: partition to split, e.g. vote_m16_r3")
+    parser.add_argument("--all", action="store_true", help="split: every partition")
+    parser.add_argument("--host", default=DB_CONFIG["host"])
+    parser.add_argument("--port", type=int, default=DB_CONFIG["port"])
+    args = parser.parse_args()
+    if args.command == "split" and not (args.partition or args.all):
+        parser.error("split needs --partition NAME or --all")
+
+    conn = psycopg2.connect(**dict(DB_CONFIG, host=args.host, port=args.port))
+    try:
+        if args.command == "status":
+            status(conn)
+        elif args.command == "check-pruning":
+            sys.exit(0 if check_pruning(conn) else 1)
+        else:
+            cur = conn.cursor()
+            names = [p[0] for p in partitions(cur)] if args.all else [args.partition]
+            conn.rollback()
+            ok = all([split(conn, name) for name in names])
+            sys.exit(0 if ok else 1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
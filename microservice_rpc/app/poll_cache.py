@@ -0,0 +1,104 @@
+"""
+In-memory poll metadata for the CastVote / GetPollResults validation path.
+
+``CastVote`` used to run ``SELECT status, options FROM poll`` and a linear
+scan over the options list before every insert.  Poll metadata only changes
+on ``ClosePoll``, so it is cached here with the options pre-indexed in a dict
+(option -> option id, see option_ids.py) and the vote path is left with a
+single INSERT.
+
+``ClosePoll`` on this node invalidates the entry right away; open polls
+expire after ``ttl`` seconds so a close on the other app node is seen within
+that window.  A closed poll can never reopen, so closed entries don't expire.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from poll_keys import poll_key
+
+
+class PollMeta:
+    __slots__ = ("question", "status", "options", "option_index", "loaded_at")
+
+    def __init__(self, question, status, options):
+        self.question = question
+        self.status = status
+        self.options = tuple(options)
+        self.option_index = {}
+        for i, option in enumerate(self.options):
+            ## a repeated option text votes under its first id
+            self.option_index.setdefault(option, i)
+        self.loaded_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self.status == 'open'
+
+
+class PollMetadataCache:
+    def __init__(self, max_entries=10000, ttl=2.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   ## uuid -> PollMeta, least recently used first
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_entries=int(os.environ.get("POLL_CACHE_MAX_ENTRIES", 10000)),
+            ttl=float(os.environ.get("POLL_CACHE_TTL", 2.0)),
+        )
+
+    def get(self, poll_uuid):
+        key = poll_key(poll_uuid)
+        with self._lock:
+            meta = self._entries.get(key)
+            if meta is None:
+                self._misses += 1
+                return None
+            if meta.is_open and time.monotonic() - meta.loaded_at > self.ttl:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return meta
+
+    def put(self, poll_uuid, question, status, options):
+        meta = PollMeta(question, status, options)
+        if self.max_entries <= 0:
+            return meta
+        key = poll_key(poll_uuid)
+        with self._lock:
+            self._entries[key] = meta
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return meta
+
+    def invalidate(self, poll_uuid):
+        with self._lock:
+            if self._entries.pop(poll_key(poll_uuid), None) is not None:
+                self._invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
@@ -0,0 +1,16 @@
+"""
+Poll keys: the one spelling of a poll uuid the in-process caches key on.
+
+Clients may send a uuid in upper case, with or without dashes or braces;
+the database and every cache see the canonical lower-case dashed form.  A
+string that isn't a uuid is kept as is, so it simply never matches a poll.
+"""
+
+import uuid as uuid_lib
+
+
+def poll_key(poll_uuid):
+    try:
+        return str(uuid_lib.UUID(poll_uuid))
+    except (TypeError, ValueError):
+        return poll_uuid
@@ -0,0 +1,399 @@
+"""
+Python client for the polling services: long-lived channels, a deadline
+on every call, safe retries and optional hedged result reads.
+
+A channel per call (the old ``test.py``) pays a TCP and HTTP/2 handshake
+for every vote.  ``PollingClient`` (threads) and ``AsyncPollingClient``
+(asyncio) keep a ``ChannelPool`` of a few channels open for their whole
+life and spread calls over them round robin; each channel is its own
+HTTP/2 connection, so no single one hits nginx's stream limit.
+
+- Deadlines: every call gets one (``DEFAULT_TIMEOUTS``, or ``timeout=``),
+  and it covers all of its attempts, backoff included.
+- Retries (``RetryPolicy``): a call the server shed (``RESOURCE_EXHAUSTED``
+  with shedding.py's ``OVERLOADED`` details) never ran and is always
+  resent; any other ``RESOURCE_EXHAUSTED`` (an oversized bulk vote, the
+  watch stream limit) would fail again and is not.  Otherwise only methods
+  that are safe to repeat are resent on a transient error: reads,
+  ``ClosePoll`` (closing twice keeps the first snapshot) and votes.  A
+  vote resent after its first attempt was counted comes back
+  ``duplicate_vote``; ``vote_accepted()`` counts both as success.
+  ``CreatePoll`` is not repeated: it would create a second poll.
+- Hedging (``hedge_delay``): a ``GetPollResults`` with no reply after
+  ``hedge_delay`` is sent again on another channel, the first reply wins
+  and the rest are cancelled, so one slow node doesn't set the tail
+  latency.  A failure that wouldn't be retried (``NOT_FOUND``, say) is the
+  answer and is not hedged.  Off by default: it costs extra reads.
+
+``from_env()`` reads ``POLLING_TARGET``, ``POLLING_CHANNELS``,
+``POLLING_MAX_ATTEMPTS`` and ``POLLING_HEDGE_DELAY``.
+"""
+
+import asyncio
+import itertools
+import os
+import queue
+import random
+import time
+
+import grpc
+
+import polling_pb2
+import polling_pb2_grpc
+from shedding import OVERLOADED
+
+## nginx in front of both servers
+DEFAULT_TARGET = "localhost:8080"
+DEFAULT_CHANNELS = 4
+## seconds per call, all attempts included (None: no deadline)
+DEFAULT_TIMEOUTS = {
+    "CreatePoll": 5.0,
+    "ListPolls": 5.0,
+    "StreamPolls": 60.0,
+    "ClosePoll": 5.0,
+    "CastVote": 5.0,
+    "BulkCastVote": 60.0,
+    "GetPollResults": 2.0,
+    "WatchPollResults": None,
+}
+CHANNEL_OPTIONS = [
+    ## without it channels to the same target share one connection
+    ("grpc.use_local_subchannel_pool", 1),
+    ## notice a dead connection between calls, not on the next one
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+]
+
+VOTE_ACCEPTED = frozenset({"Vote Successfully!", "duplicate_vote"})
+## may or may not have run: only calls safe to repeat are resent
+TRANSIENT_CODES = frozenset({grpc.StatusCode.UNAVAILABLE})
+IDEMPOTENT_METHODS = frozenset({"ListPolls", "ClosePoll", "CastVote", "BulkCastVote", "GetPollResults"})
+
+
+def shed(error):
+    """True if admission control turned the call away before it ran: any call can be resent."""
+    ## the server also answers RESOURCE_EXHAUSTED for limits a resend would hit again
+    return error.code() == grpc.StatusCode.RESOURCE_EXHAUSTED and error.details() == OVERLOADED
+
+
+def vote_accepted(response):
+    """True if the vote is counted: just now, or by an earlier attempt."""
+    return response.status in VOTE_ACCEPTED
+
+
+class RetryPolicy:
+    """Up to ``max_attempts`` attempts, with exponential backoff and full jitter between them."""
+
+    def __init__(self, max_attempts=3, initial_backoff=0.05, max_backoff=1.0, multiplier=2.0, codes=TRANSIENT_CODES):
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.codes = frozenset(codes)
+
+    def retryable(self, method, error):
+        return shed(error) or (method in IDEMPOTENT_METHODS and error.code() in self.codes)
+
+    def backoff(self, attempt):
+        """Sleep before attempt ``attempt + 1``."""
+        return random.uniform(0, min(self.max_backoff, self.initial_backoff * self.multiplier ** (attempt - 1)))
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+class _Stubs:
+    __slots__ = ("channel", "poll", "vote", "result")
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.poll = polling_pb2_grpc.PollServiceStub(channel)
+        self.vote = polling_pb2_grpc.VoteServiceStub(channel)
+        self.result = polling_pb2_grpc.ResultServiceStub(channel)
+
+
+class ChannelPool:
+    """``size`` long-lived channels to ``target``, handed out round robin with their stubs."""
+
+    def __init__(self, target=DEFAULT_TARGET, size=DEFAULT_CHANNELS, options=None, channel=grpc.insecure_channel):
+        self.target = target
+        options = CHANNEL_OPTIONS + list(options or [])
+        self._stubs = [_Stubs(channel(target, options=options)) for _ in range(max(1, size))]
+        self._next = itertools.count()
+
+    def __len__(self):
+        return len(self._stubs)
+
+    def next(self):
+        ## itertools.count is atomic under the GIL, no lock needed
+        return self._stubs[next(self._next) % len(self._stubs)]
+
+    def channels(self):
+        return [stubs.channel for stubs in self._stubs]
+
+
+class _ClientBase:
+    def __init__(self, pool, retry, timeouts, hedge_delay, max_hedges):
+        self.pool = pool
+        self.retry = retry
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.hedge_delay = hedge_delay
+        self.max_hedges = max_hedges
+
+    @staticmethod
+    def _env_options():
+        hedge_delay = float(os.environ.get("POLLING_HEDGE_DELAY", 0))
+        return dict(
+            target=os.environ.get("POLLING_TARGET", DEFAULT_TARGET),
+            channels=int(os.environ.get("POLLING_CHANNELS", DEFAULT_CHANNELS)),
+            retry=RetryPolicy(max_attempts=int(os.environ.get("POLLING_MAX_ATTEMPTS", 3))),
+            hedge_delay=hedge_delay or None,
+        )
+
+    def _deadline(self, method, timeout):
+        timeout = self.timeouts.get(method) if timeout is None else timeout
+        return None if timeout is None else time.monotonic() + timeout
+
+    @staticmethod
+    def _remaining(deadline):
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def _retry_delay(self, method, error, attempt, deadline):
+        """Seconds to wait before resending, None to give up with ``error``."""
+        if attempt >= self.retry.max_attempts or not self.retry.retryable(method, error):
+            return None
+        delay = self.retry.backoff(attempt)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _stub_method(self, service, method):
+        """The next channel's multi-callable for ``method``."""
+        return getattr(getattr(self.pool.next(), service), method)
+
+    @staticmethod
+    def _argument(method, request):
+        ## a request stream is kept as a list, so it can be sent again
+        return iter(request) if method == "BulkCastVote" else request
+
+    def _hedging(self, method):
+        return method == "GetPollResults" and self.hedge_delay is not None and self.max_hedges > 0
+
+    @staticmethod
+    def _vote_request(uuid, user_id, option="", option_index=None):
+        return polling_pb2.CastVoteRequest(uuid=uuid, userID=user_id, select_options=option, option_index=option_index)
+
+
+class PollingClient(_ClientBase):
+    """
+    Blocking client, safe to share between threads.  Every method takes
+    ``timeout=`` (seconds, all attempts) and ``metadata=``; failures raise
+    ``grpc.RpcError`` as the stubs do.
+    """
+
+    def __init__(self, target=DEFAULT_TARGET, channels=DEFAULT_CHANNELS, retry=None, timeouts=None,
+                 hedge_delay=None, max_hedges=1, options=None):
+        super().__init__(ChannelPool(target, channels, options), RetryPolicy() if retry is None else retry,
+                         timeouts, hedge_delay, max_hedges)
+
+    @classmethod
+    def from_env(cls, **overrides):
+        return cls(**dict(cls._env_options(), **overrides))
+
+    def close(self):
+        for channel in self.pool.channels():
+            channel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _call(self, service, method, request, timeout=None, metadata=None):
+        deadline = self._deadline(method, timeout)
+        attempt = 1
+        while True:
+            try:
+                if self._hedging(method):
+                    return self._hedged(service, method, request, deadline, metadata)
+                return self._stub_method(service, method)(
+                    self._argument(method, request), timeout=self._remaining(deadline), metadata=metadata)
+            except grpc.RpcError as e:
+                delay = self._retry_delay(method, e, attempt, deadline)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    def _hedged(self, service, method, request, deadline, metadata):
+        """
+        First successful reply of up to ``1 + max_hedges`` calls, each sent
+        ``hedge_delay`` after the last or as soon as the others all failed.
+        A failure that wouldn't be retried is raised at once.
+        """
+        replies = queue.Queue()
+        calls = []
+        pending = 0
+        try:
+            while True:
+                if not pending or len(calls) <= self.max_hedges:
+                    call = self._stub_method(service, method).future(
+                        request, timeout=self._remaining(deadline), metadata=metadata)
+                    call.add_done_callback(replies.put)
+                    calls.append(call)
+                    pending += 1
+                try:
+                    done = replies.get(timeout=self.hedge_delay if len(calls) <= self.max_hedges else None)
+                except queue.Empty:
+                    continue
+                pending -= 1
+                if done.code() == grpc.StatusCode.OK:
+                    return done.result()
+                ## another channel would answer the same
+                if not self.retry.retryable(method, done.exception()):
+                    raise done.exception()
+                if not pending and len(calls) > self.max_hedges:
+                    raise done.exception()
+        finally:
+            for call in calls:
+                call.cancel()
+
+    def create_poll(self, question, options, tally_shards=0, **kwargs):
+        request = polling_pb2.CreatePollRequest(poll_questions=question, options=options, tally_shards=tally_shards)
+        return self._call("poll", "CreatePoll", request, **kwargs)
+
+    def list_polls(self, page_size=0, page_token="", consistency_token="", **kwargs):
+        request = polling_pb2.ListPollsRequest(page_size=page_size, page_token=page_token,
+                                               consistency_token=consistency_token)
+        return self._call("poll", "ListPolls", request, **kwargs)
+
+    def stream_polls(self, chunk_size=0, consistency_token="", timeout=None, metadata=None):
+        """Iterator over every poll; a stream is not retried."""
+        request = polling_pb2.StreamPollsRequest(chunk_size=chunk_size, consistency_token=consistency_token)
+        return self.pool.next().poll.StreamPolls(
+            request, timeout=self._remaining(self._deadline("StreamPolls", timeout)), metadata=metadata)
+
+    def close_poll(self, uuid, **kwargs):
+        return self._call("poll", "ClosePoll", polling_pb2.PollRequest(uuid=uuid), **kwargs)
+
+    def cast_vote(self, uuid, user_id, option="", option_index=None, **kwargs):
+        """``VoteResponse``; see ``vote_accepted()``."""
+        return self._call("vote", "CastVote", self._vote_request(uuid, user_id, option, option_index), **kwargs)
+
+    def bulk_cast_vote(self, votes, **kwargs):
+        """
+        ``CastVoteRequest``s in one stream.  Kept in memory, so a failed call
+        is resent whole: the votes that already made it come back
+        ``duplicate_vote``.
+        """
+        return self._call("vote", "BulkCastVote", list(votes), **kwargs)
+
+    def get_poll_results(self, uuid, consistency_token="", counts_only=False, **kwargs):
+        request = polling_pb2.PollRequest(uuid=uuid, consistency_token=consistency_token, counts_only=counts_only)
+        return self._call("result", "GetPollResults", request, **kwargs)
+
+    def watch_poll_results(self, uuid, timeout=None, metadata=None):
+        """Iterator over live tally updates; no deadline unless given one."""
+        return self.pool.next().result.WatchPollResults(
+            polling_pb2.PollRequest(uuid=uuid), timeout=self._remaining(self._deadline("WatchPollResults", timeout)),
+            metadata=metadata)
+
+
+class AsyncPollingClient(_ClientBase):
+    """The same client for asyncio code, on ``grpc.aio`` channels; create it inside the running loop."""
+
+    def __init__(self, target=DEFAULT_TARGET, channels=DEFAULT_CHANNELS, retry=None, timeouts=None,
+                 hedge_delay=None, max_hedges=1, options=None):
+        super().__init__(ChannelPool(target, channels, options, channel=grpc.aio.insecure_channel),
+                         RetryPolicy() if retry is None else retry, timeouts, hedge_delay, max_hedges)
+
+    @classmethod
+    def from_env(cls, **overrides):
+        return cls(**dict(cls._env_options(), **overrides))
+
+    async def close(self):
+        await asyncio.gather(*(channel.close() for channel in self.pool.channels()))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def _call(self, service, method, request, timeout=None, metadata=None):
+        deadline = self._deadline(method, timeout)
+        attempt = 1
+        while True:
+            try:
+                if self._hedging(method):
+                    return await self._hedged(service, method, request, deadline, metadata)
+                return await self._stub_method(service, method)(
+                    self._argument(method, request), timeout=self._remaining(deadline), metadata=metadata)
+            except grpc.aio.AioRpcError as e:
+                delay = self._retry_delay(method, e, attempt, deadline)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _hedged(self, service, method, request, deadline, metadata):
+        pending = set()
+        started = 0
+        try:
+            while True:
+                if not pending or started <= self.max_hedges:
+                    pending.add(asyncio.ensure_future(self._stub_method(service, method)(
+                        request, timeout=self._remaining(deadline), metadata=metadata)))
+                    started += 1
+                done, pending = await asyncio.wait(pending, timeout=self.hedge_delay if started <= self.max_hedges else None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    ## exception() raises on a cancelled task (its channel was closed)
+                    if task.cancelled():
+                        error = asyncio.CancelledError()
+                    elif task.exception() is None:
+                        return task.result()
+                    else:
+                        error = task.exception()
+                        if not self.retry.retryable(method, error):
+                            raise error
+                if not pending and started > self.max_hedges:
+                    raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def create_poll(self, question, options, tally_shards=0, **kwargs):
+        request = polling_pb2.CreatePollRequest(poll_questions=question, options=options, tally_shards=tally_shards)
+        return await self._call("poll", "CreatePoll", request, **kwargs)
+
+    async def list_polls(self, page_size=0, page_token="", consistency_token="", **kwargs):
+        request = polling_pb2.ListPollsRequest(page_size=page_size, page_token=page_token,
+                                               consistency_token=consistency_token)
+        return await self._call("poll", "ListPolls", request, **kwargs)
+
+    def stream_polls(self, chunk_size=0, consistency_token="", timeout=None, metadata=None):
+        """``async for`` over every poll; a stream is not retried."""
+        request = polling_pb2.StreamPollsRequest(chunk_size=chunk_size, consistency_token=consistency_token)
+        return self.pool.next().poll.StreamPolls(
+            request, timeout=self._remaining(self._deadline("StreamPolls", timeout)), metadata=metadata)
+
+    async def close_poll(self, uuid, **kwargs):
+        return await self._call("poll", "ClosePoll", polling_pb2.PollRequest(uuid=uuid), **kwargs)
+
+    async def cast_vote(self, uuid, user_id, option="", option_index=None, **kwargs):
+        return await self._call("vote", "CastVote", self._vote_request(uuid, user_id, option, option_index), **kwargs)
+
+    async def bulk_cast_vote(self, votes, **kwargs):
+        return await self._call("vote", "BulkCastVote", list(votes), **kwargs)
+
+    async def get_poll_results(self, uuid, consistency_token="", counts_only=False, **kwargs):
+        request = polling_pb2.PollRequest(uuid=uuid, consistency_token=consistency_token, counts_only=counts_only)
+        return await self._call("result", "GetPollResults", request, **kwargs)
+
+    def watch_poll_results(self, uuid, timeout=None, metadata=None):
+        """``async for`` over live tally updates; no deadline unless given one."""
+        return self.pool.next().result.WatchPollResults(
+            polling_pb2.PollRequest(uuid=uuid), timeout=self._remaining(self._deadline("WatchPollResults", timeout)),
+            metadata=metadata)
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rpolling.proto\x12\x07polling\"\x07\n\x05\x45mpty\"<\n\x11\x43reatePollRequest\x12\x16\n\x0epoll_questions\x18\x01 \x01(\t\x12\x0f\n\x07options\x18\x02 \x03(\t\"m\n\x0cPollResponse\x12\x0c\n\x04uuid\x18\x01 \x01(\t\x12\x16\n\x0epoll_questions\x18\x02 \x01(\t\x12\x0f\n\x07options\x18\x03 \x03(\t\x12\x0e\n\x06status\x18\x04 \x01(\t\x12\x16\n\x0e\x63reate_at_time\x18\x05 \x01(\t\"\x1b\n\x0bPollRequest\x12\x0c\n\x04uuid\x18\x01 \x01(\t\"9\n\x11ListPollsResponse\x12$\n\x05polls\x18\x01 \x03(\x0b\x32\x15.polling.PollResponse\"G\n\x0f\x43\x61stVoteRequest\x12\x0c\n\x04uuid\x18\x01 \x01(\t\x12\x0e\n\x06userID\x18\x02 \x01(\t\x12\x16\n\x0eselect_options\x18\x03 \x01(\t\"\x1e\n\x0cVoteResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\"\xa5\x01\n\x12PollResultResponse\x12\x0c\n\x04uuid\x18\x01 \x01(\t\x12\x16\n\x0epoll_questions\x18\x02 \x01(\t\x12\x39\n\x07results\x18\x03 \x03(\x0b\x32(.polling.PollResultResponse.ResultsEntry\x1a.\n\x0cResultsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x05:\x02\x38\x01\x32\xc1\x01\n\x0bPollService\x12?\n\nCreatePoll\x12\x1a.polling.CreatePollRequest\x1a\x15.polling.PollResponse\x12\x37\n\tListPolls\x12\x0e.polling.Empty\x1a\x1a.polling.ListPollsResponse\x12\x38\n\tClosePoll\x12\x14.polling.PollRequest\x1a\x15.polling.PollResponse2J\n\x0bVoteService\x12;\n\x08\x43\x61stVote\x12\x18.polling.CastVoteRequest\x1a\x15.polling.VoteResponse2T\n\rResultService\x12\x43\n\x0eGetPollResults\x12\x14.polling.PollRequest\x1a\x1b.polling.PollResultResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rpolling.proto\x12\x07polling\"\x07\n\x05\x45mpty\"R\n\x11\x43reatePollRequest\x12\x16\n\x0epoll_questions\x18\x01 \x01(\t\x12\x0f\n\x07options\x18\x02 \x03(\t\x12\x14\n\x0ctally_shards\x18\x03 \x01(\x05\"\x88\x01\n\x0cPollResponse\x12\x0c\n\x04uuid\x18\x01 \x01(\t\x12\x16\n\x0epoll_questions\x18\x02 \x01(\t\x12\x0f\n\x07options\x18\x03 \x03(\t\x12\x0e\n\x06status\x18\x04 \x01(\t\x12\x16\n\x0e\x63reate_at_time\x18\x05 \x01(\t\x12\x19\n\x11\x63onsistency_token\x18\x06 \x01(\t\"K\n\x0bPollRequest\x12\x0c\n\x04uuid\x18\x01 \x01(\t\x12\x19\n\x11\x63onsistency_token\x18\x02 \x01(\t\x12\x13\n\x0b\x63ounts_only\x18\x03 \x01(\x08\"T\n\x10ListPollsRequest\x12\x11\n\tpage_size\x18\x01 \x01(\x05\x12\x12\n\npage_token\x18\x02 \x01(\t\x12\x19\n\x11\x63onsistency_token\x18\x03 \x01(\t\"R\n\x11ListPollsResponse\x12$\n\x05polls\x18\x01 \x03(\x0b\x32\x15.polling.PollResponse\x12\x17\n\x0fnext_page_token\x18\x02 \x01(\t\"C\n\x12StreamPollsRequest\x12\x12\n\nchunk_size\x18\x01 \x01(\x05\x12\x19\n\x11\x63onsistency_token\x18\x02 \x01(\t\"s\n\x0f\x43\x61stVoteRequest\x12\x0c\n\x04uuid\x18\x01 \x01(\t\x12\x0e\n\x06userID\x18\x02 \x01(\t\x12\x16\n\x0eselect_options\x18\x03 \x01(\t\x12\x19\n\x0coption_index\x18\x04 \x01(\x05H\x00\x88\x01\x01\x42\x0f\n\r_option_index\"9\n\x0cVoteResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x19\n\x11\x63onsistency_token\x18\x02 \x01(\t\"k\n\x14\x42ulkCastVoteResponse\x12&\n\x07results\x18\x01 \x03(\x0b\x32\x15.polling.VoteResponse\x12\x10\n\x08\x61\x63\x63\x65pted\x18\x02 \x01(\x05\x12\x19\n\x11\x63onsistency_token\x18\x03 \x01(\t\"\xb5\x01\n\x12PollResultResponse\x12\x0c\n\x04uuid\x18\x01 \x01(\t\x12\x16\n\x0epoll_questions\x18\x02 \x01(\t\x12\x39\n\x07results\x18\x03 \x03(\x0b\x32(.polling.PollResultResponse.ResultsEntry\x12\x0e\n\x06\x63ounts\x18\x04 \x03(\x03\x1a.\n\x0cResultsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x05:\x02\x38\x01\x32\x91\x02\n\x0bPollService\x12?\n\nCreatePoll\x12\x1a.polling.CreatePollRequest\x1a\x15.polling.PollResponse\x12\x42\n\tListPolls\x12\x19.polling.ListPollsRequest\x1a\x1a.polling.ListPollsResponse\x12\x43\n\x0bStreamPolls\x12\x1b.polling.StreamPollsRequest\x1a\x15.polling.PollResponse0\x01\x12\x38\n\tClosePoll\x12\x14.polling.PollRequest\x1a\x15.polling.PollResponse2\x95\x01\n\x0bVoteService\x12;\n\x08\x43\x61stVote\x12\x18.polling.CastVoteRequest\x1a\x15.polling.VoteResponse\x12I\n\x0c\x42ulkCastVote\x12\x18.polling.CastVoteRequest\x1a\x1d.polling.BulkCastVoteResponse(\x01\x32\x9d\x01\n\rResultService\x12\x43\n\x0eGetPollResults\x12\x14.polling.PollRequest\x1a\x1b.polling.PollResultResponse\x12G\n\x10WatchPollResults\x12\x14.polling.PollRequest\x1a\x1b.polling.PollResultResponse0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -36,25 +36,31 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_EMPTY']._serialized_start=26
   _globals['_EMPTY']._serialized_end=33
   _globals['_CREATEPOLLREQUEST']._serialized_start=35
-  _globals['_CREATEPOLLREQUEST']._serialized_end=95
-  _globals['_POLLRESPONSE']._serialized_start=97
-  _globals['_POLLRESPONSE']._serialized_end=206
-  _globals['_POLLREQUEST']._serialized_start=208
-  _globals['_POLLREQUEST']._serialized_end=235
-  _globals['_LISTPOLLSRESPONSE']._serialized_start=237
-  _globals['_LISTPOLLSRESPONSE']._serialized_end=294
-  _globals['_CASTVOTEREQUEST']._serialized_start=296
-  _globals['_CASTVOTEREQUEST']._serialized_end=367
-  _globals['_VOTERESPONSE']._serialized_start=369
-  _globals['_VOTERESPONSE']._serialized_end=399
-  _globals['_POLLRESULTRESPONSE']._serialized_start=402
-  _globals['_POLLRESULTRESPONSE']._serialized_end=567
-  _globals['_POLLRESULTRESPONSE_RESULTSENTRY']._serialized_start=521
-  _globals['_POLLRESULTRESPONSE_RESULTSENTRY']._serialized_end=567
-  _globals['_POLLSERVICE']._serialized_start=570
-  _globals['_POLLSERVICE']._serialized_end=763
-  _globals['_VOTESERVICE']._serialized_start=765
-  _globals['_VOTESERVICE']._serialized_end=839
-  _globals['_RESULTSERVICE']._serialized_start=841
-  _globals['_RESULTSERVICE']._serialized_end=925
+  _globals['_CREATEPOLLREQUEST']._serialized_end=117
+  _globals['_POLLRESPONSE']._serialized_start=120
+  _globals['_POLLRESPONSE']._serialized_end=256
+  _globals['_POLLREQUEST']._serialized_start=258
+  _globals['_POLLREQUEST']._serialized_end=333
+  _globals['_LISTPOLLSREQUEST']._serialized_start=335
+  _globals['_LISTPOLLSREQUEST']._serialized_end=419
+  _globals['_LISTPOLLSRESPONSE']._serialized_start=421
+  _globals['_LISTPOLLSRESPONSE']._serialized_end=503
+  _globals['_STREAMPOLLSREQUEST']._serialized_start=505
+  _globals['_STREAMPOLLSREQUEST']._serialized_end=572
+  _globals['_CASTVOTEREQUEST']._serialized_start=574
+  _globals['_CASTVOTEREQUEST']._serialized_end=689
+  _globals['_VOTERESPONSE']._serialized_start=691
+  _globals['_VOTERESPONSE']._serialized_end=748
+  _globals['_BULKCASTVOTERESPONSE']._serialized_start=750
+  _globals['_BULKCASTVOTERESPONSE']._serialized_end=857
+  _globals['_POLLRESULTRESPONSE']._serialized_start=860
+  _globals['_POLLRESULTRESPONSE']._serialized_end=1041
+  _globals['_POLLRESULTRESPONSE_RESULTSENTRY']._serialized_start=995
+  _globals['_POLLRESULTRESPONSE_RESULTSENTRY']._serialized_end=1041
+  _globals['_POLLSERVICE']._serialized_start=1044
+  _globals['_POLLSERVICE']._serialized_end=1317
+  _globals['_VOTESERVICE']._serialized_start=1320
+  _globals['_VOTESERVICE']._serialized_end=1469
+  _globals['_RESULTSERVICE']._serialized_start=1472
+  _globals['_RESULTSERVICE']._serialized_end=1629
 # @@protoc_insertion_point(module_scope)
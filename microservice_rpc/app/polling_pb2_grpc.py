@@ -43,9 +43,14 @@ class PollServiceStub(object):
                 _registered_method=True)
         self.ListPolls = channel.unary_unary(
                 '/polling.PollService/ListPolls',
-                request_serializer=polling__pb2.Empty.SerializeToString,
+                request_serializer=polling__pb2.ListPollsRequest.SerializeToString,
                 response_deserializer=polling__pb2.ListPollsResponse.FromString,
                 _registered_method=True)
+        self.StreamPolls = channel.unary_stream(
+                '/polling.PollService/StreamPolls',
+                request_serializer=polling__pb2.StreamPollsRequest.SerializeToString,
+                response_deserializer=polling__pb2.PollResponse.FromString,
+                _registered_method=True)
         self.ClosePoll = channel.unary_unary(
                 '/polling.PollService/ClosePoll',
                 request_serializer=polling__pb2.PollRequest.SerializeToString,
@@ -66,7 +71,14 @@ class PollServiceServicer(object):
         raise NotImplementedError('Method not implemented!')
 
     def ListPolls(self, request, context):
-        """list all polls 
+        """list polls newest first, one page at a time (keyset pagination)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamPolls(self, request, context):
+        """stream every poll newest first, read from a server-side cursor in chunks
         """
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
@@ -89,9 +101,14 @@ def add_PollServiceServicer_to_server(servicer, server):
             ),
             'ListPolls': grpc.unary_unary_rpc_method_handler(
                     servicer.ListPolls,
-                    request_deserializer=polling__pb2.Empty.FromString,
+                    request_deserializer=polling__pb2.ListPollsRequest.FromString,
                     response_serializer=polling__pb2.ListPollsResponse.SerializeToString,
             ),
+            'StreamPolls': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamPolls,
+                    request_deserializer=polling__pb2.StreamPollsRequest.FromString,
+                    response_serializer=polling__pb2.PollResponse.SerializeToString,
+            ),
             'ClosePoll': grpc.unary_unary_rpc_method_handler(
                     servicer.ClosePoll,
                     request_deserializer=polling__pb2.PollRequest.FromString,
@@ -152,7 +169,7 @@ class PollService(object):
             request,
             target,
             '/polling.PollService/ListPolls',
-            polling__pb2.Empty.SerializeToString,
+            polling__pb2.ListPollsRequest.SerializeToString,
             polling__pb2.ListPollsResponse.FromString,
             options,
             channel_credentials,
@@ -164,6 +181,33 @@ class PollService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def StreamPolls(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/polling.PollService/StreamPolls',
+            polling__pb2.StreamPollsRequest.SerializeToString,
+            polling__pb2.PollResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def ClosePoll(request,
             target,
@@ -208,6 +252,11 @@ class VoteServiceStub(object):
                 request_serializer=polling__pb2.CastVoteRequest.SerializeToString,
                 response_deserializer=polling__pb2.VoteResponse.FromString,
                 _registered_method=True)
+        self.BulkCastVote = channel.stream_unary(
+                '/polling.VoteService/BulkCastVote',
+                request_serializer=polling__pb2.CastVoteRequest.SerializeToString,
+                response_deserializer=polling__pb2.BulkCastVoteResponse.FromString,
+                _registered_method=True)
 
 
 class VoteServiceServicer(object):
@@ -221,6 +270,13 @@ class VoteServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def BulkCastVote(self, request_iterator, context):
+        """stream many votes in one call, written in batches; one status per vote
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_VoteServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -229,6 +285,11 @@ def add_VoteServiceServicer_to_server(servicer, server):
                     request_deserializer=polling__pb2.CastVoteRequest.FromString,
                     response_serializer=polling__pb2.VoteResponse.SerializeToString,
             ),
+            'BulkCastVote': grpc.stream_unary_rpc_method_handler(
+                    servicer.BulkCastVote,
+                    request_deserializer=polling__pb2.CastVoteRequest.FromString,
+                    response_serializer=polling__pb2.BulkCastVoteResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'polling.VoteService', rpc_method_handlers)
@@ -269,6 +330,33 @@ class VoteService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def BulkCastVote(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/polling.VoteService/BulkCastVote',
+            polling__pb2.CastVoteRequest.SerializeToString,
+            polling__pb2.BulkCastVoteResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class ResultServiceStub(object):
     """service manage getpoll result 
@@ -285,6 +373,11 @@ class ResultServiceStub(object):
                 request_serializer=polling__pb2.PollRequest.SerializeToString,
                 response_deserializer=polling__pb2.PollResultResponse.FromString,
                 _registered_method=True)
+        self.WatchPollResults = channel.unary_stream(
+                '/polling.ResultService/WatchPollResults',
+                request_serializer=polling__pb2.PollRequest.SerializeToString,
+                response_deserializer=polling__pb2.PollResultResponse.FromString,
+                _registered_method=True)
 
 
 class ResultServiceServicer(object):
@@ -297,6 +390,14 @@ class ResultServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def WatchPollResults(self, request, context):
+        """live tallies: full results first, then only the options whose count changed;
+        ends after the final tallies once the poll is closed
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_ResultServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -305,6 +406,11 @@ def add_ResultServiceServicer_to_server(servicer, server):
                     request_deserializer=polling__pb2.PollRequest.FromString,
                     response_serializer=polling__pb2.PollResultResponse.SerializeToString,
             ),
+            'WatchPollResults': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchPollResults,
+                    request_deserializer=polling__pb2.PollRequest.FromString,
+                    response_serializer=polling__pb2.PollResultResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'polling.ResultService', rpc_method_handlers)
@@ -343,3 +449,30 @@ class ResultService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def WatchPollResults(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/polling.ResultService/WatchPollResults',
+            polling__pb2.PollRequest.SerializeToString,
+            polling__pb2.PollResultResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -5,24 +5,55 @@ from concurrent import futures
 import grpc
 import psycopg2  ## database
 import os
+import signal
 
 
 
 ## gRPC function
 import polling_pb2
 import polling_pb2_grpc
+import pagination
+import deadlines
+import tally_shards
+import tracing
+
+from admission import AdmissionController, AdmissionInterceptor
+from deadlines import DeadlineInterceptor
+from db_pool import DBConnectionPool, start_stats_reporter
+from duplicate_filter import KNOWN, SAMPLE, DuplicateVoteFilter
+from final_results import FinalResultsCache
+from metrics import MetricsInterceptor, RpcMetrics, metrics_port, phase, start_http_server
+from option_ids import MAX_OPTIONS, resolve_vote, result_fields, tally_counts
+from poll_cache import PollMetadataCache
+from results_cache import ResultsCache
+from replica_router import ReplicaRouter, commit_lsn, parse_replica_hosts
+from results_watch import PENDING_CALL_OPTIONS, ResultsWatchHub, StreamExecutorInterceptor, WatchLimitExceeded
+from tracing import Tracer
+from vote_batcher import DUPLICATE, POLL_CLOSED, VOTED, VoteBatcher
+from worker_supervisor import resolve_worker_count, run_workers
+
+## executor threads for unary calls; the db pool is sized to match so a thread never waits on a connection
+MAX_WORKERS = 10
+## primary connections held outside any call: the vote batcher's flusher, the watch poller,
+## the replica lag checker and the duplicate-filter preload (on the primary with no replica)
+BACKGROUND_CONNECTIONS = 4
+## every open WatchPollResults stream holds a thread (but no db connection) for its
+## whole life, on an executor of its own with this many threads
+WATCH_MAX_STREAMS = int(os.environ.get("WATCH_MAX_STREAMS", 1000))
+## BulkCastVote writes every BULK_VOTE_CHUNK votes in one transaction
+BULK_VOTE_CHUNK = int(os.environ.get("BULK_VOTE_CHUNK", 1000))
+## one status per vote comes back in a single message, keep it well under 4MB
+BULK_VOTE_MAX = int(os.environ.get("BULK_VOTE_MAX", 100000))
+
+## votes per option id (option_ids.py); vote_tally is kept in step with `vote`
+## by triggers: O(options x shards) rows, not a scan
+TALLY_SQL = "SELECT option_id, SUM(votes)::bigint FROM vote_tally WHERE uuid = %s GROUP BY option_id"
 
 
 def test_connection():
     try:
         print('Connecting to the PostgreSQL database...')
-        connection = psycopg2.connect(
-            dbname = "pollsdb",
-            user="postgres",
-            password="postgres",
-            host ="db-primary",
-            port =5432
-        )
+        connection = psycopg2.connect(**DB_CONFIG)
         cursor = connection.cursor()
         # execute a statement
         print('PostgreSQL database version:')
@@ -41,143 +72,481 @@ def test_connection():
             connection.close()
             print("PostgreSQL connection closed.")
 
-def get_db_connection():
-    return psycopg2.connect(
-            dbname = "pollsdb",
-            user="postgres",
-            password="postgres",
-            host ="db-primary",
-            port =5432
-        )
 
+DB_CONFIG = dict(
+    dbname = "pollsdb",
+    user="postgres",
+    password="postgres",
+    host =os.environ.get("DB_PRIMARY_HOST", "db-primary"),
+    port =int(os.environ.get("DB_PRIMARY_PORT", 5432))
+)
+
+
+def create_db_pool(maxconn=None, **overrides):
+    return DBConnectionPool(
+        ## one connection per executor thread plus the background users
+        maxconn=maxconn or int(os.environ.get("DB_POOL_SIZE", MAX_WORKERS + BACKGROUND_CONNECTIONS)),
+        minconn=int(os.environ.get("DB_POOL_MIN", 0)),
+        checkout_timeout=float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        health_check_interval=float(os.environ.get("DB_POOL_HEALTH_CHECK", 30)),
+        **dict(DB_CONFIG, **overrides),
+    )
+
+
+def create_replica_router(pool):
+    ## DB_REPLICA_HOSTS="" sends every read to the primary
+    replicas = {
+        f"{host}:{port}": create_db_pool(
+            maxconn=int(os.environ.get("DB_REPLICA_POOL_SIZE", MAX_WORKERS)),
+            host=host, port=port,
+            ## an unreachable replica must not stall the lag checker
+            connect_timeout=int(os.environ.get("DB_REPLICA_CONNECT_TIMEOUT", 2)),
+        )
+        for host, port in parse_replica_hosts(os.environ.get("DB_REPLICA_HOSTS", "db-replica"))
+    }
+    return ReplicaRouter(
+        pool, replicas,
+        max_lag=float(os.environ.get("REPLICA_MAX_LAG", 1.0)),
+        check_interval=float(os.environ.get("REPLICA_CHECK_INTERVAL", 1.0)),
+    )
+
+
+def invalid_token(context, error):
+    context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+    context.set_details(str(error))
+
+
+def fetch_poll_meta(pool, poll_cache, poll_uuid):
+    """Poll question/status/options from the metadata cache, or the database on a miss."""
+    meta = poll_cache.get(poll_uuid)
+    if meta is not None:
+        return meta
+    with tracing.span("poll_meta.load"), pool.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT poll_questions, status, options FROM poll WHERE uuid=%s",
+                    (poll_uuid,)) ## add ,  to let driver recongize tuple. 
+        data = cur.fetchone()
+        cur.close()
+    if data is None:
+        return None
+    return poll_cache.put(poll_uuid, *data)
 
 
 class PollServiceImpl(polling_pb2_grpc.PollServiceServicer):
 
+    def __init__(self, pool, router, results_cache, poll_cache, final_cache, dup_filter):
+        self.pool = pool
+        self.router = router
+        self.results_cache = results_cache
+        self.poll_cache = poll_cache
+        self.final_cache = final_cache
+        self.dup_filter = dup_filter
+
     # create . list and close
     def CreatePoll(self, request, context):
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO poll (poll_questions, options) VALUES (%s, %s) RETURNING uuid, poll_questions, options, status, create_at_time",
-            (request.poll_questions, list(request.options)), ## maybe list(options)
-        )
-        i = cur.fetchone()
-        conn.commit()
-        cur.close()
-        conn.close()
-
-        return polling_pb2.PollResponse(uuid=str(i[0]), poll_questions=i[1], options=i[2], status=i[3], create_at_time=str(i[4]))
-
-    ## listpoll 
+        ## an option's id is its position in `options`, stored as SMALLINT
+        if len(request.options) > MAX_OPTIONS:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"at most {MAX_OPTIONS} options per poll")
+            return polling_pb2.PollResponse()
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO poll (poll_questions, options, tally_shards) VALUES (%s, %s, %s) RETURNING uuid, poll_questions, options, status, create_at_time",
+                (request.poll_questions, list(request.options), tally_shards.shard_count(request.tally_shards)), ## maybe list(options)
+            )
+            i = cur.fetchone()
+            cur.close()
+            conn.commit()
+            token = commit_lsn(conn)
+        ## warm the cache, the first votes usually follow right away
+        self.poll_cache.put(str(i[0]), i[1], i[3], i[2])
+
+        return polling_pb2.PollResponse(uuid=str(i[0]), poll_questions=i[1], options=i[2], status=i[3], create_at_time=str(i[4]),
+                                        consistency_token=token or "")
+
+    ## listpoll: one page, keyset paginated on (create_at_time, uuid)
     def ListPolls(self, request, context):
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT uuid, poll_questions, options, status, create_at_time FROM poll ORDER BY create_at_time DESC"
-        )
-        polls_data = cur.fetchall()
-        cur.close()
-        conn.close()
-        polls_list = [polling_pb2.PollResponse(uuid=str(r[0]),poll_questions=r[1],options=r[2], status=r[3]) for r in polls_data]
-
-        return polling_pb2.ListPollsResponse(polls=polls_list) ## must polls = poll_list
+        limit = pagination.page_size(request.page_size)
+        where, params = "", ()
+        if request.page_token:
+            try:
+                created, last_uuid = pagination.decode_page_token(request.page_token)
+            except ValueError as e:
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                context.set_details(str(e))
+                return polling_pb2.ListPollsResponse()
+            where, params = "WHERE (create_at_time, uuid) < (%s, %s)", (created, last_uuid)
+
+        def fetch_page(conn):
+            cur = conn.cursor()
+            ## one extra row tells us whether there is a next page
+            cur.execute(
+                f"SELECT uuid, poll_questions, options, status, create_at_time FROM poll {where} "
+                "ORDER BY create_at_time DESC, uuid DESC LIMIT %s",
+                params + (limit + 1,),
+            )
+            rows = cur.fetchall()
+            cur.close()
+            return rows
+
+        try:
+            polls_data = self.router.read(fetch_page, request.consistency_token)
+        except ValueError as e:
+            invalid_token(context, e)
+            return polling_pb2.ListPollsResponse()
+        next_page_token = ""
+        if len(polls_data) > limit:
+            polls_data = polls_data[:limit]
+            next_page_token = pagination.encode_page_token(polls_data[-1][4], polls_data[-1][0])
+        polls_list = [polling_pb2.PollResponse(uuid=str(r[0]),poll_questions=r[1],options=r[2], status=r[3], create_at_time=str(r[4])) for r in polls_data]
+
+        return polling_pb2.ListPollsResponse(polls=polls_list, next_page_token=next_page_token) ## must polls = poll_list
+
+    ## every poll, streamed from a server-side cursor so memory stays bounded
+    def StreamPolls(self, request, context):
+        chunk = pagination.chunk_size(request.chunk_size)
+        try:
+            pool = self.router.read_pool(request.consistency_token)
+        except ValueError as e:
+            invalid_token(context, e)
+            return
+        with pool.connection() as conn:
+            cur = conn.cursor(name="stream_polls")
+            cur.itersize = chunk
+            cur.execute(
+                "SELECT uuid, poll_questions, options, status, create_at_time FROM poll "
+                "ORDER BY create_at_time DESC, uuid DESC"
+            )
+            while True:
+                rows = cur.fetchmany(chunk)
+                if not rows:
+                    break
+                for r in rows:
+                    yield polling_pb2.PollResponse(uuid=str(r[0]), poll_questions=r[1], options=r[2], status=r[3], create_at_time=str(r[4]))
+            cur.close()
 
     ## close poll 
     def ClosePoll(self, request, context):
-        with get_db_connection() as conn:
+        with self.pool.connection() as conn:
             cur = conn.cursor()
-            cur.execute(
-                "UPDATE poll SET status = 'close' WHERE uuid=%s RETURNING uuid, poll_questions, options, status, create_at_time",
-                (request.uuid,))
-            data = cur.fetchone()
-            if data is None:
+            ## waits for votes in flight on this poll and holds off new ones, so
+            ## the tally read next is final (see final_results.py)
+            cur.execute("SELECT options FROM poll WHERE uuid=%s FOR UPDATE", (request.uuid,))
+            row = cur.fetchone()
+            if row is None:
                 context.set_code(grpc.StatusCode.NOT_FOUND)
                 context.set_details("poll not found")
                 return polling_pb2.PollResponse()
+            cur.execute(TALLY_SQL, (request.uuid,))
+            counts = tally_counts(len(row[0]), cur.fetchall())
+            ## closing twice keeps the first snapshot
+            cur.execute(
+                "UPDATE poll SET status = 'close', final_results = COALESCE(final_results, %s::bigint[]) WHERE uuid=%s "
+                "RETURNING uuid, poll_questions, options, status, create_at_time, final_results",
+                (counts, request.uuid))
+            data = cur.fetchone()
+            cur.close()
+            conn.commit()
+            token = commit_lsn(conn)
+        ## closed for good, no need to ever reload it from the database
+        self.poll_cache.put(request.uuid, data[1], data[3], data[2])
+        self.results_cache.invalidate(request.uuid)
+        self.final_cache.put(request.uuid, data[1], data[2], data[5])
+        self.dup_filter.drop(request.uuid)
         return polling_pb2.PollResponse(
             uuid=str(data[0]),
             poll_questions = data[1],
             options=data[2],
             status=data[3],
             create_at_time=str(data[4]),
+            consistency_token=token or "",
         )
 
 class VoteServiceImpl(polling_pb2_grpc.VoteServiceServicer):
     ## implements for voting 
 
+    def __init__(self, pool, batcher, results_cache, poll_cache, dup_filter):
+        self.pool = pool
+        self.batcher = batcher
+        self.results_cache = results_cache
+        self.poll_cache = poll_cache
+        self.dup_filter = dup_filter
+
     def CastVote(self, request, context):
-        ## connect to vote 
-        with get_db_connection() as conn: 
-            cur = conn.cursor()
-            cur.execute("SELECT status, options FROM poll WHERE uuid=%s",
-                        (request.uuid,)) ## add ,  to let driver recongize tuple. 
-            data = cur.fetchone()
-            if data is None:
-                return polling_pb2.VoteResponse(status="Poll Not Found")
-            status, options = data
-            if status != 'open':
-                return polling_pb2.VoteResponse(status="Poll Closed")
-            if request.select_options not in options:
-                return polling_pb2.VoteResponse(status="Invalid Option")
-            ## vote
-            try:
-                cur.execute(
-                    "INSERT INTO vote (userID, select_options, uuid) VALUES (%s,%s,%s)",
-                    (request.userID, request.select_options, request.uuid),
-                )
-            except Exception as e:
-                ## assume duplicate error 
-                conn.rollback()
-                if isinstance(e, psycopg2.errors.UniqueViolation):
-                    return polling_pb2.VoteResponse(status="duplicate_vote")
-                raise
-        return polling_pb2.VoteResponse(status="Vote Successfully!")
+        ## validate against cached metadata, no database round trip on a hit
+        meta = fetch_poll_meta(self.pool, self.poll_cache, request.uuid)
+        ## select_options or option_index -> the option id stored in `vote`
+        option_id, rejected = resolve_vote(meta, request)
+        if rejected:
+            return polling_pb2.VoteResponse(status=rejected)
+        ## a repeat of a vote the database already confirmed: no database work
+        seen = self.dup_filter.lookup(request.uuid, request.userID)
+        if seen == KNOWN:
+            return polling_pb2.VoteResponse(status="duplicate_vote", consistency_token=self.batcher.commit_lsn)
+        with self.results_cache.writing((request.uuid,)):
+            ## vote: queued for the next group commit, replied to once it is durable
+            with phase("vote_batch"):
+                outcome = deadlines.wait(self.batcher.submit(request.uuid, request.userID, option_id))
+            ## keep this node's cached tally exact
+            if outcome == VOTED:
+                self.results_cache.apply_vote(request.uuid, option_id)
+        ## pass back as PollRequest.consistency_token to read this vote from any node
+        token = self.batcher.commit_lsn
+        if outcome == POLL_CLOSED:
+            ## closed on the other node since the metadata was cached
+            self.poll_cache.put(request.uuid, meta.question, 'close', meta.options)
+            self.dup_filter.drop(request.uuid)
+            return polling_pb2.VoteResponse(status="Poll Closed", consistency_token=token)
+        self.dup_filter.record(request.uuid, request.userID, inserted=outcome == VOTED, sampled=seen == SAMPLE)
+        if outcome == DUPLICATE:
+            return polling_pb2.VoteResponse(status="duplicate_vote", consistency_token=token)
+        return polling_pb2.VoteResponse(status="Vote Successfully!", consistency_token=token)
+
+    def BulkCastVote(self, request_iterator, context):
+        ## chunks are written as they arrive; a failed call can be resent as a
+        ## whole, votes that already made it come back as duplicate_vote
+        statuses, chunk, metas = [], [], {}
+        for request in request_iterator:
+            if len(statuses) + len(chunk) >= BULK_VOTE_MAX:
+                context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+                context.set_details(f"at most {BULK_VOTE_MAX} votes per BulkCastVote call")
+                return polling_pb2.BulkCastVoteResponse()
+            chunk.append(request)
+            if len(chunk) >= BULK_VOTE_CHUNK:
+                statuses += self._cast_chunk(chunk, metas)
+                chunk = []
+        statuses += self._cast_chunk(chunk, metas)
+        return polling_pb2.BulkCastVoteResponse(
+            results=[polling_pb2.VoteResponse(status=status) for status in statuses],
+            accepted=statuses.count("Vote Successfully!"),
+            consistency_token=self.batcher.commit_lsn,
+        )
+
+    def _cast_chunk(self, chunk, metas):
+        statuses, valid = [], []
+        for i, request in enumerate(chunk):
+            ## per call, so a missing poll isn't looked up once per vote
+            if request.uuid not in metas:
+                metas[request.uuid] = fetch_poll_meta(self.pool, self.poll_cache, request.uuid)
+            option_id, rejected = resolve_vote(metas[request.uuid], request)
+            if not rejected:
+                seen = self.dup_filter.lookup(request.uuid, request.userID)
+                if seen == KNOWN:
+                    rejected = "duplicate_vote"
+                else:
+                    valid.append((i, option_id, seen == SAMPLE))
+            statuses.append(rejected)
+        with self.results_cache.writing({chunk[i].uuid for i, _, _ in valid}):
+            outcomes = self.batcher.write([(chunk[i].uuid, chunk[i].userID, option_id) for i, option_id, _ in valid])
+            for (i, option_id, _), outcome in zip(valid, outcomes):
+                if outcome == VOTED:
+                    self.results_cache.apply_vote(chunk[i].uuid, option_id)
+        for (i, option_id, sampled), outcome in zip(valid, outcomes):
+            if outcome == POLL_CLOSED:
+                statuses[i] = "Poll Closed"
+                continue
+            self.dup_filter.record(chunk[i].uuid, chunk[i].userID, inserted=outcome == VOTED, sampled=sampled)
+            statuses[i] = "duplicate_vote" if outcome == DUPLICATE else "Vote Successfully!"
+        return statuses
 
 ## getting result for poll
 class ResultServiceImpl(polling_pb2_grpc.ResultServiceServicer):
     ## implementation 
+    def __init__(self, pool, router, results_cache, poll_cache, final_cache, watch_hub):
+        self.pool = pool
+        self.router = router
+        self.results_cache = results_cache
+        self.poll_cache = poll_cache
+        self.final_cache = final_cache
+        self.watch_hub = watch_hub
+
     def GetPollResults(self, request, context):
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT poll_questions, options FROM poll WHERE uuid=%s",
-                    (request.uuid,))
-        data = cur.fetchone()
-        if not data:
+        ## a closed poll's results can't change, whatever the consistency token
+        cached = self.final_cache.get(request.uuid)
+        if cached is None:
+            ## a consistency token asks for a database read that has seen that write
+            cached = None if request.consistency_token else self.results_cache.get(request.uuid)
+        if cached is not None:
+            question, options, counts = cached
+            return polling_pb2.PollResultResponse(uuid=request.uuid, poll_questions=question,
+                                                  **result_fields(options, counts, request.counts_only))
+
+        token = self.results_cache.load_token(request.uuid)
+        meta = fetch_poll_meta(self.pool, self.poll_cache, request.uuid)
+        if meta is None:
             context.set_code(grpc.StatusCode.NOT_FOUND)
             context.set_details("Poll not found")
             return polling_pb2.PollResultResponse()
-        question, options = data
-        results = {option: 0 for option in options}
-        cur.execute("SELECT select_options, COUNT(*) FROM vote WHERE uuid = %s GROUP BY select_options",
-                    (request.uuid,))
-        vote_counts = cur.fetchall()
-        for option, count in vote_counts:
-            if option in results:
-                results[option] = count
-
-        cur.close()
-        conn.close()
-        return polling_pb2.PollResultResponse(uuid=request.uuid, poll_questions= question, results=results)
+        question = meta.question
+        if not meta.is_open:
+            final = self.fetch_final_results(request)
+            if final is not None:
+                self.final_cache.put(request.uuid, question, meta.options, final)
+                return polling_pb2.PollResultResponse(uuid=request.uuid, poll_questions=question,
+                                                      **result_fields(meta.options, final, request.counts_only))
+
+        def fetch_tally(conn):
+            cur = conn.cursor()
+            cur.execute(TALLY_SQL, (request.uuid,))
+            rows = cur.fetchall()
+            cur.close()
+            return rows
+
+        try:
+            ## served by a replica unless none is fresh enough
+            vote_counts, on_primary = self.router.read_with_source(fetch_tally, request.consistency_token)
+        except ValueError as e:
+            invalid_token(context, e)
+            return polling_pb2.PollResultResponse()
+        counts = tally_counts(len(meta.options), vote_counts)
+        ## a replica may not have replayed votes this node already counted into
+        ## the cache; votes bump entries in place, so such an entry stays short
+        if on_primary:
+            self.results_cache.put(request.uuid, question, meta.options, counts, token)
+
+        return polling_pb2.PollResultResponse(uuid=request.uuid, poll_questions= question,
+                                              **result_fields(meta.options, counts, request.counts_only))
+
+    def fetch_final_results(self, request):
+        """The snapshot ClosePoll stored, None if this read can't see it yet."""
+        def fetch(conn):
+            cur = conn.cursor()
+            cur.execute("SELECT final_results FROM poll WHERE uuid = %s", (request.uuid,))
+            row = cur.fetchone()
+            cur.close()
+            return row[0] if row else None
+
+        try:
+            return self.router.read(fetch, request.consistency_token)
+        except ValueError:
+            ## malformed token: the tally read below reports it
+            return None
+
+    def WatchPollResults(self, request, context):
+        meta = fetch_poll_meta(self.pool, self.poll_cache, request.uuid)
+        if meta is None:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details("Poll not found")
+            return
+        try:
+            subscription = self.watch_hub.subscribe(request.uuid)
+        except WatchLimitExceeded as e:
+            context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+            context.set_details(str(e))
+            return
+        ## wake the stream's thread as soon as the client goes away
+        if not context.add_callback(subscription.cancel):
+            subscription.cancel()
+        ## first message has every option, the rest only the options that changed
+        for results in subscription.updates():
+            yield polling_pb2.PollResultResponse(uuid=request.uuid, poll_questions=meta.question, results=results)
 
 
 
 
 def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    polling_pb2_grpc.add_PollServiceServicer_to_server(PollServiceImpl(), server)
-    polling_pb2_grpc.add_VoteServiceServicer_to_server(VoteServiceImpl(), server)
-    polling_pb2_grpc.add_ResultServiceServicer_to_server(ResultServiceImpl(), server)
+    ## one primary pool shared by all three servicers, reads may go to replica pools
+    pool = create_db_pool()
+    router = create_replica_router(pool).start()
+    ## write-behind vote ingestion, flushed on size or after a few ms
+    batcher = VoteBatcher(
+        pool,
+        max_batch=int(os.environ.get("VOTE_BATCH_SIZE", 100)),
+        max_delay=float(os.environ.get("VOTE_BATCH_DELAY_MS", 5)) / 1000,
+    ).start()
+    results_cache = ResultsCache.from_env()
+    poll_cache = PollMetadataCache.from_env()
+    final_cache = FinalResultsCache.from_env()
+    ## known voters per poll; rebuilt in the background, votes are served meanwhile
+    dup_filter = DuplicateVoteFilter.from_env()
+    if os.environ.get("DUP_FILTER_PRELOAD", "1") == "1":
+        dup_filter.start_preload(router.read_pool())
+    ## one tally poller per node feeds every WatchPollResults stream
+    watch_hub = ResultsWatchHub(
+        pool,
+        interval=float(os.environ.get("WATCH_RESULTS_INTERVAL_MS", 500)) / 1000,
+        max_watchers=WATCH_MAX_STREAMS,
+    ).start()
+
+    components = {
+        "vote-batcher": batcher.stats,
+        "results-cache": results_cache.stats,
+        "poll-cache": poll_cache.stats,
+        "final-results": final_cache.stats,
+        "dup-filter": dup_filter.stats,
+        "results-watch": watch_hub.stats,
+        "replicas": router.stats,
+    }
+    stats_interval = float(os.environ.get("DB_POOL_STATS_INTERVAL", 0))
+    if stats_interval > 0:
+        start_stats_reporter(pool, stats_interval, extra=components)
+
+    ## per-RPC latency / phase histograms, scraped from METRICS_PORT
+    rpc_metrics = RpcMetrics()
+    rpc_metrics.registry.add_stats(dict(components, **{"db-pool": pool.stats}))
+    ## sampled calls become traces (TRACE_EXPORT=file|otlp), None when off
+    tracer = Tracer.from_env("polling:50051")
+    if tracer is not None:
+        rpc_metrics.registry.add_stats({"tracing": tracer.stats})
+    executor = futures.ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    rpc_metrics.watch_executor(executor)
+    ## open watch streams can't starve unary calls of threads, nor pile them up on the db pool
+    stream_executor = futures.ThreadPoolExecutor(max_workers=WATCH_MAX_STREAMS, thread_name_prefix="watch-stream")
+    ## past these, calls are shed with RESOURCE_EXHAUSTED, low priorities first
+    admission = AdmissionController.from_env()
+    admission.add_env_signal("executor_queue", lambda: executor._work_queue.qsize(), "ADMISSION_MAX_QUEUE", 100)
+    admission.add_env_signal("pool_waiters", lambda: pool.waiting, "ADMISSION_MAX_POOL_WAITERS", 2 * pool.maxconn)
+    interceptors = [StreamExecutorInterceptor(stream_executor), MetricsInterceptor(rpc_metrics, tracer)]
+    if admission.enabled:
+        interceptors.append(AdmissionInterceptor(admission))
+        rpc_metrics.registry.add_stats({"admission": admission.stats})
+    ## stop working for calls whose client is gone or out of time
+    interceptors.append(DeadlineInterceptor())
+
+    ## SO_REUSEPORT lets every worker process bind the same port (GRPC_WORKERS > 1)
+    server = grpc.server(executor, interceptors=interceptors,
+                         options=[("grpc.so_reuseport", 1)] + PENDING_CALL_OPTIONS)
+    polling_pb2_grpc.add_PollServiceServicer_to_server(PollServiceImpl(pool, router, results_cache, poll_cache, final_cache, dup_filter), server)
+    polling_pb2_grpc.add_VoteServiceServicer_to_server(VoteServiceImpl(pool, batcher, results_cache, poll_cache, dup_filter), server)
+    polling_pb2_grpc.add_ResultServiceServicer_to_server(ResultServiceImpl(pool, router, results_cache, poll_cache, final_cache, watch_hub), server)
 
     server.add_insecure_port('[::]:50051')
     server.start()
 
     print("gRPC Voting server started on port 50051.")
+    port = metrics_port(50051)
+    if port:
+        start_http_server(rpc_metrics.registry, port)
+        print(f"Metrics on http://0.0.0.0:{port}/metrics")
+
+    ## docker stop / the worker supervisor send SIGTERM: drain in-flight RPCs first
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop(grace=5))
     server.wait_for_termination()
+    watch_hub.stop()
+    batcher.stop()
+    if tracer is not None:
+        tracer.close()
+    router.stop()
+    pool.closeall()
+
+
+def serve_aio():
+    ## asyncio mode, imported lazily so the threaded mode doesn't need asyncpg
+    import asyncio
+    import aio_server
+    asyncio.run(aio_server.serve(50051, DB_CONFIG, name="gRPC Voting server"))
 
 
 if __name__ == '__main__':
-    serve()
+    ## GRPC_SERVER_MODE=threaded (default) | aio
+    target = serve_aio if os.environ.get("GRPC_SERVER_MODE", "threaded") == "aio" else serve
+    ## GRPC_WORKERS=N | auto forks N supervised server processes on the same port
+    workers = resolve_worker_count(os.environ.get("GRPC_WORKERS"))
+    if workers > 1:
+        run_workers(target, workers)
+    else:
+        target()
 
 
 
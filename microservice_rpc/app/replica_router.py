@@ -0,0 +1,294 @@
+"""
+Read routing between the primary database and its streaming replicas.
+
+Writes, and the reads that validate them (poll metadata for ``CastVote``),
+always go to the primary.  ``GetPollResults``, ``ListPolls`` and
+``StreamPolls`` go to a replica when one is fresh enough:
+
+* a background checker measures each replica's replay lag every
+  ``check_interval`` seconds; a replica more than ``max_lag`` seconds behind
+  the primary, or unreachable, gets no reads until it has caught up;
+* a read carrying a consistency token (the primary WAL position returned by
+  ``CastVote``, ``BulkCastVote``, ``CreatePoll`` and ``ClosePoll``) only goes to
+  a replica that had replayed up to that position at its last check, and to
+  the primary otherwise, so a client always reads its own writes.
+
+``ReplicaRouter`` serves the threaded server, ``AsyncReplicaRouter`` the
+asyncio one.
+"""
+
+import asyncio
+import itertools
+import math
+import threading
+
+import psycopg2
+import psycopg2.extensions
+
+import deadlines
+from db_pool import PoolTimeout
+
+PRIMARY_LSN_SQL = "SELECT pg_current_wal_lsn()::text"
+## a server that isn't in recovery is a primary: it is never behind itself
+REPLICA_LAG_SQL = """
+    SELECT CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn() ELSE pg_current_wal_lsn() END::text,
+           EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8
+"""
+
+
+def parse_lsn(lsn):
+    """'16/B374D848' -> int; ValueError if it isn't a WAL position."""
+    high, sep, low = lsn.partition("/")
+    try:
+        if not sep:
+            raise ValueError
+        return (int(high, 16) << 32) + int(low, 16)
+    except ValueError:
+        raise ValueError(f"invalid consistency token: {lsn!r}") from None
+
+
+def parse_replica_hosts(value):
+    """'db-replica, db-replica-2:5433' -> [('db-replica', 5432), ('db-replica-2', 5433)]"""
+    hosts = []
+    for entry in value.split(","):
+        host, _, port = entry.strip().partition(":")
+        if host:
+            hosts.append((host, int(port or 5432)))
+    return hosts
+
+
+def commit_lsn(conn):
+    """
+    Primary WAL position right after the last commit on ``conn`` (psycopg2),
+    or None if it can't be read.  Runs outside a transaction: one round trip.
+    """
+    try:
+        conn.autocommit = True
+        try:
+            cur = conn.cursor()
+            cur.execute(PRIMARY_LSN_SQL)
+            lsn = cur.fetchone()[0]
+            cur.close()
+        finally:
+            conn.autocommit = False
+    except psycopg2.Error:
+        return None
+    return lsn
+
+
+class _Replica:
+    __slots__ = ("name", "pool", "healthy", "lag", "replay_lsn", "reads", "failures", "error")
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.healthy = False        ## no reads until the first check passes
+        self.lag = math.inf
+        self.replay_lsn = 0
+        self.reads = 0
+        self.failures = 0
+        self.error = None
+
+
+class _RouterBase:
+    def __init__(self, primary, replicas, max_lag=1.0, check_interval=1.0):
+        self.primary = primary
+        self.replicas = [_Replica(name, pool) for name, pool in replicas.items()]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._next = itertools.count()
+        self._primary_reads = 0
+        self._token_fallbacks = 0
+
+    def _choose(self, consistency_token):
+        """Replica to read from, None for the primary; ValueError on a bad token."""
+        min_lsn = parse_lsn(consistency_token) if consistency_token else 0
+        healthy = [r for r in self.replicas if r.healthy]
+        fresh = [r for r in healthy if r.replay_lsn >= min_lsn]
+        if not fresh:
+            if healthy:
+                self._token_fallbacks += 1
+            self._primary_reads += 1
+            return None
+        replica = fresh[next(self._next) % len(fresh)]
+        replica.reads += 1
+        return replica
+
+    def _record_check(self, replica, primary_lsn, replay_lsn, replay_age):
+        replica.replay_lsn = parse_lsn(replay_lsn)
+        if replica.replay_lsn >= primary_lsn:
+            replica.lag = 0.0
+        else:
+            ## behind: how long ago the last replayed transaction committed
+            replica.lag = replay_age if replay_age is not None else math.inf
+        replica.healthy = replica.lag <= self.max_lag
+        replica.error = None
+
+    def _record_failure(self, replica, error):
+        replica.healthy = False
+        replica.lag = math.inf
+        replica.failures += 1
+        replica.error = str(error).strip()
+
+    def stats(self):
+        stats = {"primary_reads": self._primary_reads, "token_fallbacks": self._token_fallbacks}
+        for r in self.replicas:
+            stats[f"{r.name}.healthy"] = r.healthy
+            stats[f"{r.name}.lag"] = r.lag
+            stats[f"{r.name}.reads"] = r.reads
+            stats[f"{r.name}.failures"] = r.failures
+        return stats
+
+
+class ReplicaRouter(_RouterBase):
+    def __init__(self, primary, replicas, max_lag=1.0, check_interval=1.0, name="replica-check"):
+        super().__init__(primary, replicas, max_lag, check_interval)
+        self.name = name
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.replicas:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+        for replica in self.replicas:
+            replica.pool.closeall()
+
+    def read_pool(self, consistency_token=""):
+        """Pool to run a read on; raises ValueError on a malformed token."""
+        replica = self._choose(consistency_token)
+        return self.primary if replica is None else replica.pool
+
+    def read(self, fn, consistency_token=""):
+        """
+        ``fn(conn)`` on a fresh-enough replica, or on the primary.  A replica
+        that fails mid-read is marked down and the read retried on the primary.
+        """
+        return self.read_with_source(fn, consistency_token)[0]
+
+    def read_with_source(self, fn, consistency_token=""):
+        """``(fn(conn), on_primary)``: a replica's rows may be older than the caller's last write."""
+        replica = self._choose(consistency_token)
+        if replica is not None:
+            try:
+                with replica.pool.connection() as conn:
+                    return fn(conn), False
+            except psycopg2.extensions.QueryCanceledError:
+                ## the call's deadline or cancellation (deadlines.py), not the replica
+                raise
+            except (psycopg2.OperationalError, PoolTimeout) as e:
+                self._record_failure(replica, e)
+        with self.primary.connection() as conn:
+            return fn(conn), True
+
+    def primary_lsn(self):
+        with self.primary.connection() as conn:
+            return commit_lsn(conn) or ""
+
+    def _run(self):
+        while True:
+            self._check()
+            if self._stop.wait(self.check_interval):
+                return
+
+    def _check(self):
+        try:
+            with self.primary.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(PRIMARY_LSN_SQL)
+                primary_lsn = parse_lsn(cur.fetchone()[0])
+                cur.close()
+        except (psycopg2.Error, PoolTimeout) as e:
+            ## can't tell how far behind anyone is: keep the last verdicts
+            print(f"[{self.name}] primary check failed: {e}")
+            return
+        for replica in self.replicas:
+            try:
+                with replica.pool.connection() as conn:
+                    cur = conn.cursor()
+                    cur.execute(REPLICA_LAG_SQL)
+                    replay_lsn, replay_age = cur.fetchone()
+                    cur.close()
+            except (psycopg2.Error, PoolTimeout) as e:
+                self._record_failure(replica, e)
+            else:
+                self._record_check(replica, primary_lsn, replay_lsn, replay_age)
+
+
+class AsyncReplicaRouter(_RouterBase):
+    """Same routing for the asyncio server, over asyncpg pools."""
+
+    def __init__(self, primary, replicas, max_lag=1.0, check_interval=1.0):
+        super().__init__(primary, replicas, max_lag, check_interval)
+        ## imported here so the threaded mode doesn't need asyncpg
+        import asyncpg
+        self._connection_errors = (asyncpg.PostgresConnectionError, asyncpg.InterfaceError,
+                                   OSError, asyncio.TimeoutError)
+        self._task = None
+
+    def start(self):
+        if self.replicas:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for replica in self.replicas:
+            await replica.pool.close()
+
+    def read_pool(self, consistency_token=""):
+        replica = self._choose(consistency_token)
+        return self.primary if replica is None else replica.pool
+
+    async def read(self, fn, consistency_token=""):
+        return (await self.read_with_source(fn, consistency_token))[0]
+
+    async def read_with_source(self, fn, consistency_token=""):
+        replica = self._choose(consistency_token)
+        if replica is not None:
+            try:
+                async with replica.pool.acquire() as conn:
+                    return await fn(conn), False
+            except self._connection_errors as e:
+                if deadlines.expired():
+                    ## asyncpg's timeout for the call's deadline, not the replica
+                    raise
+                self._record_failure(replica, e)
+        async with self.primary.acquire() as conn:
+            return await fn(conn), True
+
+    async def primary_lsn(self):
+        async with self.primary.acquire() as conn:
+            return await conn.fetchval(PRIMARY_LSN_SQL)
+
+    async def _run(self):
+        while True:
+            await self._check()
+            await asyncio.sleep(self.check_interval)
+
+    async def _check(self):
+        try:
+            async with self.primary.acquire() as conn:
+                primary_lsn = parse_lsn(await conn.fetchval(PRIMARY_LSN_SQL))
+        except Exception as e:
+            print(f"[replica-check] primary check failed: {e}")
+            return
+        for replica in self.replicas:
+            try:
+                async with replica.pool.acquire() as conn:
+                    replay_lsn, replay_age = await conn.fetchrow(REPLICA_LAG_SQL)
+            except Exception as e:
+                self._record_failure(replica, e)
+            else:
+                self._record_check(replica, primary_lsn, replay_lsn, replay_age)
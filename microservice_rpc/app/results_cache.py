@@ -0,0 +1,191 @@
+"""
+Bounded in-process cache for GetPollResults.
+
+Dashboards poll the same few results thousands of times per second; this
+keeps them in an LRU bounded by entry count and (estimated) memory.
+
+Two knobs bound how long an entry lives:
+
+* ``max_staleness``: seconds since the entry was read from the database.
+  Votes cast on *this* node update the cached tally in place, so this is the
+  bound on how late votes from the other app node show up.
+* ``ttl``: seconds an entry may sit unread before it is dropped, so polls
+  nobody looks at anymore don't hold memory.
+
+``ClosePoll`` invalidates the entry.
+
+A results load racing a vote may or may not include it, so ``apply_vote``
+can't tell whether to count it again.  Votes are written inside
+``writing()``, and a load that overlapped one is not cached.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from poll_keys import poll_key
+
+## per-entry overhead on top of the strings/ints themselves (dict + entry object)
+_ENTRY_OVERHEAD = 400
+_STRIPES = 1024
+
+
+def _estimate_size(question, options, counts):
+    ## the option strings are shared with the poll metadata cache
+    return _ENTRY_OVERHEAD + sys.getsizeof(question) + sys.getsizeof(options) + sys.getsizeof(counts) + 32 * len(counts)
+
+
+class _Entry:
+    __slots__ = ("question", "options", "counts", "loaded_at", "last_access", "size")
+
+    def __init__(self, question, options, counts, now):
+        self.question = question
+        self.options = options
+        self.counts = counts    ## votes per option id
+        self.loaded_at = now
+        self.last_access = now
+        self.size = _estimate_size(question, options, counts)
+
+
+class ResultsCache:
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024, ttl=60.0, max_staleness=1.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_staleness = max_staleness
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   ## uuid -> _Entry, least recently used first
+        self._bytes = 0
+        ## bumped as every write to a poll starts and ends; a load that raced with a
+        ## write is not cached since its snapshot may or may not include the vote
+        ## (striped to stay bounded)
+        self._versions = [0] * _STRIPES
+        ## writes in progress per stripe
+        self._writing = [0] * _STRIPES
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+        self._updates = 0
+        self._raced_loads = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_entries=int(os.environ.get("RESULTS_CACHE_MAX_ENTRIES", 1024)),
+            max_bytes=int(os.environ.get("RESULTS_CACHE_MAX_BYTES", 16 * 1024 * 1024)),
+            ttl=float(os.environ.get("RESULTS_CACHE_TTL", 60)),
+            max_staleness=float(os.environ.get("RESULTS_CACHE_MAX_STALENESS", 1.0)),
+        )
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _stripe(self, key):
+        return hash(key) % _STRIPES
+
+    def get(self, poll_uuid):
+        """Return ``(question, options, counts)`` or None on a miss."""
+        key = poll_key(poll_uuid)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if now - entry.loaded_at > self.max_staleness or now - entry.last_access > self.ttl:
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            entry.last_access = now
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.question, entry.options, list(entry.counts)
+
+    def load_token(self, poll_uuid):
+        """Take before reading results from the database, pass to ``put``."""
+        with self._lock:
+            return self._versions[self._stripe(poll_key(poll_uuid))]
+
+    def put(self, poll_uuid, question, options, counts, token):
+        if not self.enabled:
+            return
+        key = poll_key(poll_uuid)
+        entry = _Entry(question, tuple(options), list(counts), time.monotonic())
+        with self._lock:
+            stripe = self._stripe(key)
+            if self._versions[stripe] != token or self._writing[stripe]:
+                self._raced_loads += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    @contextmanager
+    def writing(self, poll_uuids):
+        """
+        Around writing votes to ``poll_uuids`` and their ``apply_vote`` calls:
+        results loaded meanwhile are not cached.
+        """
+        stripes = {self._stripe(poll_key(poll_uuid)) for poll_uuid in poll_uuids}
+        with self._lock:
+            for stripe in stripes:
+                self._writing[stripe] += 1
+                self._versions[stripe] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                for stripe in stripes:
+                    self._writing[stripe] -= 1
+                    self._versions[stripe] += 1
+
+    def apply_vote(self, poll_uuid, option_id):
+        """A vote committed on this node (inside ``writing``): bump the cached count in place."""
+        key = poll_key(poll_uuid)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and 0 <= option_id < len(entry.counts):
+                entry.counts[option_id] += 1
+                self._updates += 1
+
+    def invalidate(self, poll_uuid):
+        key = poll_key(poll_uuid)
+        with self._lock:
+            self._versions[self._stripe(key)] += 1
+            if key in self._entries:
+                self._remove(key)
+                self._invalidations += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+                "updates": self._updates,
+                "raced_loads": self._raced_loads,
+            }
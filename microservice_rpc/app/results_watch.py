@@ -0,0 +1,364 @@
+"""
+Live tallies for ``WatchPollResults``.
+
+Dashboards used to call ``GetPollResults`` in a loop, one query (or cache
+lookup) per viewer per refresh.  Watchers now subscribe to a per-node hub
+instead: one background poller re-reads ``vote_tally`` for every watched poll
+in a single round trip each ``interval`` seconds and publishes a new version
+of a poll's tallies only when something changed.  However many clients watch
+a poll, the node runs one query per tick for it.
+
+``interval`` is also the coalescing window: a hot poll publishes at most one
+update per tick, and a subscriber that falls behind skips straight to the
+latest version.  Each subscriber gets the full tallies first and then only
+the options whose count changed since its last message.  The stream ends
+once the poll is closed (after its final tallies) or no longer exists.
+
+``ResultsWatchHub`` serves the threaded server, ``AsyncResultsWatchHub``
+the asyncio one.  A threaded watch stream holds a thread for its whole
+life, so ``StreamExecutorInterceptor`` runs watch streams on an executor of
+their own and they never take the threads unary calls are sized for.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+import grpc
+import psycopg2
+
+from db_pool import PoolTimeout
+from metrics import rebuild_handler
+from option_ids import results_map, tally_counts
+from poll_keys import poll_key
+
+## gRPC core cancels new calls once more than 1000 are queued waiting for the
+## server to pick them up (3000 hard limit); a crowd of dashboards opening
+## watch streams at once blows through that, so both servers raise it
+MAX_PENDING_CALLS = int(os.environ.get("GRPC_MAX_PENDING_CALLS", 10000))
+PENDING_CALL_OPTIONS = [
+    ("grpc.server.max_pending_requests", MAX_PENDING_CALLS),
+    ("grpc.server.max_pending_requests_hard_limit", 2 * MAX_PENDING_CALLS),
+]
+
+POLLS_SQL = "SELECT uuid, status, options FROM poll WHERE uuid = ANY({0}::uuid[])"
+TALLIES_SQL = ("SELECT uuid, option_id, SUM(votes)::bigint FROM vote_tally "
+               "WHERE uuid = ANY({0}::uuid[]) GROUP BY uuid, option_id")
+
+
+class WatchLimitExceeded(Exception):
+    pass
+
+
+def _snapshots(polls, tallies):
+    """Rows of POLLS_SQL / TALLIES_SQL -> {uuid: (closed, {option: votes})}."""
+    rows = {}
+    for poll_uuid, option_id, votes in tallies:
+        rows.setdefault(str(poll_uuid), []).append((option_id, votes))
+    snapshots = {}
+    for poll_uuid, status, options in polls:
+        key = str(poll_uuid)
+        counts = tally_counts(len(options), rows.get(key, ()))
+        snapshots[key] = (status != 'open', results_map(options, counts))
+    return snapshots
+
+
+class _Feed:
+    ## one per watched poll; `tallies` is replaced, never mutated, on each version
+    __slots__ = ("key", "watchers", "version", "tallies", "closed", "notify")
+
+    def __init__(self, key, notify):
+        self.key = key
+        self.watchers = 0
+        self.version = 0
+        self.tallies = {}
+        self.closed = False
+        self.notify = notify
+
+
+class _HubBase:
+    def __init__(self, interval=0.5, max_watchers=0):
+        self.interval = interval
+        ## 0 = no cap
+        self.max_watchers = max_watchers
+
+        self._feeds = {}
+        self._watchers = 0
+        self._stopped = False
+
+        self._ticks = 0
+        self._published = 0
+        self._rejected = 0
+        self._errors = 0
+
+    def _add_watcher(self, poll_uuid, new_notify):
+        if self._stopped:
+            raise WatchLimitExceeded("results watch is shutting down")
+        if self.max_watchers and self._watchers >= self.max_watchers:
+            self._rejected += 1
+            raise WatchLimitExceeded(f"too many result watchers (max {self.max_watchers})")
+        key = poll_key(poll_uuid)
+        feed = self._feeds.get(key)
+        if feed is None:
+            feed = self._feeds[key] = _Feed(key, new_notify())
+        feed.watchers += 1
+        self._watchers += 1
+        return feed
+
+    def _remove_watcher(self, feed):
+        feed.watchers -= 1
+        self._watchers -= 1
+        if feed.watchers == 0 and self._feeds.get(feed.key) is feed:
+            del self._feeds[feed.key]
+
+    def _due_keys(self, full):
+        ## between ticks only feeds nobody has seen yet are loaded
+        return [key for key, feed in self._feeds.items() if full or feed.version == 0]
+
+    def _publish(self, keys, snapshots):
+        """Apply one load; returns the feeds whose watchers must be woken."""
+        self._ticks += 1
+        changed = []
+        for key in keys:
+            feed = self._feeds.get(key)
+            if feed is None or (feed.closed and feed.version):
+                continue
+            closed, tallies = snapshots.get(key, (True, feed.tallies))
+            if feed.version and tallies == feed.tallies and closed == feed.closed:
+                continue
+            feed.tallies = tallies
+            feed.closed = closed
+            feed.version += 1
+            self._published += 1
+            changed.append(feed)
+        return changed
+
+    def _stats(self):
+        return {
+            "polls": len(self._feeds),
+            "watchers": self._watchers,
+            "ticks": self._ticks,
+            "published": self._published,
+            "rejected": self._rejected,
+            "errors": self._errors,
+        }
+
+
+def _diff(last, current):
+    return {option: votes for option, votes in current.items() if last.get(option) != votes}
+
+
+class ResultsWatchHub(_HubBase):
+    def __init__(self, pool, interval=0.5, max_watchers=0, name="results-watch"):
+        super().__init__(interval, max_watchers)
+        self.pool = pool
+        self.name = name
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """End every watch stream and stop the poller thread."""
+        with self._lock:
+            self._stopped = True
+            for feed in self._feeds.values():
+                feed.notify.notify_all()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def subscribe(self, poll_uuid):
+        """Raises WatchLimitExceeded when ``max_watchers`` streams are already open."""
+        with self._lock:
+            feed = self._add_watcher(poll_uuid, lambda: threading.Condition(self._lock))
+            new = feed.version == 0
+        if new:
+            self._wake.set()
+        return Subscription(self, feed)
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stopped:
+            self._wake.wait(max(0.0, next_tick - time.monotonic()))
+            self._wake.clear()
+            if self._stopped:
+                return
+            full = time.monotonic() >= next_tick
+            if full:
+                next_tick = time.monotonic() + self.interval
+            with self._lock:
+                keys = self._due_keys(full)
+            if not keys:
+                continue
+            try:
+                snapshots = self._load(keys)
+            except (psycopg2.Error, PoolTimeout) as e:
+                self._errors += 1
+                print(f"[{self.name}] refresh failed: {e}")
+                continue
+            with self._lock:
+                for feed in self._publish(keys, snapshots):
+                    feed.notify.notify_all()
+
+    def _load(self, keys):
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(POLLS_SQL.format("%s"), (keys,))
+            polls = cur.fetchall()
+            cur.execute(TALLIES_SQL.format("%s"), (keys,))
+            tallies = cur.fetchall()
+            cur.close()
+        return _snapshots(polls, tallies)
+
+    def stats(self):
+        with self._lock:
+            return self._stats()
+
+
+class Subscription:
+    def __init__(self, hub, feed):
+        self.hub = hub
+        self.feed = feed
+        self._cancelled = False
+
+    def cancel(self):
+        """Safe from any thread, e.g. a gRPC ``context.add_callback``."""
+        with self.hub._lock:
+            self._cancelled = True
+            self.feed.notify.notify_all()
+
+    def updates(self):
+        """Yield the full tallies, then changed options only, until the poll closes."""
+        feed, lock = self.feed, self.hub._lock
+        last, seen = None, 0
+        try:
+            while True:
+                with lock:
+                    while feed.version == seen and not self._cancelled and not self.hub._stopped:
+                        feed.notify.wait()
+                    if self._cancelled or self.hub._stopped:
+                        return
+                    seen, current, closed = feed.version, feed.tallies, feed.closed
+                changed = current if last is None else _diff(last, current)
+                if changed or last is None:
+                    yield changed
+                last = current
+                if closed:
+                    return
+        finally:
+            with lock:
+                self.hub._remove_watcher(feed)
+
+
+class StreamExecutorInterceptor(grpc.ServerInterceptor):
+    """
+    Threaded server: calls of the streaming ``methods`` run on ``executor``
+    instead of the server's.  Only streams that hold no db connection belong
+    there (``StreamPolls`` does, and stays on the server's executor).  Must
+    come first in the interceptor list, the server picks the executor from
+    the handler the outermost interceptor returns.
+    """
+
+    def __init__(self, executor, methods=("WatchPollResults",)):
+        self.executor = executor
+        self.methods = frozenset(methods)
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if (handler is None or not handler.response_streaming
+                or handler_call_details.method.rpartition("/")[2] not in self.methods):
+            return handler
+
+        def wrap(behavior, streaming_response):
+            def stream(request, context):
+                return behavior(request, context)
+            ## grpcio's per-method executor hook (grpc/_server.py)
+            stream.experimental_thread_pool = self.executor
+            return stream
+
+        return rebuild_handler(handler, wrap)
+
+
+class AsyncResultsWatchHub(_HubBase):
+    """Same hub for the asyncio server; everything runs on the event loop, no locks."""
+
+    def __init__(self, pool, interval=0.5, max_watchers=0):
+        super().__init__(interval, max_watchers)
+        self.pool = pool
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def stop(self):
+        self._stopped = True
+        for feed in self._feeds.values():
+            feed.notify.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def updates(self, poll_uuid):
+        """Async generator; raises WatchLimitExceeded before the first yield."""
+        feed = self._add_watcher(poll_uuid, asyncio.Event)
+        if feed.version == 0:
+            self._wake.set()
+        last, seen = None, 0
+        try:
+            while True:
+                ## each version swaps in a fresh Event and sets the old one
+                while feed.version == seen and not self._stopped:
+                    await feed.notify.wait()
+                if self._stopped:
+                    return
+                seen, current, closed = feed.version, feed.tallies, feed.closed
+                changed = current if last is None else _diff(last, current)
+                if changed or last is None:
+                    yield changed
+                last = current
+                if closed:
+                    return
+        finally:
+            self._remove_watcher(feed)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while not self._stopped:
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, next_tick - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            full = loop.time() >= next_tick
+            if full:
+                next_tick = loop.time() + self.interval
+            keys = self._due_keys(full)
+            if not keys:
+                continue
+            try:
+                async with self.pool.acquire() as conn:
+                    polls = await conn.fetch(POLLS_SQL.format("$1"), keys)
+                    tallies = await conn.fetch(TALLIES_SQL.format("$1"), keys)
+            except Exception as e:
+                ## asyncpg errors, connection loss, pool timeouts: retry next tick
+                self._errors += 1
+                print(f"[results-watch] refresh failed: {e}")
+                continue
+            for feed in self._publish(keys, _snapshots(polls, tallies)):
+                old, feed.notify = feed.notify, asyncio.Event()
+                old.set()
+
+    def stats(self):
+        return self._stats()
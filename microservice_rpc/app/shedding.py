@@ -0,0 +1,11 @@
+"""
+Shed calls: what a client needs to know about admission control.
+
+admission.py turns calls away with ``RESOURCE_EXHAUSTED`` and these
+details; polling_client.py resends exactly those.  The server also answers
+``RESOURCE_EXHAUSTED`` for limits a resend would hit again, so the code
+alone doesn't say a call was shed.  Kept apart from admission.py so the
+client doesn't import server modules.
+"""
+
+OVERLOADED = "server overloaded, retry later"
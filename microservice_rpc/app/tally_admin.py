@@ -0,0 +1,116 @@
+"""
+Verify or rebuild the vote_tally table from the vote table, or change how
+many shards a poll's counts are split over.
+
+    python tally_admin.py verify [--poll UUID]    # report drift, exit 1 if any
+    python tally_admin.py rebuild [--poll UUID]   # recompute tallies from votes
+    python tally_admin.py reshard --poll UUID --shards N
+
+verify compares both tables in one REPEATABLE READ snapshot, so votes landing
+while it runs don't show up as drift.  rebuild takes a SHARE lock on `vote`
+(votes wait, reads don't) while it recomputes, and folds every count back into
+shard 0.  reshard only changes which shard new votes land on: rows already
+written stay where they are and still count, and votes keep flowing.
+"""
+
+import argparse
+import sys
+
+import psycopg2
+
+from primary_server import DB_CONFIG
+from tally_shards import MAX_SHARDS, RESHARD_SQL
+
+DRIFT_SQL = """
+    SELECT uuid, option_id, COALESCE(v.votes, 0) AS counted, COALESCE(t.votes, 0) AS tallied
+    FROM (SELECT uuid, option_id, COUNT(*) AS votes FROM vote {where} GROUP BY uuid, option_id) v
+    FULL OUTER JOIN (SELECT uuid, option_id, SUM(votes) AS votes FROM vote_tally {where}
+                     GROUP BY uuid, option_id) t
+        USING (uuid, option_id)
+    WHERE COALESCE(v.votes, 0) <> COALESCE(t.votes, 0)
+    ORDER BY uuid, option_id
+"""
+
+
+def _where(poll):
+    return ("WHERE uuid = %s", (poll,)) if poll else ("", ())
+
+
+def find_drift(cur, poll=None):
+    where, params = _where(poll)
+    cur.execute(DRIFT_SQL.format(where=where), params * 2)
+    return cur.fetchall()
+
+
+def print_drift(rows):
+    if not rows:
+        print("✅ vote_tally matches vote")
+        return
+    print(f"❌ {len(rows)} drifted tallies:")
+    print(f"{'Poll':<38}{'Option id':>10}{'Votes':>10}{'Tally':>10}")
+    for poll, option_id, counted, tallied in rows:
+        print(f"{str(poll):<38}{option_id:>10}{counted:>10}{tallied:>10}")
+
+
+def verify(conn, poll=None):
+    conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+    cur = conn.cursor()
+    rows = find_drift(cur, poll)
+    conn.rollback()
+    print_drift(rows)
+    return rows
+
+
+def rebuild(conn, poll=None):
+    where, params = _where(poll)
+    cur = conn.cursor()
+    cur.execute("LOCK TABLE vote IN SHARE MODE")
+    print_drift(find_drift(cur, poll))
+    cur.execute(f"DELETE FROM vote_tally {where}", params)
+    cur.execute(
+        f"INSERT INTO vote_tally (uuid, option_id, votes) "
+        f"SELECT uuid, option_id, COUNT(*) FROM vote {where} GROUP BY uuid, option_id",
+        params,
+    )
+    rebuilt = cur.rowcount
+    conn.commit()
+    print(f"🔧 rebuilt {rebuilt} tallies")
+
+
+def reshard(conn, poll, shards):
+    cur = conn.cursor()
+    cur.execute(RESHARD_SQL, (shards, poll))
+    row = cur.fetchone()
+    conn.commit()
+    if row is None:
+        print(f"❌ poll {poll} not found")
+        return False
+    print(f"🔧 poll {poll} now spreads its tallies over {row[0]} shards")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify or rebuild vote_tally from the vote table")
+    parser.add_argument("command", choices=["verify", "rebuild", "reshard"])
+    parser.add_argument("--poll", help="only this poll uuid")
+    parser.add_argument("--shards", type=int, help=f"reshard: new shard count (1-{MAX_SHARDS})")
+    parser.add_argument("--host", default=DB_CONFIG["host"])
+    parser.add_argument("--port", type=int, default=DB_CONFIG["port"])
+    args = parser.parse_args()
+    if args.command == "reshard" and not (args.poll and args.shards and 1 <= args.shards <= MAX_SHARDS):
+        parser.error(f"reshard needs --poll and --shards between 1 and {MAX_SHARDS}")
+
+    conn = psycopg2.connect(**dict(DB_CONFIG, host=args.host, port=args.port))
+    try:
+        if args.command == "verify":
+            drift = verify(conn, args.poll)
+            sys.exit(1 if drift else 0)
+        if args.command == "reshard":
+            sys.exit(0 if reshard(conn, args.poll, args.shards) else 1)
+        rebuild(conn, args.poll)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Shard counts for the sharded ``vote_tally`` table.
+
+Each (poll, option) count is split over ``poll.tally_shards`` rows.  The vote
+triggers add each statement's votes to one randomly picked shard and readers
+SUM the shards (see database/schema.sql), so concurrent vote batches on a hot
+poll mostly update different rows instead of queueing on one row lock.
+``CreatePoll`` takes a per-poll shard count and ``tally_admin.py reshard``
+changes it on a live poll.
+"""
+
+import os
+
+DEFAULT_SHARDS = int(os.environ.get("TALLY_SHARDS", 8))
+## schema.sql caps poll.tally_shards at 1024
+MAX_SHARDS = min(int(os.environ.get("TALLY_MAX_SHARDS", 64)), 1024)
+
+RESHARD_SQL = "UPDATE poll SET tally_shards = %s WHERE uuid = %s RETURNING tally_shards"
+
+
+def shard_count(requested):
+    if requested <= 0:
+        return DEFAULT_SHARDS
+    return min(requested, MAX_SHARDS)
@@ -1,10 +1,10 @@
 import grpc
-import polling_pb2
-import polling_pb2_grpc
 import threading
 import time
 from statistics import mean
 
+from polling_client import PollingClient
+
 # gRPC connection target (through Nginx)
 GRPC_TARGET = "localhost:8080"
 
@@ -12,19 +12,15 @@ GRPC_TARGET = "localhost:8080"
 TEST_UUID = "cdcf8b15-8aac-4bb7-af62-03ee0d5588ef"  # replace with existing poll uuid
 USER_COUNTS = [10, 50, 100, 500, 1000]
 
+# one client for every simulated user: its channels stay open between calls
+client = PollingClient(GRPC_TARGET)
+
 
 def vote_once(user_id):
     """Each user casts a vote once and returns latency (seconds)."""
     start = time.time()
     try:
-        with grpc.insecure_channel(GRPC_TARGET) as channel:
-            vote_stub = polling_pb2_grpc.VoteServiceStub(channel)
-            vote_request = polling_pb2.CastVoteRequest(
-                uuid=TEST_UUID,
-                userID=f"User-{user_id}",
-                select_options="dog",
-            )
-            vote_stub.CastVote(vote_request)
+        client.cast_vote(TEST_UUID, f"User-{user_id}", "dog")
     except grpc.RpcError as e:
         print(f"Vote failed for user {user_id}: {e}")
     end = time.time()
@@ -35,10 +31,7 @@ def get_result_once(user_id):
     """Each user fetches the result once and returns latency (seconds)."""
     start = time.time()
     try:
-        with grpc.insecure_channel(GRPC_TARGET) as channel:
-            result_stub = polling_pb2_grpc.ResultServiceStub(channel)
-            result_request = polling_pb2.PollRequest(uuid=TEST_UUID)
-            result_stub.GetPollResults(result_request)
+        client.get_poll_results(TEST_UUID)
     except grpc.RpcError as e:
         print(f"Result request failed for user {user_id}: {e}")
     end = time.time()
@@ -0,0 +1,93 @@
+"""
+Tests for admission.py: each priority class is admitted only while the
+server's pressure is below its share, and exempt methods always are.
+"""
+
+from admission import EXEMPT, AdmissionController, parse_priorities
+
+
+def controller(load, limit=100, **kwargs):
+    """A controller whose only signal reads ``load[0]`` against ``limit``."""
+    admission = AdmissionController(**kwargs)
+    admission.add_signal("load", lambda: load[0], limit)
+    return admission
+
+
+def test_classes_are_shed_lowest_priority_first():
+    load = [0]
+    admission = controller(load)
+    load[0] = 49
+    assert [admission.admit(p) for p in (0, 1, 2)] == [True, True, True]
+    load[0] = 50
+    assert [admission.admit(p) for p in (0, 1, 2)] == [True, True, False]
+    load[0] = 75
+    assert [admission.admit(p) for p in (0, 1, 2)] == [True, False, False]
+    load[0] = 100
+    assert [admission.admit(p) for p in (0, 1, 2)] == [False, False, False]
+
+
+def test_exempt_calls_are_always_admitted_and_not_counted():
+    load = [1000]
+    admission = controller(load)
+    assert admission.admit(EXEMPT)
+    assert admission.stats()["admitted"] == admission.stats()["rejected"] == 0
+
+
+def test_pressure_is_the_highest_signal():
+    admission = AdmissionController(max_in_flight=10)
+    admission.add_signal("queue", lambda: 3, 10)
+    admission.add_signal("pool_waiters", lambda: 8, 10)
+    admission.add_signal("off", lambda: 1000, 0)
+    for _ in range(5):
+        admission.enter()
+    assert admission.pressure() == 0.8
+    admission.release()
+    assert admission.stats()["in_flight"] == 4
+    assert "off" not in admission.stats()
+
+
+def test_in_flight_counts_towards_pressure():
+    admission = AdmissionController(max_in_flight=4)
+    for _ in range(2):
+        admission.enter()
+    assert not admission.admit(2)
+    assert admission.admit(1)
+
+
+def test_admitted_and_rejected_counts_per_class():
+    load = [60]
+    admission = controller(load)
+    admission.admit(0)
+    admission.admit(1)
+    admission.admit(2)
+    admission.admit(2)
+    stats = admission.stats()
+    assert (stats["admitted"], stats["rejected"]) == (2, 2)
+    assert (stats["admitted_p0"], stats["admitted_p1"], stats["rejected_p2"]) == (1, 1, 2)
+
+
+def test_custom_shares():
+    load = [30]
+    admission = controller(load, shares=(1.0, 0.25))
+    assert admission.admit(0)
+    assert not admission.admit(1)
+
+
+def test_priority_of_methods():
+    admission = AdmissionController(priorities={"ListPolls": 1, "CastVote": EXEMPT}, shares=(1.0, 0.5))
+    assert admission.priority("/polling.VoteService/CastVote") == EXEMPT
+    assert admission.priority("/polling.PollService/ListPolls") == 1
+    assert admission.priority("/polling.PollService/StreamPolls") == 1
+    assert admission.priority("/polling.ResultService/WatchPollResults") == EXEMPT
+    assert admission.priority("/polling.Other/Unknown") == 1
+
+
+def test_parse_priorities():
+    assert parse_priorities("CastVote=0, ListPolls = exempt,") == {"CastVote": 0, "ListPolls": EXEMPT}
+    assert parse_priorities(None) == {}
+
+
+def test_disabled_without_limits():
+    assert not AdmissionController().enabled
+    assert AdmissionController(max_in_flight=1).enabled
+    assert controller([0]).enabled
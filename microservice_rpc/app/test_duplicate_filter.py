@@ -0,0 +1,115 @@
+"""
+Tests for duplicate_filter.py: fingerprint storage and the memory accounting
+behind eviction.  No database needed: ``load`` is the only part that reads one.
+"""
+
+from duplicate_filter import (_MIN_RECENT, _POLL_OVERHEAD, KNOWN, SAMPLE, DuplicateVoteFilter,
+                              _fingerprint, _Fingerprints)
+
+POLL_A = "11111111-1111-1111-1111-111111111111"
+POLL_B = "22222222-2222-2222-2222-222222222222"
+POLL_C = "33333333-3333-3333-3333-333333333333"
+
+
+def tracked_bytes(dup_filter):
+    return sum(voters.nbytes for voters in dup_filter._polls.values())
+
+
+def test_fingerprints_stay_recent_until_the_merge_threshold():
+    voters = _Fingerprints()
+    voters.update(range(_MIN_RECENT))
+    assert len(voters.merged) == 0
+    assert voters.count == _MIN_RECENT
+    assert all(fp in voters for fp in range(_MIN_RECENT))
+
+
+def test_fingerprints_merge_sorted_and_keep_every_member():
+    voters = _Fingerprints()
+    fps = [(i * 7919) % 1000 + 1000 for i in range(_MIN_RECENT + 1)]
+    voters.update(fps)
+    assert len(voters.recent) == 0
+    assert list(voters.merged) == sorted(fps)
+    assert all(fp in voters for fp in fps)
+    assert 999 not in voters and 5000 not in voters
+
+    voters.update([5000])
+    assert 5000 in voters
+    assert voters.count == len(fps) + 1
+
+
+def test_fingerprints_nbytes_counts_merged_smaller_than_recent():
+    voters = _Fingerprints()
+    assert voters.nbytes == _POLL_OVERHEAD
+    voters.update(range(_MIN_RECENT))
+    recent_bytes = voters.nbytes
+    voters.update([_MIN_RECENT])
+    assert voters.nbytes == _POLL_OVERHEAD + 8 * (_MIN_RECENT + 1)
+    assert voters.nbytes < recent_bytes
+
+
+def test_lookup_finds_recorded_voters_only():
+    dup_filter = DuplicateVoteFilter(verify_rate=0.0)
+    assert dup_filter.lookup(POLL_A, "alice") is None
+    dup_filter.record(POLL_A, "alice", inserted=True)
+    assert dup_filter.lookup(POLL_A, "alice") == KNOWN
+    assert dup_filter.lookup(POLL_A.upper(), "alice") == KNOWN
+    assert dup_filter.lookup(POLL_A, "bob") is None
+    assert dup_filter.lookup(POLL_B, "alice") is None
+    stats = dup_filter.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 3)
+
+
+def test_sampled_lookups_count_false_positives():
+    dup_filter = DuplicateVoteFilter(verify_rate=1.0)
+    dup_filter.record(POLL_A, "alice", inserted=True)
+    assert dup_filter.lookup(POLL_A, "alice") == SAMPLE
+    dup_filter.record(POLL_A, "alice", inserted=False, sampled=True)
+    dup_filter.record(POLL_A, "alice", inserted=True, sampled=True)
+    stats = dup_filter.stats()
+    assert (stats["verified"], stats["false_positives"]) == (2, 1)
+    assert stats["voters"] == 1
+
+
+def test_eviction_drops_least_recently_used_polls_and_their_bytes():
+    one_poll = _POLL_OVERHEAD + 64
+    dup_filter = DuplicateVoteFilter(max_bytes=2 * one_poll, verify_rate=0.0)
+    dup_filter.record(POLL_A, "alice", inserted=True)
+    dup_filter.record(POLL_B, "bob", inserted=True)
+    ## a hit makes POLL_A the most recently used
+    assert dup_filter.lookup(POLL_A, "alice") == KNOWN
+    dup_filter.record(POLL_C, "carol", inserted=True)
+
+    assert dup_filter.lookup(POLL_B, "bob") is None
+    assert dup_filter.lookup(POLL_A, "alice") == KNOWN
+    assert dup_filter.lookup(POLL_C, "carol") == KNOWN
+    stats = dup_filter.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == tracked_bytes(dup_filter) <= dup_filter.max_bytes
+
+
+def test_bytes_follow_merges_and_drops():
+    dup_filter = DuplicateVoteFilter(verify_rate=0.0)
+    for i in range(3 * _MIN_RECENT):
+        dup_filter.record(POLL_A, f"user{i}", inserted=True)
+    dup_filter.record(POLL_B, "bob", inserted=True)
+    assert dup_filter.stats()["bytes"] == tracked_bytes(dup_filter)
+
+    dup_filter.drop(POLL_A)
+    assert dup_filter.stats()["bytes"] == tracked_bytes(dup_filter) == _POLL_OVERHEAD + 64
+    assert dup_filter.lookup(POLL_A, "user0") is None
+
+
+def test_load_rows_adds_fingerprints_per_poll():
+    dup_filter = DuplicateVoteFilter(verify_rate=0.0)
+    dup_filter._load_rows([(POLL_A, "alice"), (POLL_A, "bob"), (POLL_B, "alice")])
+    assert _fingerprint("bob") in dup_filter._polls[POLL_A]
+    assert dup_filter.lookup(POLL_B, "bob") is None
+    stats = dup_filter.stats()
+    assert (stats["polls"], stats["voters"], stats["preloaded"]) == (2, 3, 3)
+
+
+def test_disabled_filter_keeps_nothing():
+    dup_filter = DuplicateVoteFilter(max_bytes=0)
+    dup_filter.record(POLL_A, "alice", inserted=True)
+    assert dup_filter.lookup(POLL_A, "alice") is None
+    assert dup_filter.stats()["polls"] == 0
@@ -0,0 +1,53 @@
+"""
+Tests for option_ids.resolve_vote: a vote by option text or by
+``option_index`` resolves to the same option id, and the statuses the old
+string API answered are kept.
+"""
+
+import polling_pb2
+from option_ids import resolve_vote
+from poll_cache import PollMeta
+
+POLL = "0f8fad5b-d9cb-469f-a165-70867728950e"
+
+
+def vote(**fields):
+    return polling_pb2.CastVoteRequest(uuid=POLL, userID="alice", **fields)
+
+
+def test_vote_by_text_and_by_index_agree():
+    meta = PollMeta("q", "open", ["dog", "cat", "bird"])
+    assert resolve_vote(meta, vote(select_options="cat")) == (1, None)
+    assert resolve_vote(meta, vote(option_index=1)) == (1, None)
+
+
+def test_option_index_zero_is_a_vote():
+    ## proto3 optional: 0 is set, not "no index given"
+    meta = PollMeta("q", "open", ["dog", "cat"])
+    assert resolve_vote(meta, vote(option_index=0)) == (0, None)
+
+
+def test_option_index_takes_precedence_over_text():
+    meta = PollMeta("q", "open", ["dog", "cat"])
+    assert resolve_vote(meta, vote(select_options="dog", option_index=1)) == (1, None)
+
+
+def test_repeated_option_text_votes_under_its_first_id():
+    meta = PollMeta("q", "open", ["yes", "no", "yes"])
+    assert resolve_vote(meta, vote(select_options="yes")) == (0, None)
+    assert resolve_vote(meta, vote(option_index=2)) == (2, None)
+
+
+def test_invalid_options():
+    meta = PollMeta("q", "open", ["dog", "cat"])
+    assert resolve_vote(meta, vote(select_options="fish")) == (None, "Invalid Option")
+    assert resolve_vote(meta, vote()) == (None, "Invalid Option")
+    assert resolve_vote(meta, vote(option_index=2)) == (None, "Invalid Option")
+    assert resolve_vote(meta, vote(option_index=-1)) == (None, "Invalid Option")
+
+
+def test_missing_or_closed_poll():
+    assert resolve_vote(None, vote(select_options="dog")) == (None, "Poll Not Found")
+    closed = PollMeta("q", "closed", ["dog", "cat"])
+    assert resolve_vote(closed, vote(select_options="dog")) == (None, "Poll Closed")
+    assert resolve_vote(closed, vote(option_index=0)) == (None, "Poll Closed")
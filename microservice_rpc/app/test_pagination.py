@@ -0,0 +1,52 @@
+"""
+Tests for pagination.py: page tokens round-trip, and a malformed one is a
+``ValueError`` (``INVALID_ARGUMENT`` for the caller), never anything else.
+"""
+
+import base64
+from datetime import datetime, timezone
+
+import pytest
+
+import pagination
+
+POLL = "0f8fad5b-d9cb-469f-a165-70867728950e"
+
+
+def token_of(raw):
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def test_page_token_round_trips():
+    created = datetime(2025, 10, 12, 15, 15, 22, 123456, tzinfo=timezone.utc)
+    token = pagination.encode_page_token(created, POLL)
+    assert pagination.decode_page_token(token) == (created, POLL)
+
+
+def test_page_token_normalizes_the_uuid():
+    created = datetime(2025, 10, 12, 15, 15, 22)
+    token = token_of(f"{created.isoformat()}|{POLL.upper()}")
+    assert pagination.decode_page_token(token) == (created, POLL)
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "not base64!",
+    token_of("no separator"),
+    token_of(f"yesterday|{POLL}"),
+    token_of("2025-10-12T15:15:22|not-a-uuid"),
+    token_of(f"2025-10-12T15:15:22|{POLL}|extra"),
+    base64.urlsafe_b64encode(b"\xff\xfe|\x00").decode(),
+])
+def test_malformed_page_token_is_a_value_error(token):
+    with pytest.raises(ValueError, match="invalid page_token"):
+        pagination.decode_page_token(token)
+
+
+def test_page_and_chunk_sizes_are_defaulted_and_capped():
+    assert pagination.page_size(0) == pagination.DEFAULT_PAGE_SIZE
+    assert pagination.page_size(-5) == pagination.DEFAULT_PAGE_SIZE
+    assert pagination.page_size(7) == 7
+    assert pagination.page_size(pagination.MAX_PAGE_SIZE + 1) == pagination.MAX_PAGE_SIZE
+    assert pagination.chunk_size(0) == pagination.STREAM_CHUNK_SIZE
+    assert pagination.chunk_size(pagination.MAX_PAGE_SIZE * 2) == pagination.MAX_PAGE_SIZE
@@ -0,0 +1,50 @@
+"""
+Tests for results_cache.py: a results load that overlaps a vote write is
+never cached, so ``apply_vote`` can't count a vote the load already saw.
+"""
+
+from results_cache import ResultsCache
+
+POLL = "0f8fad5b-d9cb-469f-a165-70867728950e"
+
+
+def test_load_during_a_write_is_not_cached():
+    cache = ResultsCache()
+    with cache.writing((POLL,)):
+        ## the load starts after the commit: it already includes the vote
+        token = cache.load_token(POLL)
+        cache.put(POLL, "q", ("a", "b"), [1, 0], token)
+        cache.apply_vote(POLL, 0)
+    assert cache.get(POLL) is None
+    assert cache.stats()["raced_loads"] == 1
+
+
+def test_load_started_before_a_write_is_not_cached():
+    cache = ResultsCache()
+    token = cache.load_token(POLL)
+    with cache.writing((POLL,)):
+        cache.apply_vote(POLL, 0)
+    cache.put(POLL, "q", ("a", "b"), [1, 0], token)
+    assert cache.get(POLL) is None
+
+
+def test_votes_bump_entries_cached_before_the_write():
+    cache = ResultsCache()
+    cache.put(POLL, "q", ("a", "b"), [3, 1], cache.load_token(POLL))
+    with cache.writing((POLL,)):
+        cache.apply_vote(POLL, 1)
+    assert cache.get(POLL.upper()) == ("q", ("a", "b"), [3, 2])
+
+    cache.put(POLL, "q", ("a", "b"), [3, 2], cache.load_token(POLL))
+    assert cache.get(POLL) == ("q", ("a", "b"), [3, 2])
+
+
+def test_a_failed_write_still_ends():
+    cache = ResultsCache()
+    try:
+        with cache.writing((POLL,)):
+            raise TimeoutError
+    except TimeoutError:
+        pass
+    cache.put(POLL, "q", ("a", "b"), [0, 0], cache.load_token(POLL))
+    assert cache.get(POLL) == ("q", ("a", "b"), [0, 0])
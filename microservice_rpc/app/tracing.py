@@ -0,0 +1,401 @@
+"""
+Request tracing: one span per RPC, with child spans per phase and SQL statement.
+
+A call joins the trace of its client when the request carries a W3C
+``traceparent`` metadata entry (``00-<trace id>-<span id>-<flags>``): it is
+traced if the client sampled it (flags ``01``).  Calls without one start a
+new trace for ``TRACE_SAMPLE_RATE`` of them.
+
+The interceptors in ``metrics.py`` open the server span and ``metrics.phase``
+opens a child span for every phase it times, so a traced ``CastVote`` shows
+its wait for an executor thread (``queue``), connection checkouts
+(``pool_wait``), each statement and commit (``db``, with the SQL text) and
+the group-commit wait (``vote_batch``).  The vote batcher's flush is a span
+of the first traced vote in the batch and links to the others.
+
+Finished spans are queued to a background exporter (``TRACE_EXPORT``):
+
+- ``file``: one JSON object per span, appended to ``TRACE_FILE``
+- ``otlp``: OTLP/HTTP JSON posted to ``TRACE_OTLP_ENDPOINT`` (an
+  OpenTelemetry collector, or ``performance_tests/trace_collector.py``)
+
+A full export queue drops spans instead of slowing calls down.
+"""
+
+import abc
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar("trace_span", default=None)
+
+_KINDS = {"INTERNAL": 1, "SERVER": 2, "CLIENT": 3}
+## statements longer than this are cut in the span attribute
+MAX_STATEMENT = 2000
+_STOP = object()
+
+
+def _new_id(bits):
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def parse_traceparent(value):
+    """``traceparent`` -> ``(trace_id, parent_span_id, sampled)``, None if malformed."""
+    parts = value.strip().split("-") if value else ()
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def format_traceparent(trace_id, span_id, sampled=True):
+    return f"00-{trace_id}-{span_id}-{'01' if sampled else '00'}"
+
+
+class Span:
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "kind",
+                 "start_ns", "end_ns", "attributes", "status", "links")
+
+    def __init__(self, tracer, trace_id, parent_id, name, kind="INTERNAL", start_ns=None, attributes=None, links=()):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.status = "OK"
+        self.links = [(s.trace_id, s.span_id) for s in links]
+
+    def child(self, name, start_ns=None, attributes=None, links=()):
+        return Span(self.tracer, self.trace_id, self.span_id, name,
+                    start_ns=start_ns, attributes=attributes, links=links)
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def traceparent(self):
+        """Metadata value that makes the server's span a child of this one."""
+        return format_traceparent(self.trace_id, self.span_id)
+
+    def end(self, status=None, end_ns=None):
+        if status is not None:
+            self.status = status
+        self.end_ns = end_ns or time.time_ns()
+        self.tracer.export(self)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "service": self.tracer.service,
+            "start_unix_nano": self.start_ns,
+            "end_unix_nano": self.end_ns,
+            "attributes": self.attributes,
+            "status": self.status,
+            "links": [{"trace_id": t, "span_id": s} for t, s in self.links],
+        }
+
+
+def current_span():
+    return _current.get()
+
+
+def attach(span):
+    """Make ``span`` current; returns the token ``detach`` takes."""
+    return _current.set(span)
+
+
+def detach(token):
+    _current.reset(token)
+
+
+@contextmanager
+def activate(span):
+    """Make ``span`` the parent of spans opened in this block (None: no-op)."""
+    if span is None:
+        yield
+        return
+    token = _current.set(span)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def _sql_operation(statement):
+    words = str(statement).split(None, 1)
+    return words[0].rstrip(";").upper() if words else "?"
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    A child of the current span for the block, if the call is traced.
+    A ``statement`` attribute makes it a SQL span named after the operation.
+    """
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    statement = attributes.pop("statement", None)
+    if statement is not None:
+        if isinstance(statement, bytes):
+            statement = statement.decode(errors="replace")
+        statement = str(statement)
+        name = f"{name} {_sql_operation(statement)}"
+        attributes["db.system"] = "postgresql"
+        attributes["db.statement"] = " ".join(statement.split())[:MAX_STATEMENT]
+    child = parent.child(name, attributes=attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.set_attribute("error", type(e).__name__)
+        child.status = "ERROR"
+        raise
+    finally:
+        _current.reset(token)
+        child.end()
+
+
+def record_span(name, seconds, **attributes):
+    """A child span of the current one that just ended after ``seconds``."""
+    parent = _current.get()
+    if parent is not None:
+        end_ns = time.time_ns()
+        parent.child(name, start_ns=end_ns - int(seconds * 1e9), attributes=attributes).end(end_ns=end_ns)
+
+
+class _Exporter(abc.ABC):
+    """Batches finished spans on a daemon thread; ``write`` sends one batch."""
+
+    def __init__(self, max_queue=10000, batch_size=512, interval=1.0):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._exported = 0
+        self._dropped = 0
+        self._failed = 0
+        self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self._thread.start()
+
+    def export(self, span_dict):
+        try:
+            self._queue.put_nowait(span_dict)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+    def close(self, timeout=5.0):
+        """Send what is still queued (the server is shutting down)."""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            spans = [s for s in batch if s is not _STOP]
+            stopping = len(spans) < len(batch)
+            batch = spans
+            if not batch:
+                continue
+            try:
+                self.write(batch)
+            except Exception as e:
+                with self._lock:
+                    self._failed += len(batch)
+                print(f"[tracing] export failed: {e}", flush=True)
+            else:
+                with self._lock:
+                    self._exported += len(batch)
+
+    @abc.abstractmethod
+    def write(self, spans):
+        """Send one batch of span dicts; raising counts the batch as failed."""
+
+    def stats(self):
+        with self._lock:
+            return {"exported": self._exported, "dropped": self._dropped,
+                    "failed": self._failed, "queued": self._queue.qsize()}
+
+
+class FileExporter(_Exporter):
+    def __init__(self, path, **kwargs):
+        self.path = path
+        super().__init__(**kwargs)
+
+    def write(self, spans):
+        with open(self.path, "a") as f:
+            f.writelines(json.dumps(s, separators=(",", ":")) + "\n" for s in spans)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans):
+    """Span dicts -> an OTLP/HTTP JSON ``ExportTraceServiceRequest``, one resource per service."""
+    by_service = {}
+    for s in spans:
+        by_service.setdefault(s["service"], []).append({
+            "traceId": s["trace_id"],
+            "spanId": s["span_id"],
+            "parentSpanId": s["parent_span_id"] or "",
+            "name": s["name"],
+            "kind": _KINDS.get(s["kind"], 1),
+            "startTimeUnixNano": str(s["start_unix_nano"]),
+            "endTimeUnixNano": str(s["end_unix_nano"]),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s["attributes"].items()],
+            "status": {"code": 1 if s["status"] == "OK" else 2},
+            "links": [{"traceId": l["trace_id"], "spanId": l["span_id"]} for l in s["links"]],
+        })
+    return {"resourceSpans": [
+        {"resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service}}]},
+         "scopeSpans": [{"scope": {"name": "polling"}, "spans": otlp_spans}]}
+        for service, otlp_spans in by_service.items()
+    ]}
+
+
+def _from_otlp_value(value):
+    if "intValue" in value:
+        return int(value["intValue"])
+    for key in ("stringValue", "boolValue", "doubleValue"):
+        if key in value:
+            return value[key]
+    return None
+
+
+def from_otlp(body):
+    """``to_otlp`` backwards: an ``ExportTraceServiceRequest`` -> span dicts."""
+    kinds = {code: kind for kind, code in _KINDS.items()}
+    spans = []
+    for resource_spans in body.get("resourceSpans", ()):
+        resource = {a["key"]: _from_otlp_value(a["value"])
+                    for a in resource_spans.get("resource", {}).get("attributes", ())}
+        for scope_spans in resource_spans.get("scopeSpans", ()):
+            for s in scope_spans.get("spans", ()):
+                spans.append({
+                    "trace_id": s["traceId"],
+                    "span_id": s["spanId"],
+                    "parent_span_id": s.get("parentSpanId") or None,
+                    "name": s["name"],
+                    "kind": kinds.get(s.get("kind"), "INTERNAL"),
+                    "service": resource.get("service.name", "unknown"),
+                    "start_unix_nano": int(s["startTimeUnixNano"]),
+                    "end_unix_nano": int(s["endTimeUnixNano"]),
+                    "attributes": {a["key"]: _from_otlp_value(a["value"]) for a in s.get("attributes", ())},
+                    "status": "ERROR" if s.get("status", {}).get("code") == 2 else "OK",
+                    "links": [{"trace_id": l["traceId"], "span_id": l["spanId"]} for l in s.get("links", ())],
+                })
+    return spans
+
+
+class OtlpExporter(_Exporter):
+    def __init__(self, endpoint, timeout=5.0, **kwargs):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def write(self, spans):
+        body = json.dumps(to_otlp(spans)).encode()
+        request = urllib.request.Request(self.endpoint, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class Tracer:
+    def __init__(self, exporter, service, sample_rate=0.01):
+        self.exporter = exporter
+        self.service = service
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def from_env(cls, service):
+        """None unless ``TRACE_EXPORT`` is ``file`` or ``otlp``."""
+        kind = os.environ.get("TRACE_EXPORT", "")
+        if kind == "file":
+            exporter = FileExporter(os.environ.get("TRACE_FILE", f"traces_{os.getpid()}.jsonl"))
+        elif kind == "otlp":
+            exporter = OtlpExporter(os.environ.get("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"))
+        else:
+            return None
+        return cls(exporter, os.environ.get("TRACE_SERVICE_NAME", service),
+                   sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", 0.01)))
+
+    def sample(self, metadata):
+        """
+        Sampling decision for an incoming call: ``(trace_id, parent_span_id)``
+        to trace it with, or None.
+        """
+        for key, value in metadata or ():
+            if key == "traceparent":
+                parsed = parse_traceparent(value)
+                if parsed is not None:
+                    trace_id, parent_id, sampled = parsed
+                    return (trace_id, parent_id) if sampled else None
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return _new_id(128), None
+        return None
+
+    def client_span(self, method):
+        """
+        A new trace for an outgoing call at ``sample_rate``, or None; send
+        ``span.traceparent()`` as the call's ``traceparent`` metadata.
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        service, _, name = method.lstrip("/").rpartition("/")
+        return Span(self, _new_id(128), None, method.lstrip("/"), kind="CLIENT",
+                    attributes={"rpc.system": "grpc", "rpc.service": service, "rpc.method": name})
+
+    def server_span(self, sampled, method, start_ns, request=None):
+        trace_id, parent_id = sampled
+        service, _, name = method.lstrip("/").rpartition("/")
+        attributes = {"rpc.system": "grpc", "rpc.service": service, "rpc.method": name}
+        poll_uuid = getattr(request, "uuid", None)
+        if poll_uuid:
+            attributes["poll.uuid"] = poll_uuid
+        return Span(self, trace_id, parent_id, method.lstrip("/"), kind="SERVER",
+                    start_ns=start_ns, attributes=attributes)
+
+    def export(self, span):
+        self.exporter.export(span.to_dict())
+
+    def close(self):
+        self.exporter.close()
+
+    def stats(self):
+        return self.exporter.stats()
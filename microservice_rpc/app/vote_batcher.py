@@ -0,0 +1,288 @@
+"""
+Write-behind vote ingestion with batched group commit.
+
+``CastVote`` used to run its own INSERT + COMMIT per vote, so the commit
+fsync capped a node at a few hundred votes per second.  Validated votes are
+now queued here and a background flusher writes everything queued in one
+multi-row INSERT and one transaction.  A batch is flushed when it reaches
+``max_batch`` votes or ``max_delay`` seconds after its first vote arrived,
+whichever comes first.
+
+Callers block on the future returned by ``submit`` and only reply once the
+batch has committed, so an acknowledged vote is durable.  The future resolves
+to ``VOTED``, ``DUPLICATE`` (an existing ``(uuid, userID)`` row or a
+duplicate inside the same batch) or ``POLL_CLOSED``: a vote validated
+against a still-open poll whose ``ClosePoll`` committed first is not written,
+so it can't change the frozen final results.
+"""
+
+import queue
+import threading
+import time
+import uuid as uuid_lib
+from concurrent.futures import Future
+
+import psycopg2
+import psycopg2.extensions
+
+import tracing
+from replica_router import commit_lsn, parse_lsn
+
+VOTED, DUPLICATE, POLL_CLOSED = "voted", "duplicate", "closed"
+
+## unnest keeps this one statement with three array parameters, whatever the
+## batch size; rows that hit the primary key are skipped and not RETURNed.
+## FOR SHARE on the open polls makes ClosePoll (FOR UPDATE) wait for this
+## transaction, and a batch that queued behind a close re-checks the status
+## and drops that poll's votes. Rows come back as (uuid, userID) per inserted
+## vote and (uuid, NULL) per poll that was still open.
+INSERT_VOTES_SQL = """
+    WITH open_polls AS (
+        SELECT uuid FROM poll WHERE uuid = ANY(%s::uuid[]) AND status = 'open' FOR SHARE
+    ), inserted AS (
+        INSERT INTO vote (userID, option_id, uuid)
+        SELECT v.userID, v.option_id, v.uuid
+        FROM unnest(%s::text[], %s::smallint[], %s::uuid[]) AS v(userID, option_id, uuid)
+        JOIN open_polls USING (uuid)
+        ON CONFLICT (uuid, userID) DO NOTHING
+        RETURNING uuid, userID
+    )
+    SELECT uuid, userID FROM inserted
+    UNION ALL
+    SELECT uuid, NULL FROM open_polls
+"""
+
+
+def vote_outcomes(keys, rows):
+    """``(uuid, user_id)`` keys + rows of INSERT_VOTES_SQL -> one outcome per key."""
+    inserted, still_open = set(), set()
+    for poll_uuid, user_id in rows:
+        if user_id is None:
+            still_open.add(str(poll_uuid))
+        else:
+            inserted.add((str(poll_uuid), user_id))
+    outcomes = []
+    for key in keys:
+        if key in inserted:
+            ## a repeat of the same vote in the batch finds its key already taken
+            inserted.discard(key)
+            outcomes.append(VOTED)
+        else:
+            outcomes.append(DUPLICATE if key[0] in still_open else POLL_CLOSED)
+    return outcomes
+
+_STOP = object()
+
+
+class _PendingVote:
+    __slots__ = ("uuid", "user_id", "option_id", "future", "enqueued", "span")
+
+    def __init__(self, uuid, user_id, option_id):
+        self.uuid = uuid
+        self.user_id = user_id
+        self.option_id = option_id
+        self.future = Future()
+        self.enqueued = time.monotonic()
+        ## the submitting call's span, if it is traced
+        self.span = tracing.current_span()
+
+
+class VoteBatcher:
+    def __init__(self, pool, max_batch=100, max_delay=0.005, name="vote-batcher"):
+        self.pool = pool
+        self.max_batch = max_batch
+        ## 0 flushes whatever is already queued without waiting for more
+        self.max_delay = max_delay
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stopped = False
+
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._votes = 0
+        self._duplicates = 0
+        self._failed = 0
+        self._largest_batch = 0
+        self._flush_time = 0.0
+        self._commit_lsn = ""
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def commit_lsn(self):
+        """
+        Primary WAL position at or after every commit this batcher has made:
+        once a vote's future resolves, a replica replayed up to this has it.
+        """
+        return self._commit_lsn
+
+    def _advance_commit_lsn(self, conn):
+        lsn = commit_lsn(conn)
+        if lsn is None:
+            return
+        with self._lock:
+            ## write() runs on handler threads too, never move backwards
+            if not self._commit_lsn or parse_lsn(lsn) > parse_lsn(self._commit_lsn):
+                self._commit_lsn = lsn
+
+    def stop(self, timeout=10.0):
+        """Flush whatever is still queued and stop the flusher thread."""
+        self._stopped = True
+        self._queue.put(_STOP)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, poll_uuid, user_id, option_id):
+        """
+        Queue one validated vote (``option_id``: see option_ids.py).
+
+        Returns a Future resolving to ``VOTED`` once the vote is committed,
+        ``DUPLICATE`` if ``user_id`` already voted on the poll, or
+        ``POLL_CLOSED`` if the poll was closed before the vote got in.
+        """
+        if self._stopped:
+            raise RuntimeError("vote batcher is stopped")
+        ## canonical form so it matches the uuid text RETURNed by postgres
+        item = _PendingVote(str(uuid_lib.UUID(poll_uuid)), user_id, option_id)
+        self._queue.put(item)
+        return item.future
+
+    def write(self, votes):
+        """
+        Insert ``(poll_uuid, user_id, option_id)`` votes in one transaction on the
+        caller's thread, skipping the queue: ``BulkCastVote`` already arrives
+        batched.  Returns one outcome per vote, as ``submit`` would.
+        """
+        items = [_PendingVote(str(uuid_lib.UUID(poll_uuid)), user_id, option_id)
+                 for poll_uuid, user_id, option_id in votes]
+        if items:
+            self._flush(items)
+        return [item.future.result() for item in items]
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = first.enqueued + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                ## flush this batch, then exit on the next round
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._flush(batch)
+
+    def _insert(self, cur, items):
+        uuids = [i.uuid for i in items]
+        cur.execute(INSERT_VOTES_SQL, (uuids, [i.user_id for i in items], [i.option_id for i in items], uuids))
+        return vote_outcomes([(i.uuid, i.user_id) for i in items], cur.fetchall())
+
+    def _flush(self, batch):
+        ## traced in the first traced vote's trace, linked from the others
+        traced = [item.span for item in batch if item.span is not None]
+        if not traced:
+            return self._flush_batch(batch)
+        span = traced[0].child("vote_batch.flush", attributes={"vote_batch.size": len(batch)}, links=traced[1:])
+        try:
+            with tracing.activate(span):
+                self._flush_batch(batch)
+        finally:
+            span.end()
+
+    def _flush_batch(self, batch):
+        start = time.monotonic()
+        unique, in_batch_duplicates, seen = [], [], set()
+        for item in batch:
+            key = (item.uuid, item.user_id)
+            if key in seen:
+                in_batch_duplicates.append(item)
+            else:
+                seen.add(key)
+                unique.append(item)
+
+        try:
+            with self.pool.connection() as conn:
+                cur = conn.cursor()
+                outcomes = self._insert(cur, unique)
+                cur.close()
+                conn.commit()
+                self._advance_commit_lsn(conn)
+        except psycopg2.extensions.QueryCanceledError as e:
+            ## the caller's deadline (BulkCastVote, see deadlines.py): retrying won't help
+            inserted, failed = self._fail(unique, e)
+        except psycopg2.Error:
+            ## isolate the bad row(s): retry each vote in its own transaction
+            inserted, failed = self._flush_one_by_one(unique)
+        except Exception as e:
+            ## e.g. PoolTimeout, nothing was written
+            inserted, failed = self._fail(unique, e)
+        else:
+            for item, outcome in zip(unique, outcomes):
+                item.future.set_result(outcome)
+            inserted, failed = outcomes.count(VOTED), 0
+        for item in in_batch_duplicates:
+            item.future.set_result(DUPLICATE)
+        self._record(len(batch), len(batch) - inserted - failed, failed, start)
+
+    def _fail(self, items, error):
+        for item in items:
+            item.future.set_exception(error)
+        return 0, len(items)
+
+    def _flush_one_by_one(self, items):
+        inserted = failed = 0
+        for item in items:
+            try:
+                with self.pool.connection() as conn:
+                    cur = conn.cursor()
+                    outcome, = self._insert(cur, [item])
+                    cur.close()
+                    conn.commit()
+                    self._advance_commit_lsn(conn)
+            except Exception as e:
+                failed += 1
+                item.future.set_exception(e)
+            else:
+                inserted += outcome == VOTED
+                item.future.set_result(outcome)
+        return inserted, failed
+
+    def _record(self, size, duplicates, failed, start):
+        with self._lock:
+            self._batches += 1
+            self._votes += size
+            self._duplicates += duplicates
+            self._failed += failed
+            self._largest_batch = max(self._largest_batch, size)
+            self._flush_time += time.monotonic() - start
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "votes": self._votes,
+                "duplicates": self._duplicates,
+                "failed": self._failed,
+                "largest_batch": self._largest_batch,
+                "avg_batch_size": self._votes / self._batches if self._batches else 0.0,
+                "flush_time_total": self._flush_time,
+                "queued": self._queue.qsize(),
+            }
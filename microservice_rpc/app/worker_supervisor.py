@@ -0,0 +1,123 @@
+"""
+Multi-process worker mode.
+
+One Python process is capped at one core by the GIL no matter how many
+executor threads it has.  ``run_workers`` forks N worker processes that each
+run the full gRPC server (and open their own DB pool) on the same port with
+SO_REUSEPORT, so the kernel spreads incoming connections over the workers and
+the nginx upstream keeps pointing at a single port.
+
+The parent never touches gRPC or the database (both must be created after the
+fork), it only supervises: crashed workers are restarted with a backoff and
+SIGTERM/SIGINT are forwarded so the workers drain and exit cleanly.
+"""
+
+import multiprocessing
+import os
+import signal
+import time
+
+
+def resolve_worker_count(value):
+    """``GRPC_WORKERS`` value -> process count, ``auto`` means one per core."""
+    if value in (None, ""):
+        return 1
+    if value == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+class WorkerSupervisor:
+    def __init__(self, target, num_workers, name="grpc-worker",
+                 shutdown_grace=10.0, restart_backoff=1.0, max_restart_backoff=30.0):
+        self.target = target
+        self.num_workers = num_workers
+        self.name = name
+        self.shutdown_grace = shutdown_grace
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+
+        ## gRPC is not fork-safe once initialised, the parent must stay clean of it
+        self._ctx = multiprocessing.get_context("fork")
+        self._workers = {}       ## slot -> Process
+        self._started_at = {}    ## slot -> monotonic start time
+        self._backoff = {}       ## slot -> current restart delay
+        self._restart_at = {}    ## slot -> monotonic time to restart a crashed worker
+        self._stopping = False
+
+    def _start(self, slot):
+        proc = self._ctx.Process(target=self.target, args=(slot,), name=f"{self.name}-{slot}", daemon=False)
+        proc.start()
+        self._workers[slot] = proc
+        self._started_at[slot] = time.monotonic()
+        print(f"[supervisor] started {proc.name} (pid {proc.pid})", flush=True)
+
+    def _handle_signal(self, signum, frame):
+        self._stopping = True
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for slot, proc in list(self._workers.items()):
+            if proc.is_alive() or slot in self._restart_at:
+                continue
+            proc.join()
+            uptime = now - self._started_at[slot]
+            ## a worker that dies right after starting is crash looping, back off
+            if uptime < self.max_restart_backoff:
+                delay = self._backoff.get(slot, self.restart_backoff)
+                self._backoff[slot] = min(delay * 2, self.max_restart_backoff)
+            else:
+                delay = self.restart_backoff
+                self._backoff[slot] = self.restart_backoff
+            print(f"[supervisor] {proc.name} (pid {proc.pid}) exited with code {proc.exitcode} "
+                  f"after {uptime:.1f}s, restarting in {delay:.1f}s", flush=True)
+            self._restart_at[slot] = now + delay
+
+        for slot, when in list(self._restart_at.items()):
+            if now >= when:
+                del self._restart_at[slot]
+                self._start(slot)
+
+    def _shutdown(self):
+        procs = [p for p in self._workers.values() if p.is_alive()]
+        print(f"[supervisor] stopping {len(procs)} workers...", flush=True)
+        for proc in procs:
+            os.kill(proc.pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.shutdown_grace
+        for proc in procs:
+            proc.join(max(0.0, deadline - time.monotonic()))
+        for proc in procs:
+            if proc.is_alive():
+                print(f"[supervisor] {proc.name} did not stop in time, killing", flush=True)
+                proc.kill()
+                proc.join()
+        print("[supervisor] all workers stopped.", flush=True)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+        for slot in range(self.num_workers):
+            self._start(slot)
+        try:
+            while not self._stopping:
+                self._check_workers()
+                time.sleep(0.5)
+        finally:
+            self._shutdown()
+
+
+def _worker_main(target, slot):
+    ## drop the supervisor's handler inherited through fork: until serve()
+    ## installs its draining SIGTERM handler, SIGTERM stops the worker
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    ## Ctrl-C reaches the whole process group; the supervisor stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ## per-process endpoints (the metrics port) are offset by the slot
+    os.environ["GRPC_WORKER_SLOT"] = str(slot)
+    target()
+
+
+def run_workers(target, num_workers, name="grpc-worker"):
+    """Run ``target`` (a blocking serve function) in ``num_workers`` supervised processes."""
+    supervisor = WorkerSupervisor(lambda slot: _worker_main(target, slot), num_workers, name=name)
+    supervisor.run()
@@ -0,0 +1,52 @@
+-- Adds the vote_tally table + triggers to a database created before it
+-- existed, and backfills the counts from `vote`.
+--   psql -h localhost -U postgres -d pollsdb -f migrations/001_vote_tally.sql
+-- Votes are blocked (SHARE lock) while the backfill runs so none are missed.
+
+BEGIN;
+
+LOCK TABLE vote IN SHARE MODE;
+
+CREATE TABLE IF NOT EXISTS vote_tally (
+    uuid UUID REFERENCES poll(uuid),
+    select_options TEXT NOT NULL,
+    votes BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (uuid, select_options)
+);
+
+CREATE OR REPLACE FUNCTION vote_tally_on_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO vote_tally (uuid, select_options, votes)
+    SELECT uuid, select_options, COUNT(*) FROM new_votes
+    GROUP BY uuid, select_options
+    ORDER BY uuid, select_options
+    ON CONFLICT (uuid, select_options) DO UPDATE SET votes = vote_tally.votes + EXCLUDED.votes;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION vote_tally_on_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE vote_tally t SET votes = t.votes - d.votes
+    FROM (SELECT uuid, select_options, COUNT(*) AS votes FROM old_votes
+          GROUP BY uuid, select_options) d
+    WHERE t.uuid = d.uuid AND t.select_options = d.select_options;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS vote_tally_insert ON vote;
+CREATE TRIGGER vote_tally_insert AFTER INSERT ON vote
+    REFERENCING NEW TABLE AS new_votes
+    FOR EACH STATEMENT EXECUTE FUNCTION vote_tally_on_insert();
+
+DROP TRIGGER IF EXISTS vote_tally_delete ON vote;
+CREATE TRIGGER vote_tally_delete AFTER DELETE ON vote
+    REFERENCING OLD TABLE AS old_votes
+    FOR EACH STATEMENT EXECUTE FUNCTION vote_tally_on_delete();
+
+TRUNCATE vote_tally;
+INSERT INTO vote_tally (uuid, select_options, votes)
+SELECT uuid, select_options, COUNT(*) FROM vote GROUP BY uuid, select_options;
+
+COMMIT;
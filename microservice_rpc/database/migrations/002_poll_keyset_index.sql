@@ -0,0 +1,5 @@
+-- Index backing the keyset-paginated ListPolls and StreamPolls.
+--   psql -h localhost -U postgres -d pollsdb -f migrations/002_poll_keyset_index.sql
+-- CONCURRENTLY keeps CreatePoll/ClosePoll running while it builds.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS poll_created_uuid_idx ON poll (create_at_time DESC, uuid DESC);
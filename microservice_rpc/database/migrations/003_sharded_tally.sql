@@ -0,0 +1,44 @@
+-- Splits each vote_tally count over poll.tally_shards rows.
+--   psql -h localhost -U postgres -d pollsdb -f migrations/003_sharded_tally.sql
+-- Existing counts become shard 0 and existing polls keep one shard; give a
+-- hot poll more with `python app/tally_admin.py reshard --poll UUID --shards N`.
+-- Swapping the primary key locks vote_tally (and so votes) for a moment.
+
+BEGIN;
+
+ALTER TABLE poll ADD COLUMN IF NOT EXISTS tally_shards SMALLINT NOT NULL DEFAULT 1
+    CHECK (tally_shards BETWEEN 1 AND 1024);
+
+ALTER TABLE vote_tally ADD COLUMN IF NOT EXISTS shard SMALLINT NOT NULL DEFAULT 0;
+ALTER TABLE vote_tally DROP CONSTRAINT IF EXISTS vote_tally_pkey;
+ALTER TABLE vote_tally ADD PRIMARY KEY (uuid, select_options, shard);
+
+CREATE OR REPLACE FUNCTION vote_tally_on_insert() RETURNS trigger AS $$
+DECLARE
+    pick FLOAT8 := random();
+BEGIN
+    INSERT INTO vote_tally (uuid, select_options, shard, votes)
+    SELECT n.uuid, n.select_options, floor(pick * p.tally_shards), COUNT(*)
+    FROM new_votes n JOIN poll p ON p.uuid = n.uuid
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    ON CONFLICT (uuid, select_options, shard) DO UPDATE SET votes = vote_tally.votes + EXCLUDED.votes;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION vote_tally_on_delete() RETURNS trigger AS $$
+DECLARE
+    pick FLOAT8 := random();
+BEGIN
+    INSERT INTO vote_tally (uuid, select_options, shard, votes)
+    SELECT o.uuid, o.select_options, floor(pick * p.tally_shards), -COUNT(*)
+    FROM old_votes o JOIN poll p ON p.uuid = o.uuid
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    ON CONFLICT (uuid, select_options, shard) DO UPDATE SET votes = vote_tally.votes + EXCLUDED.votes;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,48 @@
+-- Moves `vote` into a table hash-partitioned on the poll uuid (16 partitions,
+-- named vote_m<modulus>_r<remainder>).
+--   psql -h localhost -U postgres -d pollsdb -f migrations/004_partition_vote.sql
+-- Votes and vote reads are blocked (ACCESS EXCLUSIVE lock) while the rows are
+-- copied; run it in a maintenance window.  The tally triggers are created
+-- after the copy, so vote_tally isn't counted twice.
+
+BEGIN;
+
+LOCK TABLE vote IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE vote RENAME TO vote_unpartitioned;
+ALTER TABLE vote_unpartitioned RENAME CONSTRAINT vote_pkey TO vote_unpartitioned_pkey;
+DROP TRIGGER IF EXISTS vote_tally_insert ON vote_unpartitioned;
+DROP TRIGGER IF EXISTS vote_tally_delete ON vote_unpartitioned;
+
+CREATE TABLE vote (
+    userID TEXT NOT NULL,
+    select_options TEXT NOT NULL,
+    vote_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    uuid UUID REFERENCES poll(uuid),
+    PRIMARY KEY (uuid,userID) --limit user per vote at a poll.
+) PARTITION BY HASH (uuid);
+
+DO $$
+BEGIN
+    FOR r IN 0..15 LOOP
+        EXECUTE format('CREATE TABLE vote_m16_r%s PARTITION OF vote FOR VALUES WITH (MODULUS 16, REMAINDER %s)', r, r);
+    END LOOP;
+END
+$$;
+
+INSERT INTO vote (userID, select_options, vote_time, uuid)
+SELECT userID, select_options, vote_time, uuid FROM vote_unpartitioned;
+
+CREATE TRIGGER vote_tally_insert AFTER INSERT ON vote
+    REFERENCING NEW TABLE AS new_votes
+    FOR EACH STATEMENT EXECUTE FUNCTION vote_tally_on_insert();
+
+CREATE TRIGGER vote_tally_delete AFTER DELETE ON vote
+    REFERENCING OLD TABLE AS old_votes
+    FOR EACH STATEMENT EXECUTE FUNCTION vote_tally_on_delete();
+
+DROP TABLE vote_unpartitioned;
+
+COMMIT;
+
+ANALYZE vote;
@@ -0,0 +1,20 @@
+-- Adds poll.final_results, the frozen tally ClosePoll stores, and fills it in
+-- for polls that are already closed.
+--   psql -h localhost -U postgres -d pollsdb -f migrations/005_final_results.sql
+-- Run it before deploying the servers that write the column.  Polls closed by
+-- older servers in between keep NULL and are read from vote_tally as before;
+-- running it again fills them in.
+
+BEGIN;
+
+ALTER TABLE poll ADD COLUMN IF NOT EXISTS final_results JSONB;
+
+UPDATE poll p SET final_results = (
+    SELECT jsonb_object_agg(o.option, COALESCE(t.votes, 0))
+    FROM unnest(p.options) AS o(option)
+    LEFT JOIN (SELECT select_options, SUM(votes)::bigint AS votes FROM vote_tally
+               WHERE uuid = p.uuid GROUP BY select_options) t ON t.select_options = o.option
+)
+WHERE p.status = 'close' AND p.final_results IS NULL;
+
+COMMIT;
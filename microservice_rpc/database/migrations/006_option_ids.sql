@@ -0,0 +1,79 @@
+-- Stores and counts votes by option id (0-based position in poll.options)
+-- instead of the option text: vote.select_options and
+-- vote_tally.select_options become SMALLINT option_id columns, and
+-- poll.final_results becomes a BIGINT[] of votes per option id.
+--   psql -h localhost -U postgres -d pollsdb -f migrations/006_option_ids.sql
+-- Old and new servers can't share the database: stop the servers, run it,
+-- deploy the new ones.  Every vote row is rewritten under an ACCESS EXCLUSIVE
+-- lock, so run it in a maintenance window.  Dropped columns keep their space
+-- until the table is rewritten; `VACUUM FULL` each vote partition afterwards
+-- to get the smaller rows on disk.
+
+BEGIN;
+
+LOCK TABLE poll, vote, vote_tally IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE poll ADD CONSTRAINT poll_options_fit_smallint CHECK (cardinality(options) <= 32767);
+
+-- the servers only ever accepted listed options; anything else can't get an id
+DELETE FROM vote v USING poll p
+WHERE p.uuid = v.uuid AND array_position(p.options, v.select_options) IS NULL;
+
+ALTER TABLE vote ADD COLUMN option_id SMALLINT;
+UPDATE vote v SET option_id = array_position(p.options, v.select_options) - 1
+FROM poll p WHERE p.uuid = v.uuid;
+ALTER TABLE vote ALTER COLUMN option_id SET NOT NULL;
+ALTER TABLE vote DROP COLUMN select_options;
+
+DELETE FROM vote_tally t USING poll p
+WHERE p.uuid = t.uuid AND array_position(p.options, t.select_options) IS NULL;
+
+ALTER TABLE vote_tally ADD COLUMN option_id SMALLINT;
+UPDATE vote_tally t SET option_id = array_position(p.options, t.select_options) - 1
+FROM poll p WHERE p.uuid = t.uuid;
+ALTER TABLE vote_tally DROP CONSTRAINT vote_tally_pkey;
+ALTER TABLE vote_tally DROP COLUMN select_options;
+ALTER TABLE vote_tally ALTER COLUMN option_id SET NOT NULL;
+ALTER TABLE vote_tally ADD PRIMARY KEY (uuid, option_id, shard);
+
+-- a repeated option text gets its votes under its first id only
+ALTER TABLE poll ADD COLUMN final_counts BIGINT[];
+UPDATE poll p SET final_counts = ARRAY(
+    SELECT CASE WHEN array_position(p.options, o.option) = o.i
+                THEN COALESCE((p.final_results ->> o.option)::bigint, 0) ELSE 0 END
+    FROM unnest(p.options) WITH ORDINALITY AS o(option, i)
+    ORDER BY o.i
+)
+WHERE p.final_results IS NOT NULL;
+ALTER TABLE poll DROP COLUMN final_results;
+ALTER TABLE poll RENAME COLUMN final_counts TO final_results;
+
+CREATE OR REPLACE FUNCTION vote_tally_on_insert() RETURNS trigger AS $$
+DECLARE
+    pick FLOAT8 := random();
+BEGIN
+    INSERT INTO vote_tally (uuid, option_id, shard, votes)
+    SELECT n.uuid, n.option_id, floor(pick * p.tally_shards), COUNT(*)
+    FROM new_votes n JOIN poll p ON p.uuid = n.uuid
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    ON CONFLICT (uuid, option_id, shard) DO UPDATE SET votes = vote_tally.votes + EXCLUDED.votes;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION vote_tally_on_delete() RETURNS trigger AS $$
+DECLARE
+    pick FLOAT8 := random();
+BEGIN
+    INSERT INTO vote_tally (uuid, option_id, shard, votes)
+    SELECT o.uuid, o.option_id, floor(pick * p.tally_shards), -COUNT(*)
+    FROM old_votes o JOIN poll p ON p.uuid = o.uuid
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    ON CONFLICT (uuid, option_id, shard) DO UPDATE SET votes = vote_tally.votes + EXCLUDED.votes;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -21,15 +21,91 @@
 CREATE TABLE IF NOT EXISTS poll (
     uuid UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     poll_questions TEXT NOT NULL,
-    options TEXT[] NOT NULL,
+    options TEXT[] NOT NULL CHECK (cardinality(options) <= 32767), -- option id = position - 1
     status TEXT CHECK (status IN ('open', 'close')) DEFAULT 'open',
-    create_at_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    create_at_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    tally_shards SMALLINT NOT NULL DEFAULT 1 CHECK (tally_shards BETWEEN 1 AND 1024),
+    final_results BIGINT[] -- votes per option id, frozen by ClosePoll; NULL while open
 );
 
 CREATE TABLE IF NOT EXISTS vote (
     userID TEXT NOT NULL,
-    select_options TEXT NOT NULL,
+    option_id SMALLINT NOT NULL, -- 0-based position in poll.options
     vote_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     uuid UUID REFERENCES poll(uuid),
     PRIMARY KEY (uuid,userID) --limit user per vote at a poll.
-);
\ No newline at end of file
+) PARTITION BY HASH (uuid);
+
+-- 16 hash partitions on the poll uuid: each has its own (uuid, userID) index, so
+-- an insert maintains one small index and vacuum works partition by partition.
+-- All of a poll's votes live in one partition, queries filtering on uuid only
+-- touch that one. `app/partition_admin.py split` adds partitions later.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_inherits WHERE inhparent = 'vote'::regclass) THEN
+        FOR r IN 0..15 LOOP
+            EXECUTE format('CREATE TABLE vote_m16_r%s PARTITION OF vote FOR VALUES WITH (MODULUS 16, REMAINDER %s)', r, r);
+        END LOOP;
+    END IF;
+END
+$$;
+
+-- Per-poll, per-option vote counts so GetPollResults reads O(options) rows
+-- instead of scanning every vote. Kept in step with `vote` by the triggers
+-- below, i.e. in the same transaction as the vote insert.
+-- Each count is split over poll.tally_shards rows and every statement adds its
+-- votes to one randomly picked shard, so concurrent vote batches on a hot poll
+-- don't all queue on one row lock; readers SUM the shards.
+-- Options are counted by id, the app maps them back to their text.
+CREATE TABLE IF NOT EXISTS vote_tally (
+    uuid UUID REFERENCES poll(uuid),
+    option_id SMALLINT NOT NULL,
+    shard SMALLINT NOT NULL DEFAULT 0,
+    votes BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (uuid, option_id, shard)
+);
+
+-- statement level: a batched insert of N votes does one upsert per (poll, option).
+-- rows are upserted in key order so concurrent batches can't deadlock.
+CREATE OR REPLACE FUNCTION vote_tally_on_insert() RETURNS trigger AS $$
+DECLARE
+    pick FLOAT8 := random();
+BEGIN
+    INSERT INTO vote_tally (uuid, option_id, shard, votes)
+    SELECT n.uuid, n.option_id, floor(pick * p.tally_shards), COUNT(*)
+    FROM new_votes n JOIN poll p ON p.uuid = n.uuid
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    ON CONFLICT (uuid, option_id, shard) DO UPDATE SET votes = vote_tally.votes + EXCLUDED.votes;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- an upsert too: the picked shard may have no row yet for that option.
+-- a shard can go negative, only the sum over shards is meaningful.
+CREATE OR REPLACE FUNCTION vote_tally_on_delete() RETURNS trigger AS $$
+DECLARE
+    pick FLOAT8 := random();
+BEGIN
+    INSERT INTO vote_tally (uuid, option_id, shard, votes)
+    SELECT o.uuid, o.option_id, floor(pick * p.tally_shards), -COUNT(*)
+    FROM old_votes o JOIN poll p ON p.uuid = o.uuid
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    ON CONFLICT (uuid, option_id, shard) DO UPDATE SET votes = vote_tally.votes + EXCLUDED.votes;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS vote_tally_insert ON vote;
+CREATE TRIGGER vote_tally_insert AFTER INSERT ON vote
+    REFERENCING NEW TABLE AS new_votes
+    FOR EACH STATEMENT EXECUTE FUNCTION vote_tally_on_insert();
+
+DROP TRIGGER IF EXISTS vote_tally_delete ON vote;
+CREATE TRIGGER vote_tally_delete AFTER DELETE ON vote
+    REFERENCING OLD TABLE AS old_votes
+    FOR EACH STATEMENT EXECUTE FUNCTION vote_tally_on_delete();
+
+-- keyset pagination for ListPolls / StreamPolls: ORDER BY create_at_time DESC, uuid DESC
+CREATE INDEX IF NOT EXISTS poll_created_uuid_idx ON poll (create_at_time DESC, uuid DESC);
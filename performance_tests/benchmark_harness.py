@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Cross-Protocol Benchmark Harness
+Runs the same workload through every protocol adapter (protocol_adapters.py)
+with one scheduler and one clock (time.monotonic_ns), and writes every run
+in one result schema that generate_graphs.py reads. Closed loop: N users
+each send their next request when the last one returns. Open loop: a fixed
+arrival rate, latency from each request's intended send time. Phases: a
+scenario's own ramp/steady/spike user counts (scenarios.py)
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from hdr_histogram import HdrHistogram
+from protocol_adapters import ADAPTERS, ProtocolAdapter, failures, make_adapter
+from scenarios import PRESETS, Workload, load_scenario
+
+## the one clock every measurement uses: integer nanoseconds, never steps backwards
+clock = time.monotonic_ns
+## how often a phased run adjusts its user count
+PHASE_CONTROL_INTERVAL = 0.1
+
+
+class StepStats:
+    """
+    Latency histogram (ns) of the successful requests and counts of the
+    failed ones by error label, overall and per operation
+    """
+
+    def __init__(self):
+        self.histogram = HdrHistogram()
+        self.errors = Counter()
+        self.operations = {}
+
+    def record(self, start: int, result: Tuple[str, Optional[str]]):
+        operation, error = result
+        if operation not in self.operations:
+            self.operations[operation] = (HdrHistogram(), Counter())
+        if error is None:
+            latency = clock() - start
+            self.histogram.record(latency)
+            self.operations[operation][0].record(latency)
+        else:
+            self.errors[error] += 1
+            self.operations[operation][1][error] += 1
+
+    def take(self) -> "StepStats":
+        """Everything so far, and start over: for interval reports"""
+        taken = StepStats()
+        taken.histogram, taken.errors, taken.operations = self.histogram, self.errors, self.operations
+        self.histogram, self.errors, self.operations = HdrHistogram(), Counter(), {}
+        return taken
+
+    def merge(self, other: "StepStats") -> "StepStats":
+        self.histogram.merge(other.histogram)
+        self.errors.update(other.errors)
+        for operation, (histogram, errors) in other.operations.items():
+            mine = self.operations.setdefault(operation, (HdrHistogram(), Counter()))
+            mine[0].merge(histogram)
+            mine[1].update(errors)
+        return self
+
+    def to_dict(self) -> Dict:
+        return {
+            "histogram": self.histogram.to_dict(),
+            "errors": dict(self.errors),
+            "operations": {op: {"histogram": h.to_dict(), "errors": dict(e)} for op, (h, e) in self.operations.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "StepStats":
+        stats = cls()
+        stats.histogram = HdrHistogram.from_dict(data["histogram"])
+        stats.errors = Counter(data["errors"])
+        stats.operations = {op: (HdrHistogram.from_dict(o["histogram"]), Counter(o["errors"]))
+                            for op, o in data["operations"].items()}
+        return stats
+
+
+async def closed_loop(call: Callable, users: int, stats: StepStats, duration: float = 0,
+                      requests_per_user: int = 1, think: Callable = None):
+    """
+    `users` concurrent users calling `call(user, n)` back to back (or `think()`
+    seconds apart), each until it has sent `requests_per_user` (0: no limit)
+    or `duration` seconds (0: no limit) have passed
+    """
+    stop_at = clock() + int(duration * 1e9) if duration else None
+
+    async def user(u: int):
+        n = 0
+        while (not requests_per_user or n < requests_per_user) and (stop_at is None or clock() < stop_at):
+            start = clock()
+            stats.record(start, await call(u, n))
+            n += 1
+            pause = think() if think else 0
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+    await asyncio.gather(*(user(u) for u in range(users)))
+
+
+async def open_loop(call: Callable, rate: float, duration: float, stats: StepStats) -> int:
+    """
+    `call(i, 0)` at `rate` per second for `duration` seconds, each started at
+    its scheduled time whatever the calls before it are doing; latency counts
+    from that scheduled time. Returns how far (ns) the sender fell behind
+    """
+    pending = set()
+    interval = 1e9 / rate
+    max_lag = 0
+
+    async def timed(i: int, intended: int):
+        stats.record(intended, await call(i, 0))
+
+    start = clock()
+    for i in range(int(rate * duration)):
+        intended = start + int(i * interval)
+        delay = intended - clock()
+        if delay > 0:
+            await asyncio.sleep(delay / 1e9)
+        else:
+            max_lag = max(max_lag, -delay)
+        task = asyncio.ensure_future(timed(i, intended))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.wait(pending)
+    return max_lag
+
+
+async def phased_loop(call: Callable, phases: List[Dict], think: Callable = None, on_phase: Callable = None):
+    """
+    Closed-loop users whose number follows `phases` (scenarios.py): users
+    above the current count stop after their request in flight. Each phase
+    is recorded in its own StepStats, handed to `on_phase(phase, stats,
+    started, finished, peak_users)` as it ends
+    """
+    state = {"target": 0, "stats": StepStats()}
+    tasks = {}
+
+    async def user(u: int):
+        n = 0
+        while u < state["target"]:
+            start = clock()
+            result = await call(u, n)
+            ## a request that spans a phase boundary counts in the phase it ends in
+            state["stats"].record(start, result)
+            n += 1
+            pause = think() if think else 0
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+    try:
+        for phase in phases:
+            state["stats"] = StepStats()
+            started = clock()
+            length = int(phase["duration"] * 1e9)
+            ticks = max(1, math.ceil(phase["duration"] / PHASE_CONTROL_INTERVAL))
+            peak = 0
+            for tick in range(ticks):
+                users = phase["users"]
+                if phase["type"] == "ramp":
+                    ## on a fixed tick schedule, so the last tick sets the ramp's end value
+                    progress = tick / (ticks - 1) if ticks > 1 else 1.0
+                    users = round(users[0] + (users[1] - users[0]) * progress)
+                state["target"] = users
+                peak = max(peak, users)
+                for u in range(users):
+                    if u not in tasks or tasks[u].done():
+                        tasks[u] = asyncio.ensure_future(user(u))
+                next_tick = min(started + int((tick + 1) * PHASE_CONTROL_INTERVAL * 1e9), started + length)
+                await asyncio.sleep(max(0, next_tick - clock()) / 1e9)
+            if on_phase:
+                on_phase(phase, state["stats"], started, clock(), peak)
+    finally:
+        state["target"] = 0
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+
+def user_call(adapter: ProtocolAdapter, workload: Workload, context: Dict, prefix: str) -> Callable:
+    """call(user, n) for the schedulers: request n of user `user`, a fresh user id each time"""
+
+    async def call(user: int, n: int):
+        return await workload.request(adapter, context, f"{prefix}_{user}_{n}")
+
+    return call
+
+
+def step_result(protocol: str, scenario: str, stats: StepStats, started: int, finished: int, **fields) -> Dict:
+    """One run in the common result schema; avg_latency and throughput in seconds and ok requests/s"""
+    elapsed = (finished - started) / 1e9
+    latency = stats.histogram.summary()
+    result = {
+        "protocol": protocol,
+        "scenario": scenario,
+        "mode": "closed",
+        "num_users": None,
+        "target_rate": None,
+        "duration": elapsed,
+        "requests": stats.histogram.total + sum(stats.errors.values()),
+        "ok": stats.histogram.total,
+        "errors": dict(stats.errors),
+        "avg_latency": latency["mean"],
+        "throughput": stats.histogram.total / elapsed if elapsed > 0 else 0,
+        "latency": latency,
+        "histogram": stats.histogram.to_dict(),
+        "operations": {op: {"ok": h.total, "errors": dict(e), "latency": h.summary()}
+                       for op, (h, e) in sorted(stats.operations.items())},
+    }
+    result.update(fields)
+    return result
+
+
+async def run_step(adapter: ProtocolAdapter, workload: Workload, context: Dict, users: int = None,
+                   rate: float = None, duration: float = 0, requests_per_user: int = 1) -> Dict:
+    """One closed-loop (`users`) or open-loop (`rate`) step of `workload` on a connected adapter"""
+    stats = StepStats()
+    call = user_call(adapter, workload, context, f"bench_{uuid.uuid4().hex[:8]}")
+    started = clock()
+    if rate:
+        lag = await open_loop(call, rate, duration, stats)
+        return step_result(adapter.name, workload.name, stats, started, clock(), mode="open",
+                           target_rate=rate, max_send_lag=lag / 1e9)
+    await closed_loop(call, users, stats, duration, requests_per_user, workload.think_time)
+    return step_result(adapter.name, workload.name, stats, started, clock(), num_users=users)
+
+
+async def run_phases(adapter: ProtocolAdapter, workload: Workload, context: Dict, phases: List[Dict]) -> List[Dict]:
+    """`workload` through its ramp/steady/spike phases; one result per phase"""
+    results = []
+
+    def on_phase(phase, stats, started, finished, peak):
+        result = step_result(adapter.name, workload.name, stats, started, finished,
+                             mode="phases", phase=phase["name"], phase_type=phase["type"], num_users=peak)
+        print_step(f"{phase['name']} ({phase['type']}, up to {peak} users)", result)
+        results.append(result)
+
+    call = user_call(adapter, workload, context, f"bench_{uuid.uuid4().hex[:8]}")
+    await phased_loop(call, phases, workload.think_time, on_phase)
+    return results
+
+
+def print_step(load: str, result: Dict):
+    latency = result["latency"]
+    print(f"  {load}: Latency: {result['avg_latency']*1000:.2f}ms (p99 {latency['p99']*1000:.2f}ms), "
+          f"Throughput: {result['throughput']:.2f} req/s, errors: {failures(result['errors'])}")
+    if len(result["operations"]) > 1:
+        for operation, o in result["operations"].items():
+            print(f"    {operation}: {o['ok']} ok, p50 {o['latency']['p50']*1000:.2f}ms, "
+                  f"p99 {o['latency']['p99']*1000:.2f}ms, errors: {failures(o['errors'])}")
+
+
+async def benchmark(args) -> List[Dict]:
+    all_results = []
+    for protocol in args.protocols:
+        url = getattr(args, f"{protocol}_url", None)
+        async with make_adapter(protocol, url, args.timeout, args.connections) as adapter:
+            print(f"📍 {adapter.label}: {adapter.url}")
+            for scenario in args.scenario:
+                workload = load_scenario(scenario, args.seed)
+                context = await workload.setup(adapter)
+                print(f"✅ {len(context['poll_ids'])} test poll(s) created, first ID: {context['poll_id']}")
+                if args.mode == "phases":
+                    print(f"Testing {workload.name} through {len(workload.spec['phases'])} phases...")
+                    all_results.extend(await run_phases(adapter, workload, context, workload.spec["phases"]))
+                    continue
+                steps = [{"rate": r} for r in args.rates] if args.mode == "open" else [{"users": u} for u in args.users]
+                for step in steps:
+                    load = f"{step['rate']:.0f} req/s" if "rate" in step else f"{step['users']} users"
+                    print(f"Testing {workload.name} at {load}...")
+                    result = await run_step(adapter, workload, context, duration=args.duration,
+                                            requests_per_user=args.requests_per_user, **step)
+                    print_step(load, result)
+                    all_results.append(result)
+    return all_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Same workloads over every protocol, one scheduler, one result schema")
+    parser.add_argument("--protocols", nargs="+", choices=sorted(ADAPTERS), default=["rest", "grpc"])
+    parser.add_argument("--scenario", nargs="+", default=["voting", "results"],
+                        help=f"Preset ({', '.join(PRESETS)}) or scenario JSON file (see scenarios.py)")
+    parser.add_argument("--seed", type=int, help="Random seed (default: the scenario's own)")
+    parser.add_argument("--mode", choices=["closed", "open", "phases"], default="closed",
+                        help="closed: --users concurrent users; open: --rates fixed arrival rates; "
+                             "phases: the scenario's own ramp/steady/spike phases")
+    parser.add_argument("--users", nargs="+", type=int, default=[10, 50, 100, 500, 1000])
+    parser.add_argument("--rates", nargs="+", type=float, default=[100, 200, 400, 800])
+    parser.add_argument("--duration", type=float, default=0,
+                        help="Seconds per step (open mode: required; closed mode: 0 stops after --requests-per-user)")
+    parser.add_argument("--requests-per-user", type=int, default=1,
+                        help="Closed mode: requests per user, 0 for no limit (1 matches the original per-protocol scripts)")
+    parser.add_argument("--timeout", type=float, default=5, help="Per-request timeout (seconds)")
+    parser.add_argument("--connections", type=int, help="gRPC channels / HTTP connections (default: adapter's own)")
+    for name, adapter in sorted(ADAPTERS.items()):
+        parser.add_argument(f"--{name}-url", help=f"{adapter.label} URL (default {adapter.default_url})")
+    args = parser.parse_args()
+    if args.mode == "open" and not args.duration:
+        parser.error("--mode open needs --duration")
+    if args.mode == "closed" and not args.duration and not args.requests_per_user:
+        parser.error("closed mode needs --duration or --requests-per-user")
+    for scenario in args.scenario:
+        try:
+            workload = load_scenario(scenario)
+        except ValueError as e:
+            parser.error(f"scenario {scenario}: {e}")
+        if args.mode == "phases" and not workload.spec["phases"]:
+            parser.error(f"scenario {scenario} has no phases")
+
+    print("🚀 Starting Cross-Protocol Benchmark")
+    all_results = asyncio.run(benchmark(args))
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = f"harness_results_{timestamp}.json"
+    with open(results_file, 'w') as f:
+        json.dump(all_results, f, indent=2)
+    print(f"💾 Results saved to: {results_file}")
+
+    load_column = {"open": "Target (req/s)", "phases": "Phase (peak users)"}.get(args.mode, "Total Users")
+    print(f"\n📊 Results for Report.md (latency in ms):")
+    print(f"| Protocol | {load_column} | Scenario | Avg Latency | p50 | p99 | p99.9 | Throughput (req/s) | Errors |")
+    print("|----------|-------------|----------|-------------|-----|-----|-------|--------------------|--------|")
+    for r in all_results:
+        if r["mode"] == "open":
+            load = f"{r['target_rate']:.0f}"
+        elif r["mode"] == "phases":
+            load = f"{r['phase']} ({r['num_users']})"
+        else:
+            load = r["num_users"]
+        scenario = r['scenario'].title()
+        l = r["latency"]
+        print(f"| {ADAPTERS[r['protocol']].label} | {load:<11} | {scenario:<8} | {r['avg_latency']*1000:<11.2f} "
+              f"| {l['p50']*1000:.2f} | {l['p99']*1000:.2f} | {l['p99.9']*1000:.2f} | {r['throughput']:<18.2f} "
+              f"| {failures(r['errors'])} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Unary CastVote vs Streaming BulkCastVote Benchmark
+Casts the same number of votes one RPC at a time and through a few
+BulkCastVote streams, and compares votes per second
+"""
+
+import argparse
+import json
+from datetime import datetime
+
+from grpc_performance import add_trace_arguments, gRPCPerformanceTester
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare unary CastVote with streaming BulkCastVote")
+    parser.add_argument("--url", default="localhost:8080", help="gRPC server URL")
+    parser.add_argument("--votes", nargs="+", type=int, default=[100, 1000, 5000],
+                        help="Number of votes to cast per run")
+    parser.add_argument("--streams", type=int, default=4, help="Concurrent BulkCastVote streams")
+    add_trace_arguments(parser)
+    args = parser.parse_args()
+
+    print("🚀 Starting Bulk Voting Benchmark")
+    print(f"🗳️  Vote counts: {args.votes}")
+    print()
+
+    all_results = []
+    with gRPCPerformanceTester(args.url, args.trace_rate, args.trace_file) as tester:
+        for num_votes in args.votes:
+            unary = tester.test_write_heavy_scenario(num_votes)
+            unary["scenario"] = "unary"
+            tester.print_results(unary)
+            all_results.append(unary)
+
+            bulk = tester.test_bulk_vote_scenario(num_votes, args.streams)
+            bulk["scenario"] = "bulk"
+            tester.print_results(bulk)
+            all_results.append(bulk)
+            print()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = f"bulk_vote_comparison_{timestamp}.json"
+    with open(results_file, 'w') as f:
+        json.dump(all_results, f, indent=2)
+    print(f"💾 Results saved to: {results_file}")
+
+    by_key = {(r["scenario"], r["num_users"]): r for r in all_results}
+    print(f"\n📊 Unary vs bulk voting:")
+    print("| Votes | Unary (votes/s) | Bulk (votes/s) | Speedup |")
+    print("|-------|-----------------|----------------|---------|")
+    for num_votes in args.votes:
+        unary = by_key[("unary", num_votes)]["throughput"]
+        bulk = by_key[("bulk", num_votes)]["throughput"]
+        speedup = f"{bulk / unary:.1f}x" if unary else "-"
+        print(f"| {num_votes:<5} | {unary:<15.2f} | {bulk:<14.2f} | {speedup:<7} |")
+
+
+if __name__ == "__main__":
+    main()
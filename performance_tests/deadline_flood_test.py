@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Deadline Flood Test
+Floods the server with calls whose deadline is too short to be met, open
+loop (a fixed rate, whatever the server manages), while a probe keeps
+timing ordinary calls.  A server that keeps working for callers that are
+gone stays saturated long after the flood; one that drops expired calls
+and cancels their queries is back to baseline latency as soon as it ends
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List
+
+import grpc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'microservice_rpc', 'app'))
+
+try:
+    import polling_pb2
+    import polling_pb2_grpc
+except ImportError:
+    print("❌ Error: gRPC protobuf files not found.")
+    print("Run this from the performance_tests directory.")
+    sys.exit(1)
+
+PROBE_TIMEOUT = 10.0
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class DeadlineFloodTester:
+    def __init__(self, server_url: str, page_size: int):
+        self.server_url = server_url
+        self.page_size = page_size
+        ## (sent at, latency or None, status) of every probe call
+        self.probes: List[tuple] = []
+        self.flood_codes = Counter()
+
+    async def create_polls(self, stub, count: int):
+        """Enough polls for ListPolls pages to be real work"""
+        for i in range(count):
+            await stub.CreatePoll(polling_pb2.CreatePollRequest(
+                poll_questions=f"Deadline flood poll {i}", options=["Yes", "No"]))
+
+    def list_polls(self, stub, timeout: float):
+        return stub.ListPolls(polling_pb2.ListPollsRequest(page_size=self.page_size), timeout=timeout)
+
+    async def probe(self, stub, interval: float, stop: asyncio.Event, started: float):
+        """One ordinary call at a time, each with a generous deadline"""
+        while not stop.is_set():
+            sent = time.perf_counter()
+            try:
+                await self.list_polls(stub, PROBE_TIMEOUT)
+                self.probes.append((sent - started, time.perf_counter() - sent, "OK"))
+            except grpc.aio.AioRpcError as e:
+                self.probes.append((sent - started, None, e.code().name))
+            await asyncio.sleep(max(0.0, interval - (time.perf_counter() - sent)))
+
+    async def flood_call(self, stub, deadline: float):
+        try:
+            await self.list_polls(stub, deadline)
+            self.flood_codes["OK"] += 1
+        except grpc.aio.AioRpcError as e:
+            self.flood_codes[e.code().name] += 1
+
+    async def flood(self, stub, rate: float, duration: float, deadline: float):
+        """Open loop: a new call every 1/rate seconds, however many are still outstanding"""
+        calls = []
+        start = time.perf_counter()
+        sent = 0
+        while time.perf_counter() - start < duration:
+            calls.append(asyncio.ensure_future(self.flood_call(stub, deadline)))
+            sent += 1
+            await asyncio.sleep(max(0.0, start + sent / rate - time.perf_counter()))
+        return calls, sent
+
+    async def run(self, rate: float, deadline: float, baseline: float, flood: float,
+                  recovery: float, probe_interval: float, polls: int) -> Dict:
+        async with grpc.aio.insecure_channel(self.server_url) as channel:
+            poll_stub = polling_pb2_grpc.PollServiceStub(channel)
+            print(f"📝 Creating {polls} polls...")
+            await self.create_polls(poll_stub, polls)
+
+            started = time.perf_counter()
+            stop = asyncio.Event()
+            prober = asyncio.ensure_future(self.probe(poll_stub, probe_interval, stop, started))
+
+            print(f"⏱️  Baseline for {baseline}s...")
+            await asyncio.sleep(baseline)
+            flood_start = time.perf_counter() - started
+            print(f"🌊 Flooding ListPolls at {rate:.0f}/s with a {deadline*1000:.0f}ms deadline for {flood}s...")
+            calls, sent = await self.flood(poll_stub, rate, flood, deadline)
+            flood_end = time.perf_counter() - started
+            print(f"🩺 Measuring recovery for {recovery}s...")
+            await asyncio.sleep(recovery)
+            stop.set()
+            await prober
+            await asyncio.gather(*calls)
+
+        return self.summarize(rate, deadline, sent, flood_start, flood_end)
+
+    def summarize(self, rate: float, deadline: float, sent: int, flood_start: float, flood_end: float) -> Dict:
+        def latencies(lo: float, hi: float) -> List[float]:
+            return [l for t, l, _ in self.probes if lo <= t < hi and l is not None]
+
+        def phase(values: List[float]) -> Dict:
+            return {
+                "probes": len(values),
+                "median_latency": statistics.median(values) if values else 0.0,
+                "p99_latency": percentile(values, 0.99),
+                "max_latency": max(values, default=0.0),
+            }
+
+        baseline = latencies(0.0, flood_start)
+        ## recovered: from the first probe after which every probe is back within 2x the baseline p99
+        threshold = 2 * percentile(baseline, 0.99)
+        after = [(t, l) for t, l, _ in self.probes if t >= flood_end]
+        recovered_at = None
+        for t, l in reversed(after):
+            if l is None or l > threshold:
+                break
+            recovered_at = t
+        return {
+            "flood_rate": rate,
+            "flood_deadline": deadline,
+            "flood_calls": sent,
+            "flood_codes": dict(self.flood_codes),
+            "probe_errors": dict(Counter(s for _, l, s in self.probes if l is None)),
+            "baseline": phase(baseline),
+            "flood": phase(latencies(flood_start, flood_end)),
+            "recovery": phase(latencies(flood_end, float("inf"))),
+            "recovery_threshold": threshold,
+            "recovery_time": None if recovered_at is None else recovered_at - flood_end,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flood the server with short-deadline calls and time its recovery")
+    parser.add_argument("--server-url", default="localhost:50051", help="gRPC server to flood")
+    parser.add_argument("--rate", type=float, default=500, help="Flood calls per second (open loop)")
+    parser.add_argument("--deadline", type=float, default=0.02, help="Deadline of each flood call (seconds)")
+    parser.add_argument("--flood", type=float, default=10, help="Flood duration (seconds)")
+    parser.add_argument("--baseline", type=float, default=5, help="Probe-only time before the flood (seconds)")
+    parser.add_argument("--recovery", type=float, default=10, help="Probe-only time after the flood (seconds)")
+    parser.add_argument("--probe-interval", type=float, default=0.05, help="Time between probe calls (seconds)")
+    parser.add_argument("--page-size", type=int, default=100, help="ListPolls page size, for flood and probe")
+    parser.add_argument("--polls", type=int, default=100, help="Polls to create first")
+    args = parser.parse_args()
+
+    print("🚀 Starting Deadline Flood Test")
+    print(f"📍 Server: {args.server_url}")
+    tester = DeadlineFloodTester(args.server_url, args.page_size)
+    results = asyncio.run(tester.run(args.rate, args.deadline, args.baseline, args.flood,
+                                     args.recovery, args.probe_interval, args.polls))
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = f"deadline_flood_{timestamp}.json"
+    with open(results_file, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to: {results_file}")
+
+    codes = ", ".join(f"{code} {count}" for code, count in sorted(results["flood_codes"].items()))
+    print(f"\n🌊 Flood: {results['flood_calls']} calls -> {codes}")
+    if results["probe_errors"]:
+        print(f"⚠️  Probe errors: {results['probe_errors']}")
+    print(f"\n📊 Probe latency (ListPolls, page of {args.page_size}):")
+    print("| Phase | Probes | Median (ms) | P99 (ms) | Max (ms) |")
+    print("|-------|--------|-------------|----------|----------|")
+    for name in ("baseline", "flood", "recovery"):
+        r = results[name]
+        print(f"| {name.capitalize():<8} | {r['probes']:<6} | {r['median_latency']*1000:<11.2f} "
+              f"| {r['p99_latency']*1000:<8.2f} | {r['max_latency']*1000:<8.2f} |")
+
+    if results["recovery_time"] is None:
+        print(f"\n❌ Probes never settled back under {results['recovery_threshold']*1000:.2f}ms (2x baseline p99)")
+    else:
+        print(f"\n✅ Recovered {results['recovery_time']*1000:.0f}ms after the flood "
+              f"(probes under {results['recovery_threshold']*1000:.2f}ms, 2x baseline p99)")
+
+
+if __name__ == "__main__":
+    main()
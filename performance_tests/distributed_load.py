@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Distributed Load Driver
+Spreads a workload scenario (scenarios.py) across worker processes, each with
+its own event loop and its own gRPC channels or aiohttp session, so the
+load generator is not the bottleneck at thousands of concurrent users.
+Workers stream interval HDR histograms back; the coordinator merges them
+exactly and writes one combined report
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+from benchmark_harness import StepStats, clock, closed_loop, step_result, user_call
+from protocol_adapters import ADAPTERS, failures, make_adapter
+from scenarios import PRESETS, Scenario, load_scenario
+
+## how long the coordinator waits for workers to connect before giving up
+READY_TIMEOUT = 60
+
+
+async def setup_workload(config: Dict, workload: Scenario) -> Dict:
+    """Poll(s) every worker targets, set up once by the coordinator"""
+    async with make_adapter(config["protocol"], config["url"], config["timeout"]) as adapter:
+        return await workload.setup(adapter)
+
+
+async def run_worker(worker_id: int, config: Dict, results: multiprocessing.Queue, go: multiprocessing.Event):
+    """One worker's share of the users, on this process' own event loop and connections"""
+    stats = StepStats()
+
+    def report(kind: str, **extra):
+        ## the samples since the last report; the coordinator adds them up
+        results.put((kind, worker_id, stats.take().to_dict(), extra))
+
+    async def reporter():
+        while True:
+            await asyncio.sleep(config["report_interval"])
+            report("interval")
+
+    async with make_adapter(config["protocol"], config["url"], config["timeout"], config["connections"]) as adapter:
+        ## each worker draws its own reproducible sequence
+        workload = Scenario(config["spec"], config["seed"] + worker_id)
+        call = user_call(adapter, workload, config["context"], f"dist_{uuid.uuid4().hex[:8]}_{worker_id}")
+        results.put(("ready", worker_id, None, {}))
+        while not go.is_set():
+            await asyncio.sleep(0.01)
+        delay = config["start_at"].value - clock()
+        if delay > 0:
+            await asyncio.sleep(delay / 1e9)
+        started = clock()
+        task = asyncio.ensure_future(reporter())
+        await closed_loop(call, config["users"], stats, config["duration"], config["requests_per_user"],
+                          workload.think_time)
+        finished = clock()
+        task.cancel()
+        report("done", started=started, finished=finished)
+
+
+def worker_main(worker_id: int, config: Dict, results: multiprocessing.Queue, go: multiprocessing.Event):
+    """Entry point of a worker process: connect, report ready, wait for the common start time, run"""
+    try:
+        asyncio.run(run_worker(worker_id, config, results, go))
+    except Exception:
+        results.put(("error", worker_id, None, {"traceback": traceback.format_exc()}))
+
+
+def split(total: int, parts: int) -> List[int]:
+    return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+
+def run_distributed(config: Dict, num_users: int, workers: int) -> Dict:
+    """Run one load step on `workers` processes; the merged histogram and totals"""
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    go = ctx.Event()
+    start_at = ctx.Value("q", 0)
+    shares = [u for u in split(num_users, workers) if u]
+    processes = []
+    for worker_id, users in enumerate(shares):
+        worker_config = dict(config, users=users, start_at=start_at)
+        process = ctx.Process(target=worker_main, args=(worker_id, worker_config, results, go), daemon=True)
+        process.start()
+        processes.append(process)
+
+    total = StepStats()
+    windows = {}
+    ready = set()
+    try:
+        deadline = time.monotonic() + READY_TIMEOUT
+        while len(ready) < len(processes):
+            kind, worker_id, _, extra = results.get(timeout=max(0.1, deadline - time.monotonic()))
+            if kind == "error":
+                raise RuntimeError(f"worker {worker_id} failed:\n{extra['traceback']}")
+            ready.add(worker_id)
+
+        ## every worker starts at the same instant: CLOCK_MONOTONIC is shared by processes on one machine
+        start_at.value = time.monotonic_ns() + 200_000_000
+        go.set()
+        interval_ok = 0
+        last_print = time.monotonic()
+        while len(windows) < len(processes):
+            try:
+                kind, worker_id, interval, extra = results.get(timeout=1)
+            except queue.Empty:
+                ## exit code 0 without a "done" (a stray sys.exit(0)) is a failure too
+                dead = [i for i, p in enumerate(processes) if not p.is_alive() and i not in windows]
+                if dead:
+                    raise RuntimeError(f"{len(dead)} worker(s) exited without reporting")
+                continue
+            if kind == "error":
+                raise RuntimeError(f"worker {worker_id} failed:\n{extra['traceback']}")
+            interval = StepStats.from_dict(interval)
+            total.merge(interval)
+            interval_ok += interval.histogram.total
+            if kind == "done":
+                windows[worker_id] = (extra["started"], extra["finished"])
+            now = time.monotonic()
+            if now - last_print >= config["report_interval"]:
+                print(f"  ... {interval_ok / (now - last_print):.0f} req/s, {total.histogram.total} ok so far")
+                interval_ok = 0
+                last_print = now
+    finally:
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    started = min(w[0] for w in windows.values())
+    finished = max(w[1] for w in windows.values())
+    return step_result(config["protocol"], config["spec"]["name"], total, started, finished,
+                       num_users=num_users, workers=len(processes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process gRPC/REST load driver with merged HDR latency histograms")
+    parser.add_argument("--protocol", choices=sorted(ADAPTERS), default="grpc")
+    parser.add_argument("--url", help="Server URL (default: the adapter's, localhost:8080 for gRPC)")
+    parser.add_argument("--scenario", nargs="+", default=["voting", "results"],
+                        help=f"Preset ({', '.join(PRESETS)}) or scenario JSON file (see scenarios.py)")
+    parser.add_argument("--seed", type=int, help="Random seed (default: the scenario's own); worker i uses seed + i")
+    parser.add_argument("--users", nargs="+", type=int, default=[1000, 5000, 10000],
+                        help="Concurrent users per step, split across the workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds each step runs")
+    parser.add_argument("--requests-per-user", type=int, default=0,
+                        help="Stop each user after this many requests (0: keep going for --duration); 1 matches grpc_performance.py")
+    parser.add_argument("--timeout", type=float, default=5, help="Per-request timeout (seconds)")
+    parser.add_argument("--connections", type=int, help="gRPC channels / HTTP connections per worker (default: adapter's own)")
+    parser.add_argument("--report-interval", type=float, default=1, help="Seconds between worker histogram reports")
+    args = parser.parse_args()
+    url = args.url or ADAPTERS[args.protocol].default_url
+
+    print("🚀 Starting Distributed Load Driver")
+    print(f"📍 {args.protocol} server: {url}, {args.workers} workers, users: {args.users}")
+
+    all_results = []
+    for scenario in args.scenario:
+        try:
+            workload = load_scenario(scenario, args.seed)
+        except ValueError as e:
+            parser.error(f"scenario {scenario}: {e}")
+        config = {
+            "protocol": args.protocol, "url": url, "spec": workload.spec, "seed": workload.seed,
+            "duration": args.duration, "requests_per_user": args.requests_per_user, "timeout": args.timeout,
+            "connections": args.connections, "report_interval": args.report_interval,
+        }
+        config["context"] = asyncio.run(setup_workload(config, workload))
+        print(f"✅ {len(config['context']['poll_ids'])} test poll(s) created, first ID: {config['context']['poll_id']}")
+        for num_users in args.users:
+            print(f"Testing {num_users} users ({workload.name}) on {min(args.workers, num_users)} workers...")
+            result = run_distributed(config, num_users, args.workers)
+            latency = result["latency"]
+            print(f"  Users: {num_users}, Throughput: {result['throughput']:.2f} req/s, "
+                  f"p50 {latency['p50']*1000:.2f}ms, p99 {latency['p99']*1000:.2f}ms, "
+                  f"errors: {failures(result['errors'])}")
+            all_results.append(result)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = f"distributed_{args.protocol}_results_{timestamp}.json"
+    with open(results_file, 'w') as f:
+        json.dump(all_results, f, indent=2)
+    print(f"💾 Results saved to: {results_file}")
+
+    print(f"\n📊 Results for Report.md ({args.protocol}, {args.workers} workers, latency in ms):")
+    print("| Total Users | Scenario | Avg Latency | p50 | p99 | p99.9 | Max | Throughput (req/s) | Errors |")
+    print("|-------------|----------|-------------|-----|-----|-------|-----|--------------------|--------|")
+    for r in all_results:
+        scenario = r['scenario'].title()
+        l = r["latency"]
+        print(f"| {r['num_users']:<11} | {scenario:<8} | {r['avg_latency']*1000:<11.2f} | {l['p50']*1000:.2f} "
+              f"| {l['p99']*1000:.2f} | {l['p99.9']*1000:.2f} | {l['max']*1000:.2f} | {r['throughput']:<18.2f} "
+              f"| {failures(r['errors'])} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,23 @@ import glob
 import os
 from typing import Dict, List, Tuple
 
+## what the graphs compare, each needs data for both protocols
+SCENARIOS = ('voting', 'results')
+
 def load_performance_data() -> Tuple[List[Dict], List[Dict]]:
     """Load performance data from JSON files"""
     
+    # Prefer the latest closed-loop cross-protocol harness run: both protocols, one schema,
+    # but only one with every scenario the graphs plot (--scenario can narrow or change them)
+    for harness_file in sorted(glob.glob("harness_results_*.json"), reverse=True):
+        with open(harness_file, 'r') as f:
+            harness_data = [entry for entry in json.load(f) if entry['mode'] == 'closed']
+        rest_data = [entry for entry in harness_data if entry['protocol'] == 'rest']
+        grpc_data = [entry for entry in harness_data if entry['protocol'] == 'grpc']
+        if all({entry['scenario'] for entry in data} >= set(SCENARIOS) for data in (rest_data, grpc_data)):
+            print(f"Loading REST API and gRPC data from: {harness_file}")
+            return rest_data, grpc_data
+    
     # Find the latest REST API results
     rest_files = glob.glob("performance_results_*.json")
     if not rest_files:
@@ -178,7 +192,7 @@ if __name__ == "__main__":
         exit(1)
     
     # Check if we're in the right directory
-    if not os.path.exists("performance_results_") and not glob.glob("performance_results_*.json"):
+    if not glob.glob("performance_results_*.json") and not glob.glob("harness_results_*.json"):
         print("❌ No performance results found in current directory")
         print("Please run this script from the performance_tests directory")
         exit(1)
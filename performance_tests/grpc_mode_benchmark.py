@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Threaded vs asyncio gRPC Server Mode Benchmark
+Runs the voting and results scenarios against a server started with
+GRPC_SERVER_MODE=threaded and one started with GRPC_SERVER_MODE=aio
+"""
+
+import argparse
+import json
+from datetime import datetime
+from typing import Dict, List
+
+from grpc_performance import add_trace_arguments, default_trace_file, gRPCPerformanceTester
+
+
+def run_mode(mode: str, url: str, user_counts: List[int], trace_rate: float = 0.0, trace_file: str = None) -> List[Dict]:
+    """Run both scenarios at every user count against one server mode"""
+    print(f"🔧 Mode: {mode} ({url})")
+    results = []
+
+    with gRPCPerformanceTester(url, trace_rate, trace_file) as tester:
+        for num_users in user_counts:
+            write_results = tester.test_write_heavy_scenario(num_users)
+            write_results["scenario"] = "voting"
+            write_results["mode"] = mode
+            tester.print_results(write_results)
+            results.append(write_results)
+
+            read_results = tester.test_read_heavy_scenario(num_users)
+            read_results["scenario"] = "results"
+            read_results["mode"] = mode
+            tester.print_results(read_results)
+            results.append(read_results)
+    print()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare threaded and asyncio gRPC server modes")
+    parser.add_argument("--threaded-url", default="localhost:50051",
+                        help="gRPC server running with GRPC_SERVER_MODE=threaded")
+    parser.add_argument("--aio-url", default="localhost:50052",
+                        help="gRPC server running with GRPC_SERVER_MODE=aio")
+    parser.add_argument("--users", nargs="+", type=int, default=[10, 50, 100, 500, 1000],
+                        help="Number of concurrent users to test")
+    add_trace_arguments(parser)
+    args = parser.parse_args()
+
+    print("🚀 Starting gRPC Server Mode Benchmark")
+    print(f"👥 User counts: {args.users}")
+    print()
+
+    ## one trace file for both modes: the server spans tell them apart (service name)
+    trace_file = args.trace_file or default_trace_file()
+    all_results = run_mode("threaded", args.threaded_url, args.users, args.trace_rate, trace_file)
+    all_results += run_mode("aio", args.aio_url, args.users, args.trace_rate, trace_file)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = f"grpc_mode_comparison_{timestamp}.json"
+    with open(results_file, 'w') as f:
+        json.dump(all_results, f, indent=2)
+    print(f"💾 Results saved to: {results_file}")
+
+    by_key = {(r["mode"], r["scenario"], r["num_users"]): r for r in all_results}
+    print(f"\n📊 Threaded vs asyncio:")
+    print("| Total Users | Scenario | Threaded Latency (ms) | aio Latency (ms) | Threaded (req/s) | aio (req/s) |")
+    print("|-------------|----------|-----------------------|------------------|------------------|-------------|")
+    for num_users in args.users:
+        for scenario in ("voting", "results"):
+            t = by_key[("threaded", scenario, num_users)]
+            a = by_key[("aio", scenario, num_users)]
+            label = "Voting" if scenario == "voting" else "Results"
+            print(f"| {num_users:<11} | {label:<8} | {t['avg_latency']*1000:<21.2f} | {a['avg_latency']*1000:<16.2f} "
+                  f"| {t['throughput']:<16.2f} | {a['throughput']:<11.2f} |")
+
+
+if __name__ == "__main__":
+    main()
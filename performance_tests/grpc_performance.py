@@ -23,7 +23,8 @@ sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__f
 
 try:
     import polling_pb2
-    import polling_pb2_grpc
+    from polling_client import NO_RETRY, PollingClient
+    from tracing import FileExporter, Tracer
 except ImportError:
     print("❌ Error: gRPC protobuf files not found.")
     print("Please ensure you're in the correct directory and protobuf files are generated.")
@@ -31,35 +32,49 @@ except ImportError:
     sys.exit(1)
 
 class gRPCPerformanceTester:
-    def __init__(self, server_url: str = "localhost:8080"):
+    def __init__(self, server_url: str = "localhost:8080", trace_rate: float = 0.0, trace_file: str = None):
         self.server_url = server_url
-        self.channel = None
-        self.poll_stub = None
-        self.vote_stub = None
-        self.result_stub = None
+        self.client = None
         self.test_poll_uuid = None
+        ## traced calls carry a traceparent, so trace_report.py can join them with the server's spans
+        self.tracer = None
+        if trace_rate > 0:
+            self.tracer = Tracer(FileExporter(trace_file or default_trace_file()), "loadgen", sample_rate=trace_rate)
         
     def __enter__(self):
-        self.channel = grpc.insecure_channel(self.server_url)
-        self.poll_stub = polling_pb2_grpc.PollServiceStub(self.channel)
-        self.vote_stub = polling_pb2_grpc.VoteServiceStub(self.channel)
-        self.result_stub = polling_pb2_grpc.ResultServiceStub(self.channel)
+        ## no retries: every failed or shed call is measured as such
+        self.client = PollingClient(self.server_url, retry=NO_RETRY)
         return self
         
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.channel:
-            self.channel.close()
+        if self.client:
+            self.client.close()
+        if self.tracer:
+            self.tracer.close()
+            print(f"🔎 Client spans written to: {self.tracer.exporter.path}")
+
+    def start_span(self, method: str):
+        """Client span for a call to `method` and the metadata to send with it; (None, None) if not sampled"""
+        span = self.tracer.client_span(method) if self.tracer else None
+        if span is None:
+            return None, None
+        return span, [("traceparent", span.traceparent())]
+
+    @staticmethod
+    def end_span(span, code: grpc.StatusCode = grpc.StatusCode.OK, **attributes):
+        if span is not None:
+            span.attributes.update(attributes)
+            span.set_attribute("rpc.grpc.status_code", code.name)
+            span.end("OK" if code == grpc.StatusCode.OK else "ERROR")
     
     def create_test_poll(self) -> str:
         """Create a test poll for performance testing"""
-        create_request = polling_pb2.CreatePollRequest(
-            poll_questions="Performance Test Poll - What is your favorite programming language?",
-            options=["Python", "JavaScript", "TypeScript", "Go", "Rust", "Java", "C++", "C#"]
-        )
-        
         start_time = time.time()
         try:
-            response = self.poll_stub.CreatePoll(create_request)
+            response = self.client.create_poll(
+                "Performance Test Poll - What is your favorite programming language?",
+                ["Python", "JavaScript", "TypeScript", "Go", "Rust", "Java", "C++", "C#"]
+            )
             end_time = time.time()
             
             self.test_poll_uuid = response.uuid
@@ -71,37 +86,35 @@ class gRPCPerformanceTester:
     
     def cast_vote(self, user_id: str, selected_option: str) -> Tuple[float, bool]:
         """Cast a single vote and return latency and success status"""
-        vote_request = polling_pb2.CastVoteRequest(
-            uuid=self.test_poll_uuid,
-            userID=user_id,
-            select_options=selected_option
-        )
-        
+        span, metadata = self.start_span("/polling.VoteService/CastVote")
         start_time = time.time()
         try:
-            response = self.vote_stub.CastVote(vote_request)
+            response = self.client.cast_vote(self.test_poll_uuid, user_id, selected_option, metadata=metadata)
             end_time = time.time()
             latency = end_time - start_time
             
             success = "Successfully" in response.status
+            self.end_span(span, vote_status=response.status)
             return latency, success
         except grpc.RpcError as e:
             end_time = time.time()
+            self.end_span(span, e.code())
             return end_time - start_time, False
     
     def get_poll_results(self) -> Tuple[float, bool]:
         """Get poll results and return latency and success status"""
-        result_request = polling_pb2.PollRequest(uuid=self.test_poll_uuid)
-        
+        span, metadata = self.start_span("/polling.ResultService/GetPollResults")
         start_time = time.time()
         try:
-            response = self.result_stub.GetPollResults(result_request)
+            response = self.client.get_poll_results(self.test_poll_uuid, metadata=metadata)
             end_time = time.time()
             latency = end_time - start_time
             
+            self.end_span(span)
             return latency, True
         except grpc.RpcError as e:
             end_time = time.time()
+            self.end_span(span, e.code())
             return end_time - start_time, False
     
     def test_write_heavy_scenario(self, num_users: int) -> Dict:
@@ -208,16 +221,156 @@ class gRPCPerformanceTester:
             "throughput": throughput
         }
     
+    def test_bulk_vote_scenario(self, num_users: int, num_streams: int = 4) -> Dict:
+        """Test the same votes sent through BulkCastVote, split across a few concurrent streams"""
+        print(f"Testing {num_users} votes over {num_streams} BulkCastVote streams...")
+
+        self.create_test_poll()
+
+        options = ["Python", "JavaScript", "TypeScript", "Go", "Rust", "Java", "C++", "C#"]
+        votes = [polling_pb2.CastVoteRequest(uuid=self.test_poll_uuid,
+                                             userID=f"user_{i}_{uuid.uuid4().hex[:8]}",
+                                             select_options=random.choice(options))
+                 for i in range(num_users)]
+
+        results_queue = queue.Queue()
+
+        def stream_worker(batch):
+            span, metadata = self.start_span("/polling.VoteService/BulkCastVote")
+            start = time.time()
+            try:
+                response = self.client.bulk_cast_vote(batch, metadata=metadata)
+                results_queue.put((time.time() - start, response.accepted))
+                self.end_span(span, votes=len(batch))
+            except grpc.RpcError as e:
+                results_queue.put((time.time() - start, 0))
+                self.end_span(span, e.code(), votes=len(batch))
+
+        threads = [threading.Thread(target=stream_worker, args=(votes[i::num_streams],))
+                   for i in range(num_streams)]
+        start_time = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        end_time = time.time()
+
+        latencies = []
+        accepted = 0
+        while not results_queue.empty():
+            latency, count = results_queue.get()
+            latencies.append(latency)
+            accepted += count
+
+        total_time = end_time - start_time
+        return {
+            "num_users": num_users,
+            "avg_latency": statistics.mean(latencies) if latencies else 0,
+            "throughput": accepted / total_time if total_time > 0 else 0
+        }
+
+    def test_overload_scenario(self, num_users: int, duration: float = 10.0, list_share: float = 0.5) -> Dict:
+        """
+        Closed-loop overload: num_users clients call as fast as they can for `duration` seconds,
+        CastVote (high priority) or ListPolls (low priority, `list_share` of the calls);
+        shed calls (RESOURCE_EXHAUSTED) are counted apart from served ones
+        """
+        print(f"Testing {num_users} clients overloading the server for {duration:.0f}s...")
+
+        self.create_test_poll()
+        options = ["Python", "JavaScript", "TypeScript", "Go", "Rust", "Java", "C++", "C#"]
+        outcomes = queue.Queue()
+        deadline = time.time() + duration
+
+        def client_worker(worker: int):
+            i = 0
+            while time.time() < deadline:
+                if random.random() < list_share:
+                    method = "ListPolls"
+                    call = lambda: self.client.list_polls(page_size=20)
+                else:
+                    method = "CastVote"
+                    user_id, option = f"overload_{worker}_{i}", random.choice(options)
+                    call = lambda: self.client.cast_vote(self.test_poll_uuid, user_id, option)
+                start = time.time()
+                try:
+                    call()
+                    outcome = "ok"
+                except grpc.RpcError as e:
+                    outcome = "shed" if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED else "error"
+                outcomes.put((method, outcome, time.time() - start))
+                i += 1
+
+        threads = [threading.Thread(target=client_worker, args=(w,)) for w in range(num_users)]
+        start_time = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        total_time = time.time() - start_time
+
+        by_method = {}
+        while not outcomes.empty():
+            method, outcome, latency = outcomes.get()
+            by_method.setdefault(method, {"ok": [], "shed": [], "error": []})[outcome].append(latency)
+
+        methods = {}
+        for method, latencies in sorted(by_method.items()):
+            calls = sum(len(v) for v in latencies.values())
+            methods[method] = {
+                "calls": calls,
+                "ok": len(latencies["ok"]),
+                "shed": len(latencies["shed"]),
+                "errors": len(latencies["error"]),
+                "shed_ratio": len(latencies["shed"]) / calls if calls else 0,
+                "ok_throughput": len(latencies["ok"]) / total_time if total_time > 0 else 0,
+                "ok_median_latency": statistics.median(latencies["ok"]) if latencies["ok"] else 0,
+                "ok_p99_latency": percentile(latencies["ok"], 0.99),
+                "shed_p99_latency": percentile(latencies["shed"], 0.99),
+            }
+
+        ok = [l for latencies in by_method.values() for l in latencies["ok"]]
+        return {
+            "num_users": num_users,
+            "duration": total_time,
+            "avg_latency": statistics.mean(ok) if ok else 0,
+            "throughput": len(ok) / total_time if total_time > 0 else 0,
+            "methods": methods,
+        }
+
     def print_results(self, results: Dict):
         """Print simplified results"""
         print(f"  Users: {results['num_users']}, Latency: {results['avg_latency']*1000:.2f}ms, Throughput: {results['throughput']:.2f} req/s")
 
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def default_trace_file() -> str:
+    return f"client_traces_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+
+
+def add_trace_arguments(parser: argparse.ArgumentParser):
+    """--trace-rate / --trace-file, shared by the scripts built on gRPCPerformanceTester"""
+    parser.add_argument("--trace-rate", type=float, default=0.0,
+                        help="Fraction of calls to trace (0 = off); run the server with TRACE_EXPORT set too")
+    parser.add_argument("--trace-file", default=None,
+                        help="JSONL file for the client spans (default: client_traces_<timestamp>.jsonl)")
+
+
 def run_performance_tests():
     """Run simple performance tests focusing on latency and throughput"""
     parser = argparse.ArgumentParser(description="Simple gRPC Performance Testing")
     parser.add_argument("--url", default="localhost:8080", help="gRPC server URL")
     parser.add_argument("--users", nargs="+", type=int, default=[10, 50, 100, 500, 1000], 
                        help="Number of concurrent users to test")
+    parser.add_argument("--overload-users", nargs="+", type=int, default=[],
+                        help="Also run the overload scenario (CastVote + ListPolls, closed loop) at these client counts")
+    parser.add_argument("--overload-duration", type=float, default=10.0, help="Seconds per overload run")
+    add_trace_arguments(parser)
     
     args = parser.parse_args()
     
@@ -228,7 +381,7 @@ def run_performance_tests():
     
     all_results = []
     
-    with gRPCPerformanceTester(args.url) as tester:
+    with gRPCPerformanceTester(args.url, args.trace_rate, args.trace_file) as tester:
         for num_users in args.users:
             print(f"Testing {num_users} users:")
             
@@ -245,6 +398,13 @@ def run_performance_tests():
             all_results.append(read_results)
             
             print()
+
+        for num_users in args.overload_users:
+            overload_results = tester.test_overload_scenario(num_users, args.overload_duration)
+            overload_results["scenario"] = "overload"
+            tester.print_results(overload_results)
+            all_results.append(overload_results)
+            print()
     
     # Save results to file
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -261,10 +421,22 @@ def run_performance_tests():
     print("|-------------|----------|------------------|-------------------|")
     
     for result in all_results:
+        if result['scenario'] == 'overload':
+            continue
         scenario = "Voting" if result['scenario'] == 'voting' else "Results"
         latency_ms = result['avg_latency'] * 1000
         throughput = result['throughput']
         print(f"| {result['num_users']:<11} | {scenario:<8} | {latency_ms:<16.2f} | {throughput:<17.2f} |")
 
+    overload = [r for r in all_results if r['scenario'] == 'overload']
+    if overload:
+        print(f"\n📊 Overload (served calls, shed = RESOURCE_EXHAUSTED):")
+        print("| Clients | Method | Served (req/s) | Shed % | Median (ms) | p99 (ms) | Shed p99 (ms) |")
+        print("|---------|--------|----------------|--------|-------------|----------|---------------|")
+        for result in overload:
+            for method, m in result['methods'].items():
+                print(f"| {result['num_users']:<7} | {method} | {m['ok_throughput']:<14.2f} | {m['shed_ratio']*100:<6.1f} "
+                      f"| {m['ok_median_latency']*1000:<11.2f} | {m['ok_p99_latency']*1000:<8.2f} | {m['shed_p99_latency']*1000:<13.2f} |")
+
 if __name__ == "__main__":
     run_performance_tests()
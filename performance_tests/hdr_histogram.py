@@ -0,0 +1,109 @@
+"""
+HDR Histogram
+Latency histogram in the style of HdrHistogram: fixed relative precision
+(3 significant figures by default) from 1 microsecond to a minute, in a
+few thousand counters, so millions of samples cost no more memory than a
+hundred and every percentile is read back within 0.1%. Histograms with
+the same settings merge exactly, by adding their counters
+"""
+
+import math
+from typing import Dict, List
+
+
+class HdrHistogram:
+    """Counts of nanosecond values; values past `highest` are counted as `highest`"""
+
+    def __init__(self, lowest: int = 1_000, highest: int = 60_000_000_000, significant_figures: int = 3):
+        self.lowest = lowest
+        self.highest = highest
+        self.significant_figures = significant_figures
+        ## values below 2 * 10^figures keep every unit: the linear range of each bucket
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_figures))
+        self.unit_magnitude = int(math.log2(lowest))
+        self.counts = [0] * (self._index(highest) + 1)
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.sum = 0
+
+    def _index(self, value: int) -> int:
+        units = value >> self.unit_magnitude
+        bucket = max(0, units.bit_length() - self.sub_bucket_bits)
+        return (bucket << (self.sub_bucket_bits - 1)) + (units >> bucket)
+
+    def _value_range(self, index: int):
+        """(lowest, highest) value counted at `index`"""
+        half = 1 << (self.sub_bucket_bits - 1)
+        bucket = max(0, (index >> (self.sub_bucket_bits - 1)) - 1)
+        sub = index - (bucket * half)
+        low = sub << (bucket + self.unit_magnitude)
+        return low, low + (1 << (bucket + self.unit_magnitude)) - 1
+
+    def record(self, value: int, count: int = 1):
+        value = max(0, int(value))
+        self.counts[self._index(min(value, self.highest))] += count
+        self.total += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "HdrHistogram"):
+        if (other.lowest, other.highest, other.significant_figures) != (self.lowest, self.highest, self.significant_figures):
+            raise ValueError("histograms with different settings can't be merged exactly")
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.total += other.total
+        self.sum += other.sum
+        if other.total:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def percentile(self, pct: float) -> int:
+        """Value (ns) at or below which `pct` percent of the samples fall"""
+        if not self.total:
+            return 0
+        rank = max(1, math.ceil(self.total * pct / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._value_range(index)[1], self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def summary(self, percentiles: List[float] = (50, 90, 99, 99.9)) -> Dict:
+        """Count, mean, the given percentiles and max, in seconds"""
+        result = {"count": self.total, "mean": self.mean() / 1e9}
+        for pct in percentiles:
+            result[f"p{pct:g}"] = self.percentile(pct) / 1e9
+        result["max"] = (self.max or 0) / 1e9
+        return result
+
+    def to_dict(self) -> Dict:
+        """JSON-ready, only the counters in use; from_dict() restores it exactly"""
+        return {
+            "lowest": self.lowest,
+            "highest": self.highest,
+            "significant_figures": self.significant_figures,
+            "counts": {str(i): c for i, c in enumerate(self.counts) if c},
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "sum": self.sum,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "HdrHistogram":
+        histogram = cls(data["lowest"], data["highest"], data["significant_figures"])
+        for index, count in data["counts"].items():
+            histogram.counts[int(index)] = count
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        histogram.sum = data["sum"]
+        return histogram
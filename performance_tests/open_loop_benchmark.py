@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Open-Loop Load Generator
+Sends calls (gRPC or REST, through protocol_adapters.py) on a fixed
+schedule, at a target rate for a set duration, and does not wait for
+replies before sending the next one (open loop).
+Latency is measured from each call's intended send time, so time the call
+spent waiting because the server (or this generator) fell behind counts
+too (no coordinated omission), and is recorded in an HDR histogram.
+Ramping through several rates shows where the latency knee is:
+the highest rate the server still keeps up with
+"""
+
+import argparse
+import asyncio
+import json
+from datetime import datetime
+from typing import Dict, List
+
+from benchmark_harness import run_step
+from protocol_adapters import ADAPTERS, REJECTIONS, failures, make_adapter
+from scenarios import PRESETS, load_scenario
+
+## the generator itself fell behind its schedule by more than this: flag the step
+MAX_SEND_LAG = 0.010
+
+
+def find_knee(steps: List[Dict], min_ratio: float, p99_factor: float):
+    """First step that no longer keeps up: answered < min_ratio of target, or p99 > p99_factor x the first step's"""
+    if not steps:
+        return None
+    base_p99 = steps[0]["latency"]["p99"]
+    for step in steps:
+        rejected = sum(count for error, count in step["errors"].items() if error in REJECTIONS)
+        answered = (step["ok"] + rejected) / step["duration"]
+        if (answered < min_ratio * step["target_rate"]
+                or step["latency"]["p99"] > p99_factor * base_p99):
+            return step
+    return None
+
+
+async def benchmark(args) -> List[Dict]:
+    async with make_adapter(args.protocol, args.url, args.timeout, args.connections) as adapter:
+        workload = load_scenario(args.scenario, args.seed)
+        context = await workload.setup(adapter)
+        print(f"✅ {len(context['poll_ids'])} test poll(s) created, first ID: {context['poll_id']}")
+        if args.warmup:
+            ## connections, server pools and caches warm up here, not in the first step's tail
+            print(f"🔥 Warming up at {args.rates[0]:.0f} req/s for {args.warmup}s...")
+            await run_step(adapter, workload, context, rate=args.rates[0], duration=args.warmup)
+        steps = []
+        for rate in args.rates:
+            print(f"🌊 {workload.name} at {rate:.0f} req/s for {args.duration}s...")
+            step = await run_step(adapter, workload, context, rate=rate, duration=args.duration)
+            latency = step["latency"]
+            print(f"  Achieved: {step['throughput']:.1f} req/s, p50 {latency['p50']*1000:.2f}ms, "
+                  f"p99 {latency['p99']*1000:.2f}ms, errors: {failures(step['errors'])}")
+            if step["max_send_lag"] > MAX_SEND_LAG:
+                print(f"  ⚠️  Generator fell {step['max_send_lag']*1000:.0f}ms behind schedule: this step measures the client too")
+            steps.append(step)
+            if args.pause:
+                await asyncio.sleep(args.pause)
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop constant-rate load with HDR latency percentiles")
+    parser.add_argument("--protocol", choices=sorted(ADAPTERS), default="grpc")
+    parser.add_argument("--url", help="Server URL (default: the adapter's, localhost:8080 for gRPC)")
+    parser.add_argument("--scenario", default="voting",
+                        help=f"Preset ({', '.join(PRESETS)}) or scenario JSON file (see scenarios.py); think times don't apply")
+    parser.add_argument("--seed", type=int, help="Random seed (default: the scenario's own)")
+    parser.add_argument("--rates", nargs="+", type=float, default=[100, 200, 400, 800, 1600],
+                        help="Target rates (req/s), one ramp step each")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per step")
+    parser.add_argument("--warmup", type=float, default=2, help="Unrecorded seconds at the first rate before the ramp")
+    parser.add_argument("--pause", type=float, default=2, help="Seconds between steps, for the server to drain")
+    parser.add_argument("--timeout", type=float, default=5, help="Deadline per call (seconds)")
+    parser.add_argument("--connections", type=int, help="gRPC channels / HTTP connections (default: adapter's own)")
+    parser.add_argument("--knee-ratio", type=float, default=0.95,
+                        help="Saturated once achieved throughput falls below this fraction of the target")
+    parser.add_argument("--knee-p99-factor", type=float, default=3.0,
+                        help="...or once p99 exceeds this multiple of the first step's p99")
+    args = parser.parse_args()
+    try:
+        scenario_name = load_scenario(args.scenario).name
+    except ValueError as e:
+        parser.error(str(e))
+
+    print("🚀 Starting Open-Loop Load Generator")
+    print(f"📍 {ADAPTERS[args.protocol].label}: {args.url or ADAPTERS[args.protocol].default_url}, "
+          f"scenario: {args.scenario}, rates: {args.rates}")
+    steps = asyncio.run(benchmark(args))
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = f"open_loop_{args.protocol}_{scenario_name}_{timestamp}.json"
+    with open(results_file, 'w') as f:
+        json.dump(steps, f, indent=2)
+    print(f"💾 Results saved to: {results_file}")
+
+    print(f"\n📊 Open-loop {scenario_name} (latency from intended send time, ms):")
+    print("| Target (req/s) | Achieved (req/s) | p50 | p90 | p99 | p99.9 | Max | Errors | Send Lag (ms) |")
+    print("|----------------|------------------|-----|-----|-----|-------|-----|--------|---------------|")
+    for s in steps:
+        l = s["latency"]
+        print(f"| {s['target_rate']:<14.0f} | {s['throughput']:<16.1f} | {l['p50']*1000:.2f} | {l['p90']*1000:.2f} "
+              f"| {l['p99']*1000:.2f} | {l['p99.9']*1000:.2f} | {l['max']*1000:.2f} | {failures(s['errors'])} "
+              f"| {s['max_send_lag']*1000:.1f} |")
+
+    knee = find_knee(steps, args.knee_ratio, args.knee_p99_factor)
+    if knee is None:
+        print(f"\n✅ Kept up at every rate, up to {steps[-1]['target_rate']:.0f} req/s")
+    else:
+        below = [s["target_rate"] for s in steps if s["target_rate"] < knee["target_rate"]]
+        last_ok = f"{max(below):.0f} req/s" if below else "none of the rates"
+        print(f"\n📈 Saturation knee: kept up at {last_ok}, not at {knee['target_rate']:.0f} req/s "
+              f"(achieved {knee['throughput']:.1f} req/s, p99 {knee['latency']['p99']*1000:.2f}ms)")
+
+
+if __name__ == "__main__":
+    main()
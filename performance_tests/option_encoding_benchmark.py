@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Option Encoding Benchmark
+Stores the same votes once with the option text (the old `select_options
+TEXT` column) and once with the option id (`option_id SMALLINT`, like
+database/schema.sql), and compares row size, table and tally index size,
+GROUP BY time and the protobuf bytes of a vote and a results reply
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import os
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'microservice_rpc', 'app'))
+
+try:
+    import polling_pb2
+except ImportError:
+    print("❌ Error: gRPC protobuf files not found.")
+    print("Run this from the performance_tests directory.")
+    sys.exit(1)
+
+OPTIONS = ["Python", "JavaScript", "TypeScript", "Go", "Rust", "Java", "C++", "C#"]
+SEED_CHUNK = 1_000_000
+SCHEMA = "option_bench"
+ENCODINGS = {"text": "TEXT", "smallint": "SMALLINT"}
+
+
+def create_tables(conn):
+    """Scratch vote and vote_tally copies per encoding, without triggers or partitions"""
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {SCHEMA}")
+    for encoding, column_type in ENCODINGS.items():
+        cur.execute(f"CREATE TABLE {SCHEMA}.vote_{encoding} (userID TEXT NOT NULL, option {column_type} NOT NULL, "
+                    f"vote_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP, uuid UUID, PRIMARY KEY (uuid, userID))")
+        cur.execute(f"CREATE TABLE {SCHEMA}.tally_{encoding} (uuid UUID, option {column_type} NOT NULL, "
+                    f"shard SMALLINT NOT NULL, votes BIGINT NOT NULL, PRIMARY KEY (uuid, option, shard))")
+    conn.commit()
+    cur.close()
+
+
+def seed(conn, votes: int, polls: int, options: List[str], shards: int):
+    """The same votes in both encodings: vote g goes to poll g % polls, option g % len(options)"""
+    cur = conn.cursor()
+    values = {"text": "(%(options)s::text[])[1 + g %% %(n)s]", "smallint": "g %% %(n)s"}
+    for encoding, value in values.items():
+        for chunk_start in range(0, votes, SEED_CHUNK):
+            chunk_end = min(votes, chunk_start + SEED_CHUNK)
+            cur.execute(
+                f"INSERT INTO {SCHEMA}.vote_{encoding} (userID, option, uuid) "
+                f"SELECT 'bench_' || g, {value}, md5('bench_poll_' || g %% %(polls)s)::uuid "
+                f"FROM generate_series(%(start)s, %(end)s) g",
+                {"options": options, "n": len(options), "polls": polls, "start": chunk_start, "end": chunk_end - 1},
+            )
+            conn.commit()
+        ## the counts spread over `shards` rows per option, as the tally triggers leave them
+        cur.execute(
+            f"INSERT INTO {SCHEMA}.tally_{encoding} (uuid, option, shard, votes) "
+            f"SELECT uuid, option, s, COUNT(*) FROM {SCHEMA}.vote_{encoding}, generate_series(0, %s - 1) s "
+            f"GROUP BY uuid, option, s",
+            (shards,),
+        )
+        conn.commit()
+    conn.autocommit = True
+    for encoding in ENCODINGS:
+        ## the tally rows went in in hash order; rebuild so both indexes are packed alike
+        cur.execute(f"REINDEX TABLE {SCHEMA}.tally_{encoding}")
+        cur.execute(f"VACUUM ANALYZE {SCHEMA}.vote_{encoding}")
+        cur.execute(f"VACUUM ANALYZE {SCHEMA}.tally_{encoding}")
+    conn.autocommit = False
+    cur.close()
+
+
+def sizes(conn, encoding: str) -> Dict:
+    cur = conn.cursor()
+    cur.execute(f"SELECT avg(pg_column_size(v.*)), avg(pg_column_size(v.option)) FROM {SCHEMA}.vote_{encoding} v")
+    avg_row, avg_option = cur.fetchone()
+    cur.execute("SELECT pg_relation_size(%s::regclass), pg_relation_size(%s::regclass), pg_relation_size(%s::regclass)",
+                (f"{SCHEMA}.vote_{encoding}", f"{SCHEMA}.tally_{encoding}", f"{SCHEMA}.tally_{encoding}_pkey"))
+    table, tally_table, tally_index = cur.fetchone()
+    cur.close()
+    conn.rollback()
+    return {
+        "avg_row_bytes": float(avg_row),
+        "avg_option_bytes": float(avg_option),
+        "vote_table_bytes": table,
+        "tally_table_bytes": tally_table,
+        "tally_index_bytes": tally_index,
+    }
+
+
+def time_poll_group_by(conn, encoding: str, polls: int, samples: int) -> List[float]:
+    """Per-poll count over `vote` (tally_admin verify/rebuild --poll)"""
+    cur = conn.cursor()
+    latencies = []
+    for _ in range(samples):
+        poll = random.randrange(polls)
+        start = time.perf_counter()
+        cur.execute(f"SELECT option, COUNT(*) FROM {SCHEMA}.vote_{encoding} "
+                    f"WHERE uuid = md5('bench_poll_' || %s)::uuid GROUP BY option", (poll,))
+        cur.fetchall()
+        latencies.append(time.perf_counter() - start)
+    cur.close()
+    conn.rollback()
+    return latencies
+
+
+def time_full_group_by(conn, encoding: str, runs: int) -> List[float]:
+    """Every poll's counts from `vote` (tally_admin verify/rebuild)"""
+    cur = conn.cursor()
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        cur.execute(f"SELECT uuid, option, COUNT(*) FROM {SCHEMA}.vote_{encoding} GROUP BY uuid, option")
+        cur.fetchall()
+        latencies.append(time.perf_counter() - start)
+    cur.close()
+    conn.rollback()
+    return latencies
+
+
+def wire_bytes(encoding: str, options: List[str], votes_per_option: int) -> Dict:
+    """Serialized CastVoteRequest (averaged over the options) and PollResultResponse"""
+    poll_uuid = "0b8f2a6e-6c1d-4f53-9a57-2d7c3e8b1f40"
+    if encoding == "text":
+        votes = [polling_pb2.CastVoteRequest(uuid=poll_uuid, userID="user_123456", select_options=option)
+                 for option in options]
+        reply = polling_pb2.PollResultResponse(uuid=poll_uuid, poll_questions="Favourite language?",
+                                               results={option: votes_per_option for option in options})
+    else:
+        votes = [polling_pb2.CastVoteRequest(uuid=poll_uuid, userID="user_123456", option_index=i)
+                 for i in range(len(options))]
+        reply = polling_pb2.PollResultResponse(uuid=poll_uuid, poll_questions="Favourite language?",
+                                               counts=[votes_per_option] * len(options))
+    return {
+        "cast_vote_bytes": statistics.mean(v.ByteSize() for v in votes),
+        "results_bytes": reply.ByteSize(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Option text vs smallint option id: storage, GROUP BY and wire bytes")
+    parser.add_argument("--db", default="host=localhost port=5432 dbname=pollsdb user=postgres password=postgres",
+                        help="libpq connection string of the primary database")
+    parser.add_argument("--votes", type=int, default=5_000_000, help="Votes stored in each encoding")
+    parser.add_argument("--polls", type=int, default=10_000, help="Polls the votes are spread over")
+    parser.add_argument("--options", nargs="+", default=OPTIONS, help="Option texts of every poll")
+    parser.add_argument("--shards", type=int, default=8, help="Tally shards per option")
+    parser.add_argument("--samples", type=int, default=200, help="Per-poll GROUP BY queries per encoding")
+    parser.add_argument("--scan-runs", type=int, default=3, help="Full-table GROUP BY runs per encoding")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    print("🚀 Starting Option Encoding Benchmark")
+    print(f"📈 {args.votes} votes over {args.polls} polls, {len(args.options)} options, {args.shards} tally shards")
+    print()
+
+    conn = psycopg2.connect(args.db)
+    create_tables(conn)
+    all_results = []
+    try:
+        print("🌱 Seeding both encodings...")
+        seed(conn, args.votes, args.polls, args.options, args.shards)
+        for encoding in ENCODINGS:
+            poll_scan = time_poll_group_by(conn, encoding, args.polls, args.samples)
+            full_scan = time_full_group_by(conn, encoding, args.scan_runs)
+            result = {"encoding": encoding, "votes": args.votes}
+            result.update(sizes(conn, encoding))
+            result["poll_group_by_median_latency"] = statistics.median(poll_scan)
+            result["full_group_by_median_latency"] = statistics.median(full_scan)
+            result.update(wire_bytes(encoding, args.options, args.votes // args.polls // len(args.options)))
+            all_results.append(result)
+            print(f"  {encoding}: {result['avg_row_bytes']:.1f} B/row, "
+                  f"full GROUP BY {result['full_group_by_median_latency']:.2f}s, "
+                  f"CastVote {result['cast_vote_bytes']:.1f} B")
+    finally:
+        if not args.keep:
+            cur = conn.cursor()
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            conn.commit()
+        conn.close()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = f"option_encoding_{timestamp}.json"
+    with open(results_file, 'w') as f:
+        json.dump(all_results, f, indent=2)
+    print(f"\n💾 Results saved to: {results_file}")
+
+    print(f"\n📊 Option encoding ({args.votes} votes, {len(args.options)} options):")
+    print("| Encoding | Avg Row (B) | Option (B) | Vote Table (MB) | Tally Index (MB) | Poll GROUP BY (ms) "
+          "| Full GROUP BY (s) | CastVote (B) | Results Reply (B) |")
+    print("|----------|-------------|------------|-----------------|------------------|--------------------"
+          "|-------------------|--------------|-------------------|")
+    for r in all_results:
+        print(f"| {r['encoding']} | {r['avg_row_bytes']:.1f} | {r['avg_option_bytes']:.1f} "
+              f"| {r['vote_table_bytes'] / 1024 / 1024:.1f} | {r['tally_index_bytes'] / 1024 / 1024:.2f} "
+              f"| {r['poll_group_by_median_latency']*1000:.2f} | {r['full_group_by_median_latency']:.2f} "
+              f"| {r['cast_vote_bytes']:.1f} | {r['results_bytes']} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Protocol Adapters
+One class per transport, all with the same async calls, so a benchmark
+workload runs unchanged over gRPC or the REST /polls API. A new transport
+is a new ProtocolAdapter subclass added to ADAPTERS
+"""
+
+import abc
+import os
+import sys
+from typing import Dict, List, Optional
+
+import aiohttp
+import asyncio
+import grpc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'microservice_rpc', 'app'))
+
+from polling_client import NO_RETRY, AsyncPollingClient
+
+## answered in time but not counted: what a workload that re-votes expects, not a failure
+REJECTIONS = frozenset({"duplicate_vote"})
+
+
+def failures(errors: Dict[str, int]) -> int:
+    """Calls among `errors` (label -> count) that really failed, REJECTIONS left out"""
+    return sum(count for error, count in errors.items() if error not in REJECTIONS)
+
+
+class ProtocolAdapter(abc.ABC):
+    """
+    Calls return None on success or a short error label (a gRPC status
+    code, HTTP_<status>, a vote status...) that results are grouped by;
+    only create_poll raises, since nothing can run without a poll
+    """
+
+    name = None
+    label = None
+    default_url = None
+
+    def __init__(self, url: str = None, timeout: float = 5, connections: int = 4):
+        self.url = url or self.default_url
+        self.timeout = timeout
+        self.connections = connections
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abc.abstractmethod
+    async def create_poll(self, question: str, options: List[str]) -> str:
+        """Id of the new poll"""
+
+    @abc.abstractmethod
+    async def list_polls(self) -> Optional[str]:
+        ...
+
+    @abc.abstractmethod
+    async def cast_vote(self, poll_id: str, user_id: str, option_index: int) -> Optional[str]:
+        ...
+
+    @abc.abstractmethod
+    async def get_poll_results(self, poll_id: str) -> Optional[str]:
+        ...
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class GrpcAdapter(ProtocolAdapter):
+    """PollService/VoteService/ResultService through polling_client, `connections` channels, no retries"""
+
+    name = "grpc"
+    label = "gRPC"
+    default_url = "localhost:8080"
+
+    async def connect(self):
+        ## no retries: every failed or shed call is measured as such
+        self.client = AsyncPollingClient(self.url, channels=self.connections, retry=NO_RETRY,
+                                         timeouts={method: self.timeout for method in
+                                                   ("CreatePoll", "ListPolls", "CastVote", "GetPollResults")})
+        for channel in self.client.pool.channels():
+            await asyncio.wait_for(channel.channel_ready(), self.timeout)
+
+    async def close(self):
+        await self.client.close()
+
+    async def create_poll(self, question, options):
+        return (await self.client.create_poll(question, options)).uuid
+
+    async def list_polls(self):
+        try:
+            await self.client.list_polls()
+        except grpc.aio.AioRpcError as e:
+            return e.code().name
+
+    async def cast_vote(self, poll_id, user_id, option_index):
+        try:
+            response = await self.client.cast_vote(poll_id, user_id, option_index=option_index)
+        except grpc.aio.AioRpcError as e:
+            return e.code().name
+        return None if response.status == "Vote Successfully!" else response.status
+
+    async def get_poll_results(self, poll_id):
+        try:
+            await self.client.get_poll_results(poll_id)
+        except grpc.aio.AioRpcError as e:
+            return e.code().name
+
+
+class RestAdapter(ProtocolAdapter):
+    """The /polls endpoints of rest_https over one aiohttp session; votes there carry no user id"""
+
+    name = "rest"
+    label = "REST API (HTTPS)"
+    default_url = "http://localhost:3005"
+
+    def __init__(self, url: str = None, timeout: float = 5, connections: int = 100):
+        super().__init__(url, timeout, connections)
+
+    async def connect(self):
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.connections),
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def close(self):
+        await self.session.close()
+
+    async def request(self, method: str, path: str, expected: int, **kwargs) -> Optional[str]:
+        try:
+            async with self.session.request(method, f"{self.url}{path}", **kwargs) as response:
+                await response.read()
+                return None if response.status == expected else f"HTTP_{response.status}"
+        except asyncio.TimeoutError:
+            return "TIMEOUT"
+        except aiohttp.ClientError as e:
+            return type(e).__name__
+
+    async def create_poll(self, question, options):
+        async with self.session.post(f"{self.url}/polls", json={"question": question, "options": options}) as response:
+            if response.status != 201:
+                raise Exception(f"Failed to create test poll: {response.status} - {await response.text()}")
+            return str((await response.json())["id"])
+
+    async def list_polls(self):
+        return await self.request("GET", "/polls", 200)
+
+    async def cast_vote(self, poll_id, user_id, option_index):
+        return await self.request("POST", f"/polls/{poll_id}/votes", 201, json={"optionIndex": option_index})
+
+    async def get_poll_results(self, poll_id):
+        return await self.request("GET", f"/polls/{poll_id}/results", 200)
+
+
+ADAPTERS: Dict[str, type] = {adapter.name: adapter for adapter in (GrpcAdapter, RestAdapter)}
+
+
+def make_adapter(protocol: str, url: str = None, timeout: float = 5, connections: int = None) -> ProtocolAdapter:
+    kwargs = {"url": url, "timeout": timeout}
+    if connections:
+        kwargs["connections"] = connections
+    return ADAPTERS[protocol](**kwargs)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+GetPollResults Latency vs Poll Size Benchmark
+Grows one poll to millions of votes and checks that GetPollResults (served
+from vote_tally) stays flat, next to the old GROUP BY scan over `vote`
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import os
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import grpc
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'microservice_rpc', 'app'))
+
+try:
+    import polling_pb2
+    import polling_pb2_grpc
+except ImportError:
+    print("❌ Error: gRPC protobuf files not found.")
+    print("Run this from the performance_tests directory.")
+    sys.exit(1)
+
+OPTIONS = ["Python", "JavaScript", "TypeScript", "Go", "Rust", "Java", "C++", "C#"]
+SEED_CHUNK = 1_000_000
+
+
+def seed_votes(conn, poll_uuid: str, start: int, end: int):
+    """Insert votes start..end-1 straight into the database (the tally triggers still fire)"""
+    cur = conn.cursor()
+    for chunk_start in range(start, end, SEED_CHUNK):
+        chunk_end = min(end, chunk_start + SEED_CHUNK)
+        cur.execute(
+            "INSERT INTO vote (userID, option_id, uuid) "
+            "SELECT 'bench_' || g, g %% %s, %s FROM generate_series(%s, %s) g",
+            (len(OPTIONS), poll_uuid, chunk_start, chunk_end - 1),
+        )
+        conn.commit()
+    cur.close()
+
+
+def time_rpc(result_stub, poll_uuid: str, samples: int) -> List[float]:
+    latencies = []
+    request = polling_pb2.PollRequest(uuid=poll_uuid)
+    for _ in range(samples):
+        start = time.perf_counter()
+        result_stub.GetPollResults(request)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def time_group_by(conn, poll_uuid: str, samples: int) -> List[float]:
+    """The query GetPollResults used to run on every call"""
+    cur = conn.cursor()
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        cur.execute("SELECT option_id, COUNT(*) FROM vote WHERE uuid = %s GROUP BY option_id", (poll_uuid,))
+        cur.fetchall()
+        latencies.append(time.perf_counter() - start)
+    cur.close()
+    return latencies
+
+
+def summarize(latencies: List[float]) -> Dict:
+    ordered = sorted(latencies)
+    return {
+        "median_latency": statistics.median(ordered),
+        "p99_latency": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GetPollResults latency as a poll grows")
+    parser.add_argument("--url", default="localhost:8080", help="gRPC server URL")
+    parser.add_argument("--db", default="host=localhost port=5432 dbname=pollsdb user=postgres password=postgres",
+                        help="libpq connection string used to seed votes")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000, 1000000, 5000000],
+                        help="Poll sizes (total votes) to measure at")
+    parser.add_argument("--samples", type=int, default=50, help="Requests per size")
+    parser.add_argument("--group-by-samples", type=int, default=5,
+                        help="Runs of the old GROUP BY query per size (0 to skip)")
+    args = parser.parse_args()
+
+    print("🚀 Starting GetPollResults Latency Benchmark")
+    print(f"📊 Poll sizes: {args.sizes}")
+    print()
+
+    conn = psycopg2.connect(args.db)
+    channel = grpc.insecure_channel(args.url)
+    poll_stub = polling_pb2_grpc.PollServiceStub(channel)
+    result_stub = polling_pb2_grpc.ResultServiceStub(channel)
+
+    poll = poll_stub.CreatePoll(polling_pb2.CreatePollRequest(
+        poll_questions="Results Latency Benchmark Poll", options=OPTIONS))
+    print(f"✅ Benchmark poll created with UUID: {poll.uuid}")
+
+    all_results = []
+    seeded = 0
+    for size in sorted(args.sizes):
+        print(f"Seeding poll to {size} votes...")
+        seed_votes(conn, poll.uuid, seeded, size)
+        seeded = size
+
+        result = {"num_votes": size}
+        result.update(summarize(time_rpc(result_stub, poll.uuid, args.samples)))
+        if args.group_by_samples:
+            group_by = summarize(time_group_by(conn, poll.uuid, args.group_by_samples))
+            result["group_by_median_latency"] = group_by["median_latency"]
+        all_results.append(result)
+        print(f"  Votes: {size}, GetPollResults median: {result['median_latency']*1000:.2f}ms, "
+              f"p99: {result['p99_latency']*1000:.2f}ms")
+
+    channel.close()
+    conn.close()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = f"results_latency_{timestamp}.json"
+    with open(results_file, 'w') as f:
+        json.dump(all_results, f, indent=2)
+    print(f"💾 Results saved to: {results_file}")
+
+    print(f"\n📊 GetPollResults latency by poll size:")
+    print("| Votes in Poll | Median (ms) | p99 (ms) | Old GROUP BY (ms) |")
+    print("|---------------|-------------|----------|-------------------|")
+    for r in all_results:
+        group_by = f"{r['group_by_median_latency']*1000:.2f}" if "group_by_median_latency" in r else "-"
+        print(f"| {r['num_votes']:<13} | {r['median_latency']*1000:<11.2f} | {r['p99_latency']*1000:<8.2f} | {group_by:<17} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Workload Scenarios
+A scenario is a declarative description of what simulated users do: how
+many polls there are and how popular each one is, the mix of operations,
+how often a voter comes back to vote again, think times and load phases.
+Scenarios are JSON files or built-in presets (PRESETS); the same seed
+draws the same sequence of operations and polls, and the same think times
+(which user waits which one depends on reply timing). Run them
+with benchmark_harness.py, open_loop_benchmark.py or distributed_load.py
+
+    {
+      "name": "mixed",
+      "seed": 42,
+      "polls": {"count": 1000, "options": 4, "prefill_votes": 0,
+                "popularity": {"distribution": "zipf", "s": 1.1}},
+      "mix": {"vote": 0.2, "results": 0.7, "list": 0.1},
+      "user_ids": {"reuse": 0.05},
+      "think_time": {"distribution": "exponential", "mean": 0.2},
+      "phases": [
+        {"type": "ramp", "duration": 30, "users": [10, 500]},
+        {"type": "steady", "duration": 60, "users": 500},
+        {"type": "spike", "duration": 10, "users": 2000},
+        {"type": "steady", "duration": 30, "users": 500}
+      ]
+    }
+
+- polls.popularity: "uniform", or "zipf" with exponent s (poll k is
+  picked in proportion to 1/k^s)
+- user_ids.reuse: chance that a vote is sent again under an id that has
+  already voted on that poll (a duplicate_vote on gRPC; REST votes carry
+  no user id)
+- think_time: "none", "constant" (mean), "uniform" (min, max) or
+  "exponential" (mean) seconds between a user's requests; closed loop only
+- phases: used by `benchmark_harness.py --mode phases`; ramp moves the
+  user count linearly from the first to the second value, steady and
+  spike hold it
+"""
+
+import abc
+import asyncio
+import bisect
+import json
+import os
+import random
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+QUESTION = "Performance Test Poll - What is your favorite programming language?"
+OPTIONS = ["Python", "JavaScript", "TypeScript", "Go", "Rust", "Java", "C++", "C#"]
+OPERATIONS = ("vote", "results", "list")
+PHASE_TYPES = ("ramp", "steady", "spike")
+## polls created concurrently during setup
+SETUP_CONCURRENCY = 50
+## ids remembered per poll for user_ids.reuse
+VOTER_HISTORY = 1000
+
+
+class Workload(abc.ABC):
+    """
+    What each request does, whatever the transport: `setup` runs once per
+    run and returns a (picklable) context, `request` is one operation with
+    `user_id` as the voter id if it votes, and returns (operation, error
+    label or None)
+    """
+
+    name = None
+
+    @abc.abstractmethod
+    async def setup(self, adapter) -> Dict:
+        ...
+
+    @abc.abstractmethod
+    async def request(self, adapter, context: Dict, user_id: str) -> Tuple[str, Optional[str]]:
+        ...
+
+    def think_time(self) -> float:
+        return 0.0
+
+
+class Scenario(Workload):
+    """A Workload built from a scenario spec (see the module docstring)"""
+
+    def __init__(self, spec: Dict, seed: int = None):
+        self.spec = validate(spec)
+        self.name = self.spec["name"]
+        self.seed = self.spec["seed"] if seed is None else seed
+        ## operations, polls, voters and options: drawn before the request's first await, so
+        ## the sequence is reproducible
+        self.rng = random.Random(self.seed)
+        ## think times are drawn as replies come back, in an order that depends on their
+        ## timing; their own generator keeps that from shifting the sequence above
+        self.think_rng = random.Random(f"{self.seed}:think")
+        polls = self.spec["polls"]
+        options = polls["options"]
+        self.options = options if isinstance(options, list) else \
+            (OPTIONS[:options] if options <= len(OPTIONS) else [f"Option {i + 1}" for i in range(options)])
+        popularity = polls["popularity"]
+        if popularity["distribution"] == "zipf":
+            weights = [1 / (rank ** popularity["s"]) for rank in range(1, polls["count"] + 1)]
+        else:
+            weights = [1.0] * polls["count"]
+        self.poll_weights = _cumulative(weights)
+        self.operations = list(self.spec["mix"])
+        self.operation_weights = _cumulative(list(self.spec["mix"].values()))
+        self.voters = {}
+
+    async def setup(self, adapter) -> Dict:
+        polls = self.spec["polls"]
+        semaphore = asyncio.Semaphore(SETUP_CONCURRENCY)
+
+        async def create(i: int) -> str:
+            async with semaphore:
+                poll_id = await adapter.create_poll(QUESTION, self.options)
+                for v in range(polls["prefill_votes"]):
+                    await adapter.cast_vote(poll_id, f"init_user_{v}_{uuid.uuid4().hex[:8]}", 0)
+                return poll_id
+
+        poll_ids = await asyncio.gather(*(create(i) for i in range(polls["count"])))
+        return {"poll_ids": list(poll_ids), "poll_id": poll_ids[0]}
+
+    def _pick(self, cumulative: List[float]) -> int:
+        return bisect.bisect_right(cumulative, self.rng.random() * cumulative[-1])
+
+    def _voter(self, poll_id: str, fresh_id: str) -> str:
+        if not self.spec["user_ids"]["reuse"]:
+            return fresh_id
+        seen = self.voters.setdefault(poll_id, [])
+        if seen and self.rng.random() < self.spec["user_ids"]["reuse"]:
+            return self.rng.choice(seen)
+        if len(seen) < VOTER_HISTORY:
+            seen.append(fresh_id)
+        else:
+            seen[self.rng.randrange(VOTER_HISTORY)] = fresh_id
+        return fresh_id
+
+    async def request(self, adapter, context, user_id):
+        operation = self.operations[self._pick(self.operation_weights)]
+        if operation == "list":
+            return operation, await adapter.list_polls()
+        poll_id = context["poll_ids"][self._pick(self.poll_weights)]
+        if operation == "results":
+            return operation, await adapter.get_poll_results(poll_id)
+        voter = self._voter(poll_id, user_id)
+        return operation, await adapter.cast_vote(poll_id, voter, self.rng.randrange(len(self.options)))
+
+    def think_time(self) -> float:
+        think = self.spec["think_time"]
+        distribution = think["distribution"]
+        if distribution == "constant":
+            return think["mean"]
+        if distribution == "uniform":
+            return self.think_rng.uniform(think["min"], think["max"])
+        if distribution == "exponential":
+            return self.think_rng.expovariate(1 / think["mean"])
+        return 0.0
+
+
+def _cumulative(weights: List[float]) -> List[float]:
+    total, cumulative = 0.0, []
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return cumulative
+
+
+def _number(value) -> bool:
+    ## JSON numbers only: True/False are ints to Python
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _integer(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate(spec: Dict) -> Dict:
+    """`spec` with defaults filled in; ValueError naming the first bad field"""
+    spec = json.loads(json.dumps(spec))
+    if not spec.get("name"):
+        raise ValueError("scenario needs a name")
+    spec.setdefault("seed", 42)
+    polls = spec.setdefault("polls", {})
+    polls.setdefault("count", 1)
+    polls.setdefault("options", len(OPTIONS))
+    polls.setdefault("prefill_votes", 0)
+    popularity = polls.setdefault("popularity", {"distribution": "uniform"})
+    if not _integer(polls["count"]) or polls["count"] < 1:
+        raise ValueError("polls.count must be an integer of at least 1")
+    options = polls["options"]
+    if not (isinstance(options, list) or _integer(options)):
+        raise ValueError("polls.options must be a list of options or an integer count")
+    if (len(options) if isinstance(options, list) else options) < 2:
+        raise ValueError("polls.options needs at least 2 options")
+    if not _integer(polls["prefill_votes"]) or polls["prefill_votes"] < 0:
+        raise ValueError("polls.prefill_votes must be a non-negative integer")
+    if popularity.get("distribution") not in ("uniform", "zipf"):
+        raise ValueError("polls.popularity.distribution must be 'uniform' or 'zipf'")
+    if popularity["distribution"] == "zipf":
+        popularity.setdefault("s", 1.0)
+        if not _number(popularity["s"]) or popularity["s"] <= 0:
+            raise ValueError("polls.popularity.s must be a positive number")
+
+    mix = spec.setdefault("mix", {"vote": 1.0})
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"unknown operations in mix: {sorted(unknown)}, expected {list(OPERATIONS)}")
+    if not all(_number(weight) for weight in mix.values()):
+        raise ValueError("mix weights must be numbers")
+    if any(weight < 0 for weight in mix.values()) or not sum(mix.values()):
+        raise ValueError("mix weights must be non-negative and not all zero")
+
+    user_ids = spec.setdefault("user_ids", {})
+    user_ids.setdefault("reuse", 0.0)
+    if not _number(user_ids["reuse"]) or not 0 <= user_ids["reuse"] <= 1:
+        raise ValueError("user_ids.reuse is a probability, between 0 and 1")
+
+    think = spec.setdefault("think_time", {"distribution": "none"})
+    distribution = think.get("distribution", "none")
+    if distribution not in ("none", "constant", "uniform", "exponential"):
+        raise ValueError("think_time.distribution must be none, constant, uniform or exponential")
+    needed = {"constant": ("mean",), "exponential": ("mean",), "uniform": ("min", "max")}.get(distribution, ())
+    for field in needed:
+        if field not in think:
+            raise ValueError(f"think_time.{field} is required for {distribution} think times")
+        if not _number(think[field]) or think[field] < 0:
+            raise ValueError(f"think_time.{field} must be a non-negative number")
+    if distribution == "exponential" and think["mean"] <= 0:
+        raise ValueError("think_time.mean must be positive for exponential think times")
+    if distribution == "uniform" and think["min"] > think["max"]:
+        raise ValueError("think_time.min must not exceed think_time.max")
+
+    for i, phase in enumerate(spec.setdefault("phases", [])):
+        if phase.get("type") not in PHASE_TYPES:
+            raise ValueError(f"phases[{i}].type must be one of {list(PHASE_TYPES)}")
+        if not _number(phase.get("duration", 0)) or phase.get("duration", 0) <= 0:
+            raise ValueError(f"phases[{i}].duration must be positive")
+        users = phase.get("users")
+        if phase["type"] == "ramp" and not (isinstance(users, list) and len(users) == 2
+                                            and all(_integer(u) and u >= 0 for u in users)):
+            raise ValueError(f"phases[{i}]: a ramp needs users: [from, to]")
+        if phase["type"] != "ramp" and not (_integer(users) and users >= 0):
+            raise ValueError(f"phases[{i}]: {phase['type']} needs a user count")
+        phase.setdefault("name", f"{phase['type']}_{i + 1}")
+    return spec
+
+
+PRESETS: Dict[str, Dict] = {
+    ## the original benchmark scenarios: one fresh poll, 100% votes by new users / 100% result reads
+    "voting": {
+        "name": "voting",
+        "polls": {"count": 1},
+        "mix": {"vote": 1.0},
+    },
+    "results": {
+        "name": "results",
+        "polls": {"count": 1, "prefill_votes": 10},
+        "mix": {"results": 1.0},
+    },
+    ## closer to production: many polls with a few hot ones, mostly reads, some returning voters
+    "mixed": {
+        "name": "mixed",
+        "polls": {"count": 1000, "options": 4, "popularity": {"distribution": "zipf", "s": 1.1}},
+        "mix": {"vote": 0.2, "results": 0.7, "list": 0.1},
+        "user_ids": {"reuse": 0.05},
+        "think_time": {"distribution": "exponential", "mean": 0.2},
+        "phases": [
+            {"type": "ramp", "duration": 30, "users": [10, 500]},
+            {"type": "steady", "duration": 60, "users": 500},
+            {"type": "spike", "duration": 10, "users": 2000},
+            {"type": "steady", "duration": 30, "users": 500},
+        ],
+    },
+}
+
+
+def load_scenario(name_or_path: str, seed: int = None) -> Scenario:
+    """A preset by name, or a scenario JSON file"""
+    if name_or_path in PRESETS:
+        return Scenario(PRESETS[name_or_path], seed)
+    if not os.path.exists(name_or_path):
+        raise ValueError(f"no preset or scenario file {name_or_path!r} (presets: {', '.join(PRESETS)})")
+    with open(name_or_path) as f:
+        return Scenario(json.load(f), seed)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Hot-Poll Tally Contention Benchmark
+Many concurrent writers vote on one poll straight in the database, once per
+shard count, to show how splitting each option's vote_tally row over shards
+stops the writers from queueing on one row lock
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import psycopg2
+
+OPTIONS = ["Python", "JavaScript", "TypeScript", "Go"]
+
+
+def create_poll(dsn: str, shards: int) -> str:
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO poll (poll_questions, options, tally_shards) VALUES (%s, %s, %s) RETURNING uuid",
+        (f"Tally Contention Poll - {shards} shards", OPTIONS, shards),
+    )
+    poll_uuid = str(cur.fetchone()[0])
+    conn.commit()
+    conn.close()
+    return poll_uuid
+
+
+def writer(dsn: str, poll_uuid: str, writer_id: int, batch: int, deadline: float,
+           latencies: List[float], errors: List[str]):
+    """Commit batches of `batch` votes until the deadline, like one app node's vote flusher"""
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    n = 0
+    try:
+        while time.perf_counter() < deadline:
+            votes = [(f"contention_{writer_id}_{n + i}", (n + i) % len(OPTIONS), poll_uuid)
+                     for i in range(batch)]
+            n += batch
+            start = time.perf_counter()
+            cur.execute(
+                "INSERT INTO vote (userID, option_id, uuid) "
+                "SELECT * FROM unnest(%s::text[], %s::smallint[], %s::uuid[])",
+                ([v[0] for v in votes], [v[1] for v in votes], [v[2] for v in votes]),
+            )
+            conn.commit()
+            latencies.append(time.perf_counter() - start)
+    except psycopg2.Error as e:
+        errors.append(str(e).strip())
+    finally:
+        conn.close()
+
+
+def run_test(dsn: str, shards: int, writers: int, batch: int, duration: float) -> Dict:
+    poll_uuid = create_poll(dsn, shards)
+    latencies: List[float] = []
+    errors: List[str] = []
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=writer, args=(dsn, poll_uuid, i, batch, deadline, latencies, errors))
+               for i in range(writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(SUM(votes), 0) FROM vote_tally WHERE uuid = %s", (poll_uuid,))
+    tallied = int(cur.fetchone()[0])
+    cur.execute("SELECT COUNT(*) FROM vote WHERE uuid = %s", (poll_uuid,))
+    counted = cur.fetchone()[0]
+    conn.close()
+
+    ordered = sorted(latencies)
+    return {
+        "shards": shards,
+        "writers": writers,
+        "batch": batch,
+        "votes": counted,
+        "votes_per_second": counted / elapsed,
+        "median_commit_latency": statistics.median(ordered) if ordered else 0.0,
+        "p99_commit_latency": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] if ordered else 0.0,
+        "tally_matches": tallied == counted,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent writers on one poll vs vote_tally shard count")
+    parser.add_argument("--db", default="host=localhost port=5432 dbname=pollsdb user=postgres password=postgres",
+                        help="libpq connection string of the primary database")
+    parser.add_argument("--shards", nargs="+", type=int, default=[1, 4, 16, 64],
+                        help="Shard counts to test")
+    parser.add_argument("--writers", type=int, default=64, help="Concurrent writer connections")
+    parser.add_argument("--batch", type=int, default=1, help="Votes per transaction")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per run")
+    args = parser.parse_args()
+
+    print("🚀 Starting Hot-Poll Tally Contention Benchmark")
+    print(f"👥 {args.writers} writers, {args.batch} vote(s) per transaction, shard counts: {args.shards}")
+    print()
+
+    all_results = []
+    for shards in args.shards:
+        result = run_test(args.db, shards, args.writers, args.batch, args.duration)
+        all_results.append(result)
+        print(f"  Shards: {shards}, {result['votes_per_second']:.0f} votes/s, "
+              f"commit p99: {result['p99_commit_latency']*1000:.2f}ms, "
+              f"tally {'✅' if result['tally_matches'] else '❌'}, errors: {result['errors']}")
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = f"tally_contention_{timestamp}.json"
+    with open(results_file, 'w') as f:
+        json.dump(all_results, f, indent=2)
+    print(f"\n💾 Results saved to: {results_file}")
+
+    base = all_results[0]["votes_per_second"] or 1
+    print(f"\n📊 Hot-poll write throughput ({args.writers} writers):")
+    print("| Shards | Votes/s | Speedup | Median Commit (ms) | p99 Commit (ms) | Tally OK |")
+    print("|--------|---------|---------|--------------------|-----------------|----------|")
+    for r in all_results:
+        print(f"| {r['shards']:<6} | {r['votes_per_second']:<7.0f} | {r['votes_per_second']/base:<6.2f}x "
+              f"| {r['median_commit_latency']*1000:<18.2f} | {r['p99_commit_latency']*1000:<15.2f} "
+              f"| {'yes' if r['tally_matches'] else 'no':<8} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Tests for hdr_histogram.py: merging per-worker histograms must give exactly
+the histogram of all the samples recorded in one place
+"""
+
+import math
+import random
+
+import pytest
+
+from hdr_histogram import HdrHistogram
+
+
+def samples(seed: int, n: int = 5000):
+    rng = random.Random(seed)
+    ## microseconds to seconds, in ns: every bucket size gets used
+    return [int(rng.lognormvariate(15, 2)) for _ in range(n)]
+
+
+def test_merge_equals_recording_everything_in_one_histogram():
+    parts = [samples(seed) for seed in range(4)]
+    merged = HdrHistogram()
+    for part in parts:
+        histogram = HdrHistogram()
+        for value in part:
+            histogram.record(value)
+        merged.merge(histogram)
+
+    single = HdrHistogram()
+    for part in parts:
+        for value in part:
+            single.record(value)
+
+    assert merged.counts == single.counts
+    assert (merged.total, merged.sum, merged.min, merged.max) == (single.total, single.sum, single.min, single.max)
+    assert merged.summary() == single.summary()
+
+
+def test_merge_through_to_dict_is_exact():
+    histogram = HdrHistogram()
+    for value in samples(7):
+        histogram.record(value)
+    restored = HdrHistogram.from_dict(histogram.to_dict())
+    assert restored.counts == histogram.counts
+    assert restored.summary() == histogram.summary()
+
+    merged = HdrHistogram().merge(restored).merge(HdrHistogram.from_dict(histogram.to_dict()))
+    assert merged.total == 2 * histogram.total
+    assert merged.percentile(99) == histogram.percentile(99)
+
+
+def test_merging_an_empty_histogram_changes_nothing():
+    histogram = HdrHistogram()
+    histogram.record(2_000_000)
+    histogram.merge(HdrHistogram())
+    assert (histogram.total, histogram.min, histogram.max) == (1, 2_000_000, 2_000_000)
+
+    empty = HdrHistogram().merge(histogram)
+    assert (empty.total, empty.min, empty.max) == (1, 2_000_000, 2_000_000)
+
+
+def test_merge_refuses_different_settings():
+    with pytest.raises(ValueError):
+        HdrHistogram().merge(HdrHistogram(significant_figures=2))
+
+
+def test_percentiles_within_the_configured_precision():
+    histogram = HdrHistogram()
+    values = sorted(samples(3))
+    for value in values:
+        histogram.record(value)
+    for pct in (50, 90, 99, 99.9):
+        exact = values[max(1, math.ceil(len(values) * pct / 100)) - 1]
+        assert abs(histogram.percentile(pct) - exact) <= max(exact / 1000, histogram.lowest)
@@ -0,0 +1,85 @@
+"""
+Tests for scenarios.validate: defaults are filled in, and a bad spec is a
+ValueError naming the field, never a TypeError from deeper in
+"""
+
+import pytest
+
+from scenarios import PRESETS, load_scenario, validate
+
+
+def test_minimal_spec_gets_defaults():
+    spec = validate({"name": "minimal"})
+    assert spec["seed"] == 42
+    assert spec["polls"] == {"count": 1, "options": 8, "prefill_votes": 0, "popularity": {"distribution": "uniform"}}
+    assert spec["mix"] == {"vote": 1.0}
+    assert spec["user_ids"] == {"reuse": 0.0}
+    assert spec["think_time"] == {"distribution": "none"}
+    assert spec["phases"] == []
+
+
+def test_validate_leaves_the_input_alone():
+    original = {"name": "x", "polls": {"count": 2}}
+    validate(original)
+    assert original == {"name": "x", "polls": {"count": 2}}
+
+
+def test_zipf_exponent_defaults_to_one():
+    spec = validate({"name": "x", "polls": {"popularity": {"distribution": "zipf"}}})
+    assert spec["polls"]["popularity"]["s"] == 1.0
+
+
+def test_phases_get_names():
+    spec = validate({"name": "x", "phases": [{"type": "ramp", "duration": 5, "users": [1, 10]},
+                                             {"type": "steady", "duration": 5, "users": 10, "name": "hold"}]})
+    assert [phase["name"] for phase in spec["phases"]] == ["ramp_1", "hold"]
+
+
+@pytest.mark.parametrize("name", sorted(PRESETS))
+def test_presets_are_valid(name):
+    assert load_scenario(name).name == name
+
+
+@pytest.mark.parametrize("spec, field", [
+    ({}, "name"),
+    ({"name": "x", "polls": {"count": 0}}, "polls.count"),
+    ({"name": "x", "polls": {"count": "2"}}, "polls.count"),
+    ({"name": "x", "polls": {"options": 1}}, "polls.options"),
+    ({"name": "x", "polls": {"options": ["only"]}}, "polls.options"),
+    ({"name": "x", "polls": {"options": "4"}}, "polls.options"),
+    ({"name": "x", "polls": {"options": 3.5}}, "polls.options"),
+    ({"name": "x", "polls": {"options": True}}, "polls.options"),
+    ({"name": "x", "polls": {"prefill_votes": -1}}, "polls.prefill_votes"),
+    ({"name": "x", "polls": {"prefill_votes": 2.5}}, "polls.prefill_votes"),
+    ({"name": "x", "polls": {"popularity": {"distribution": "pareto"}}}, "polls.popularity.distribution"),
+    ({"name": "x", "polls": {"popularity": {"distribution": "zipf", "s": -1}}}, "polls.popularity.s"),
+    ({"name": "x", "polls": {"popularity": {"distribution": "zipf", "s": 0}}}, "polls.popularity.s"),
+    ({"name": "x", "polls": {"popularity": {"distribution": "zipf", "s": "1.1"}}}, "polls.popularity.s"),
+    ({"name": "x", "mix": {"delete": 1}}, "unknown operations"),
+    ({"name": "x", "mix": {"vote": "a"}}, "mix weights"),
+    ({"name": "x", "mix": {"vote": True}}, "mix weights"),
+    ({"name": "x", "mix": {"vote": -1, "results": 2}}, "mix weights"),
+    ({"name": "x", "mix": {"vote": 0}}, "mix weights"),
+    ({"name": "x", "user_ids": {"reuse": 1.5}}, "user_ids.reuse"),
+    ({"name": "x", "user_ids": {"reuse": "0.5"}}, "user_ids.reuse"),
+    ({"name": "x", "think_time": {"distribution": "gamma"}}, "think_time.distribution"),
+    ({"name": "x", "think_time": {"distribution": "uniform", "min": 0}}, "think_time.max"),
+    ({"name": "x", "think_time": {"distribution": "constant", "mean": "1"}}, "think_time.mean"),
+    ({"name": "x", "think_time": {"distribution": "exponential", "mean": 0}}, "think_time.mean"),
+    ({"name": "x", "think_time": {"distribution": "uniform", "min": 5, "max": 1}}, "think_time.min"),
+    ({"name": "x", "phases": [{"type": "steady", "duration": 1, "users": True}]}, r"phases\[0\]: steady"),
+    ({"name": "x", "phases": [{"type": "plateau", "duration": 1, "users": 1}]}, r"phases\[0\].type"),
+    ({"name": "x", "phases": [{"type": "steady", "users": 1}]}, r"phases\[0\].duration"),
+    ({"name": "x", "phases": [{"type": "steady", "duration": "5", "users": 1}]}, r"phases\[0\].duration"),
+    ({"name": "x", "phases": [{"type": "ramp", "duration": 1, "users": 10}]}, r"phases\[0\]: a ramp"),
+    ({"name": "x", "phases": [{"type": "ramp", "duration": 1, "users": [1, "9"]}]}, r"phases\[0\]: a ramp"),
+    ({"name": "x", "phases": [{"type": "spike", "duration": 1, "users": [1, 9]}]}, r"phases\[0\]: spike"),
+])
+def test_bad_field_is_a_value_error_naming_it(spec, field):
+    with pytest.raises(ValueError, match=field):
+        validate(spec)
+
+
+def test_unknown_scenario_name():
+    with pytest.raises(ValueError, match="no preset or scenario file"):
+        load_scenario("no-such-scenario")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Local Trace Collector
+Stands in for an OpenTelemetry collector: accepts OTLP/HTTP JSON on
+POST /v1/traces (servers started with TRACE_EXPORT=otlp) and appends the
+spans to a JSONL file in the format TRACE_EXPORT=file writes, ready for
+trace_report.py
+"""
+
+import argparse
+import http.server
+import json
+import os
+import sys
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'microservice_rpc', 'app'))
+
+try:
+    from tracing import from_otlp
+except ImportError:
+    print("❌ Error: microservice_rpc/app/tracing.py not found.")
+    print("Run this from the performance_tests directory.")
+    sys.exit(1)
+
+
+def make_handler(output: str, lock: threading.Lock, counts: dict):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path.rstrip("/") != "/v1/traces":
+                self.send_error(404)
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                spans = from_otlp(body)
+            except (ValueError, KeyError, TypeError) as e:
+                self.send_error(400, f"bad OTLP JSON: {e}")
+                return
+            with lock:
+                with open(output, "a") as f:
+                    f.writelines(json.dumps(s, separators=(",", ":")) + "\n" for s in spans)
+                counts["spans"] += len(spans)
+                counts["requests"] += 1
+            reply = b"{}"
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive OTLP/HTTP JSON spans and append them to a JSONL file")
+    parser.add_argument("--port", type=int, default=4318, help="Port to listen on (OTLP/HTTP default: 4318)")
+    parser.add_argument("--output", default="server_traces.jsonl", help="JSONL file the spans are appended to")
+    args = parser.parse_args()
+
+    counts = {"spans": 0, "requests": 0}
+    server = http.server.ThreadingHTTPServer(("0.0.0.0", args.port),
+                                             make_handler(args.output, threading.Lock(), counts))
+    print("🚀 Starting Local Trace Collector")
+    print(f"📍 POST http://localhost:{args.port}/v1/traces -> {args.output}")
+    print("   (start the servers with TRACE_EXPORT=otlp; Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print(f"\n💾 {counts['spans']} spans from {counts['requests']} exports saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
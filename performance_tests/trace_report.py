@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Trace Report
+Joins the client spans of a load generator (--trace-rate) with the server
+spans of the same calls (TRACE_EXPORT=file, or trace_collector.py) by trace
+id, and splits every traced call into network/proxy time (client latency
+minus server handling), the server's phases (queue, pool_wait, db,
+vote_batch, ...) and the rest of the handler ("app")
+"""
+
+import argparse
+import json
+import statistics
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def load_spans(paths: List[str]) -> Dict[str, List[Dict]]:
+    """trace id -> spans, from any number of client and server JSONL files"""
+    traces = defaultdict(list)
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    span = json.loads(line)
+                    traces[span["trace_id"]].append(span)
+    return traces
+
+
+def duration(span: Dict) -> float:
+    return (span["end_unix_nano"] - span["start_unix_nano"]) / 1e9
+
+
+def phase_times(server: Dict, children: Dict[str, List[Dict]]) -> Dict[str, float]:
+    """Time per phase under the server span; a phase's own children (a batch flush's SQL) are part of it"""
+    phases = defaultdict(float)
+    pending = list(children.get(server["span_id"], ()))
+    while pending:
+        span = pending.pop()
+        phase = span["attributes"].get("phase")
+        if phase:
+            phases[phase] += duration(span)
+        else:
+            pending.extend(children.get(span["span_id"], ()))
+    return dict(phases)
+
+
+def breakdown(traces: Dict[str, List[Dict]]) -> List[Dict]:
+    """One row per server span, with its client span when the load generator sent one"""
+    rows = []
+    for trace_id, spans in traces.items():
+        by_id = {s["span_id"]: s for s in spans}
+        children = defaultdict(list)
+        for s in spans:
+            if s["parent_span_id"]:
+                children[s["parent_span_id"]].append(s)
+        for server in spans:
+            if server["kind"] != "SERVER":
+                continue
+            client = by_id.get(server["parent_span_id"])
+            phases = phase_times(server, children)
+            row = {
+                "trace_id": trace_id,
+                "method": server["name"],
+                "service": server["service"],
+                "status": server["attributes"].get("rpc.grpc.status_code", server["status"]),
+                "server": duration(server),
+                "client": None,
+                "network": None,
+                "phases": phases,
+                "app": duration(server) - sum(phases.values()),
+            }
+            if client is not None and client["kind"] == "CLIENT":
+                row["client"] = duration(client)
+                row["network"] = row["client"] - row["server"]
+            rows.append(row)
+    return rows
+
+
+def summarize(rows: List[Dict]) -> List[Dict]:
+    """Median and p95 of every part, per method"""
+    by_method = defaultdict(list)
+    for row in rows:
+        by_method[row["method"]].append(row)
+    summary = []
+    for method, method_rows in sorted(by_method.items()):
+        joined = [r for r in method_rows if r["client"] is not None]
+        phase_names = sorted({p for r in method_rows for p in r["phases"]})
+        result = {
+            "method": method,
+            "traces": len(method_rows),
+            "joined": len(joined),
+            "client_median": statistics.median(r["client"] for r in joined) if joined else None,
+            "client_p95": percentile([r["client"] for r in joined], 0.95) if joined else None,
+            "network_median": statistics.median(r["network"] for r in joined) if joined else None,
+            "server_median": statistics.median(r["server"] for r in method_rows),
+            "server_p95": percentile([r["server"] for r in method_rows], 0.95),
+            "app_median": statistics.median(r["app"] for r in method_rows),
+            "phase_medians": {p: statistics.median(r["phases"].get(p, 0.0) for r in method_rows)
+                              for p in phase_names},
+            "phase_p95s": {p: percentile([r["phases"].get(p, 0.0) for r in method_rows], 0.95)
+                           for p in phase_names},
+        }
+        summary.append(result)
+    return summary
+
+
+def ms(value) -> str:
+    return "-" if value is None else f"{value*1000:.2f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-phase latency breakdown of traced calls, client to database")
+    parser.add_argument("files", nargs="+", help="Client and server span JSONL files")
+    parser.add_argument("--slowest", type=int, default=10, help="Slowest traced calls to list")
+    args = parser.parse_args()
+
+    print("🚀 Starting Trace Report")
+    traces = load_spans(args.files)
+    rows = breakdown(traces)
+    print(f"🔎 {sum(len(s) for s in traces.values())} spans, {len(traces)} traces, {len(rows)} server calls")
+    if not rows:
+        print("❌ No server spans found: were the servers started with TRACE_EXPORT set?")
+        return
+    summary = summarize(rows)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = f"trace_report_{timestamp}.json"
+    with open(results_file, 'w') as f:
+        json.dump({"summary": summary, "calls": rows}, f, indent=2)
+    print(f"💾 Results saved to: {results_file}")
+
+    print(f"\n📊 Latency breakdown per method (median ms, p95 in brackets):")
+    print("| Method | Traces | Client | Network/Proxy | Server | Phases | App |")
+    print("|--------|--------|--------|---------------|--------|--------|-----|")
+    for r in summary:
+        phases = ", ".join(f"{p} {ms(m)} ({ms(r['phase_p95s'][p])})" for p, m in r["phase_medians"].items())
+        print(f"| {r['method']} | {r['traces']} ({r['joined']} joined) | {ms(r['client_median'])} "
+              f"({ms(r['client_p95'])}) | {ms(r['network_median'])} | {ms(r['server_median'])} "
+              f"({ms(r['server_p95'])}) | {phases or '-'} | {ms(r['app_median'])} |")
+
+    print(f"\n🐢 Slowest {args.slowest} calls:")
+    print("| Trace | Method | Status | Client (ms) | Server (ms) | Largest Phase |")
+    print("|-------|--------|--------|-------------|-------------|---------------|")
+    slowest = sorted(rows, key=lambda r: r["client"] if r["client"] is not None else r["server"], reverse=True)
+    for r in slowest[:args.slowest]:
+        top = max(r["phases"].items(), key=lambda item: item[1], default=None)
+        largest = f"{top[0]} {ms(top[1])}ms" if top else "-"
+        print(f"| {r['trace_id']} | {r['method']} | {r['status']} | {ms(r['client'])} | {ms(r['server'])} | {largest} |")
+
+
+if __name__ == "__main__":
+    main()
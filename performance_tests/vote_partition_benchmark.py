@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Partitioned vs Plain Vote Table Benchmark
+Grows a plain copy of the vote table and one hash-partitioned on the poll
+uuid (like database/schema.sql) to tens of millions of votes, and compares
+insert latency, per-poll read latency and the vacuum unit at each size
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import psycopg2
+
+OPTIONS = ["Python", "JavaScript", "TypeScript", "Go"]
+SEED_CHUNK = 1_000_000
+SCHEMA = "vote_bench"
+LAYOUTS = ["plain", "partitioned"]
+
+
+def create_tables(conn, partitions: int):
+    """Scratch copies of `vote` without the tally triggers, so only the table itself is measured"""
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {SCHEMA}")
+    columns = ("userID TEXT NOT NULL, option_id SMALLINT NOT NULL, "
+               "vote_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP, uuid UUID, PRIMARY KEY (uuid, userID)")
+    cur.execute(f"CREATE TABLE {SCHEMA}.plain ({columns})")
+    cur.execute(f"CREATE TABLE {SCHEMA}.partitioned ({columns}) PARTITION BY HASH (uuid)")
+    for r in range(partitions):
+        cur.execute(f"CREATE TABLE {SCHEMA}.partitioned_{r} PARTITION OF {SCHEMA}.partitioned "
+                    f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {r})")
+    conn.commit()
+    cur.close()
+
+
+def seed_votes(conn, table: str, polls: int, start: int, end: int):
+    """Votes start..end-1 spread round-robin over `polls` polls"""
+    cur = conn.cursor()
+    for chunk_start in range(start, end, SEED_CHUNK):
+        chunk_end = min(end, chunk_start + SEED_CHUNK)
+        cur.execute(
+            f"INSERT INTO {SCHEMA}.{table} (userID, option_id, uuid) "
+            f"SELECT 'bench_' || g, g %% %s, md5('bench_poll_' || g %% %s)::uuid "
+            f"FROM generate_series(%s, %s) g",
+            (len(OPTIONS), polls, chunk_start, chunk_end - 1),
+        )
+        conn.commit()
+    cur.execute(f"ANALYZE {SCHEMA}.{table}")
+    conn.commit()
+    cur.close()
+
+
+def poll_uuids(conn, polls: int, samples: int) -> List[str]:
+    cur = conn.cursor()
+    cur.execute("SELECT md5('bench_poll_' || g)::uuid::text FROM generate_series(0, %s - 1) g", (polls,))
+    uuids = [row[0] for row in cur.fetchall()]
+    cur.close()
+    conn.rollback()
+    return [random.choice(uuids) for _ in range(samples)]
+
+
+def time_inserts(conn, table: str, uuids: List[str], batch: int, tag: str) -> List[float]:
+    """One committed transaction of `batch` new votes per sample, like the vote flusher"""
+    cur = conn.cursor()
+    latencies = []
+    for i, poll in enumerate(uuids):
+        users = [f"{tag}_{i}_{j}" for j in range(batch)]
+        start = time.perf_counter()
+        cur.execute(
+            f"INSERT INTO {SCHEMA}.{table} (userID, option_id, uuid) "
+            f"SELECT u, %s, %s FROM unnest(%s::text[]) u ON CONFLICT DO NOTHING",
+            (i % len(OPTIONS), poll, users),
+        )
+        conn.commit()
+        latencies.append(time.perf_counter() - start)
+    cur.close()
+    return latencies
+
+
+def time_poll_reads(conn, table: str, uuids: List[str]) -> List[float]:
+    """Per-poll count over `vote` (tally_admin verify/rebuild --poll)"""
+    cur = conn.cursor()
+    latencies = []
+    for poll in uuids:
+        start = time.perf_counter()
+        cur.execute(f"SELECT option_id, COUNT(*) FROM {SCHEMA}.{table} WHERE uuid = %s GROUP BY option_id",
+                    (poll,))
+        cur.fetchall()
+        latencies.append(time.perf_counter() - start)
+    cur.close()
+    conn.rollback()
+    return latencies
+
+
+def time_vacuum(conn, table: str) -> float:
+    """
+    Full-scan VACUUM (the anti-wraparound worst case) of the unit autovacuum
+    works on: the whole plain table, or one partition
+    """
+    target = f"{SCHEMA}.partitioned_0" if table == "partitioned" else f"{SCHEMA}.plain"
+    conn.autocommit = True
+    cur = conn.cursor()
+    start = time.perf_counter()
+    cur.execute(f"VACUUM (DISABLE_PAGE_SKIPPING) {target}")
+    elapsed = time.perf_counter() - start
+    cur.close()
+    conn.autocommit = False
+    return elapsed
+
+
+def index_bytes(conn, table: str) -> int:
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(SUM(pg_relation_size(indexrelid)), 0) FROM pg_index "
+                "WHERE indrelid = %s::regclass OR indrelid IN (SELECT relid FROM pg_partition_tree(%s))",
+                (f"{SCHEMA}.{table}",) * 2)
+    size = int(cur.fetchone()[0])
+    cur.close()
+    conn.rollback()
+    return size
+
+
+def summarize(latencies: List[float]) -> Dict:
+    ordered = sorted(latencies)
+    return {
+        "median": statistics.median(ordered),
+        "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Insert and read latency, plain vs hash-partitioned vote table")
+    parser.add_argument("--db", default="host=localhost port=5432 dbname=pollsdb user=postgres password=postgres",
+                        help="libpq connection string of the primary database")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000_000, 100_000_000],
+                        help="Table sizes (votes) to measure at")
+    parser.add_argument("--polls", type=int, default=100_000, help="Polls the votes are spread over")
+    parser.add_argument("--partitions", type=int, default=16, help="Hash partitions")
+    parser.add_argument("--samples", type=int, default=200, help="Timed statements per measurement")
+    parser.add_argument("--batch", type=int, default=100, help="Votes per timed insert transaction")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    print("🚀 Starting Partitioned vs Plain Vote Table Benchmark")
+    print(f"📈 Sizes: {args.sizes}, {args.polls} polls, {args.partitions} partitions")
+    print()
+
+    conn = psycopg2.connect(args.db)
+    create_tables(conn, args.partitions)
+    all_results = []
+    seeded = 0
+    try:
+        for size in sorted(args.sizes):
+            for layout in LAYOUTS:
+                print(f"🌱 Seeding {layout} to {size} votes...")
+                seed_votes(conn, layout, args.polls, seeded, size)
+            seeded = size
+            uuids = poll_uuids(conn, args.polls, args.samples)
+            for layout in LAYOUTS:
+                single = summarize(time_inserts(conn, layout, uuids, 1, f"single_{size}"))
+                batched = summarize(time_inserts(conn, layout, uuids, args.batch, f"batch_{size}"))
+                reads = summarize(time_poll_reads(conn, layout, uuids))
+                result = {
+                    "size": size,
+                    "layout": layout,
+                    "insert_median_latency": single["median"],
+                    "insert_p99_latency": single["p99"],
+                    "batch_insert_median_latency": batched["median"],
+                    "batch_insert_p99_latency": batched["p99"],
+                    "poll_read_median_latency": reads["median"],
+                    "poll_read_p99_latency": reads["p99"],
+                    "vacuum_unit_seconds": time_vacuum(conn, layout),
+                    "index_bytes": index_bytes(conn, layout),
+                }
+                all_results.append(result)
+                print(f"  {size} votes, {layout}: insert p99 {single['p99']*1000:.2f}ms, "
+                      f"batch p99 {batched['p99']*1000:.2f}ms, poll read p99 {reads['p99']*1000:.2f}ms")
+            print()
+    finally:
+        if not args.keep:
+            cur = conn.cursor()
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            conn.commit()
+        conn.close()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = f"vote_partition_{timestamp}.json"
+    with open(results_file, 'w') as f:
+        json.dump(all_results, f, indent=2)
+    print(f"💾 Results saved to: {results_file}")
+
+    print(f"\n📊 Vote table layout ({args.partitions} partitions, {args.batch}-vote batches):")
+    print("| Votes | Layout | Insert p99 (ms) | Batch Median (ms) | Batch p99 (ms) | Poll Read p99 (ms) | Vacuum Unit (s) | Index (MB) |")
+    print("|-------|--------|-----------------|-------------------|----------------|--------------------|-----------------|------------|")
+    for r in all_results:
+        print(f"| {r['size']} | {r['layout']} | {r['insert_p99_latency']*1000:.2f} "
+              f"| {r['batch_insert_median_latency']*1000:.2f} | {r['batch_insert_p99_latency']*1000:.2f} "
+              f"| {r['poll_read_p99_latency']*1000:.2f} | {r['vacuum_unit_seconds']:.2f} "
+              f"| {r['index_bytes'] / 1024 / 1024:.0f} |")
+
+
+if __name__ == "__main__":
+    main()
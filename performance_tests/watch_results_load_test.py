@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+WatchPollResults Load Test
+Opens thousands of concurrent WatchPollResults streams on one poll, casts
+votes against it and measures how fast the tallies reach every watcher
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import sys
+import os
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import grpc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'microservice_rpc', 'app'))
+
+try:
+    import polling_pb2
+    import polling_pb2_grpc
+except ImportError:
+    print("❌ Error: gRPC protobuf files not found.")
+    print("Run this from the performance_tests directory.")
+    sys.exit(1)
+
+OPTIONS = ["Python", "JavaScript", "TypeScript", "Go"]
+## nginx allows 128 concurrent streams per HTTP/2 connection, stay below it
+STREAMS_PER_CHANNEL = 100
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class Watcher:
+    """One WatchPollResults stream; merges the partial updates into full tallies"""
+
+    def __init__(self, stub, poll_uuid: str, ack_times: List[float]):
+        self.stub = stub
+        self.poll_uuid = poll_uuid
+        self.ack_times = ack_times
+        self.tallies: Dict[str, int] = {}
+        self.messages = 0
+        self.first_message_at = None
+        self.update_latencies: List[float] = []
+        self.completed = False
+        self.error = None
+
+    async def run(self, started: float):
+        try:
+            async for update in self.stub.WatchPollResults(polling_pb2.PollRequest(uuid=self.poll_uuid)):
+                now = time.perf_counter()
+                self.messages += 1
+                self.tallies.update(update.results)
+                if self.first_message_at is None:
+                    self.first_message_at = now - started
+                    continue
+                ## latency from the moment the newest counted vote was acknowledged
+                total = sum(self.tallies.values())
+                if 0 < total <= len(self.ack_times):
+                    self.update_latencies.append(now - self.ack_times[total - 1])
+            self.completed = True
+        except grpc.aio.AioRpcError as e:
+            self.error = e.code().name
+
+
+async def cast_votes(vote_stub, poll_uuid: str, rate: float, duration: float, ack_times: List[float]) -> int:
+    """Cast votes at `rate` per second for `duration` seconds, recording ack times in order"""
+    interval = 1.0 / rate
+    total = int(rate * duration)
+    start = time.perf_counter()
+
+    async def one_vote(i: int):
+        response = await vote_stub.CastVote(polling_pb2.CastVoteRequest(
+            uuid=poll_uuid, userID=f"watch_load_{i}", select_options=OPTIONS[i % len(OPTIONS)]))
+        if response.status == "Vote Successfully!":
+            ack_times.append(time.perf_counter())
+
+    tasks = []
+    for i in range(total):
+        delay = start + i * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(one_vote(i)))
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return len(ack_times)
+
+
+async def run_test(url: str, num_watchers: int, vote_rate: float, duration: float, connect_rate: float) -> Dict:
+    num_channels = max(1, math.ceil(num_watchers / STREAMS_PER_CHANNEL))
+    ## separate subchannel pools so every channel gets its own connection
+    channels = [grpc.aio.insecure_channel(url, options=[("grpc.use_local_subchannel_pool", 1)])
+                for _ in range(num_channels)]
+    control = grpc.aio.insecure_channel(url)
+    poll_stub = polling_pb2_grpc.PollServiceStub(control)
+    vote_stub = polling_pb2_grpc.VoteServiceStub(control)
+    result_stub = polling_pb2_grpc.ResultServiceStub(control)
+
+    poll = await poll_stub.CreatePoll(polling_pb2.CreatePollRequest(
+        poll_questions=f"Watch Load Test Poll - {num_watchers} watchers", options=OPTIONS))
+    print(f"✅ Test poll created with UUID: {poll.uuid}")
+
+    ack_times: List[float] = []
+    watchers = [Watcher(polling_pb2_grpc.ResultServiceStub(channels[i % num_channels]), poll.uuid, ack_times)
+                for i in range(num_watchers)]
+    started = time.perf_counter()
+    watch_tasks = []
+    for i, watcher in enumerate(watchers):
+        watch_tasks.append(asyncio.ensure_future(watcher.run(time.perf_counter())))
+        if connect_rate and (i + 1) % STREAMS_PER_CHANNEL == 0:
+            await asyncio.sleep(STREAMS_PER_CHANNEL / connect_rate)
+
+    ## wait until every watcher holds its snapshot (or failed) before voting
+    while any(w.first_message_at is None and w.error is None for w in watchers):
+        await asyncio.sleep(0.05)
+    subscribed = time.perf_counter() - started
+    print(f"👀 {num_watchers} watchers subscribed in {subscribed:.2f}s")
+
+    votes = await cast_votes(vote_stub, poll.uuid, vote_rate, duration, ack_times)
+    print(f"🗳️  {votes} votes cast")
+
+    expected = dict((await result_stub.GetPollResults(polling_pb2.PollRequest(uuid=poll.uuid))).results)
+    convergence_start = time.perf_counter()
+    while any(w.error is None and w.tallies != expected for w in watchers):
+        if time.perf_counter() - convergence_start > 30:
+            break
+        await asyncio.sleep(0.01)
+    convergence = time.perf_counter() - convergence_start
+
+    ## closing the poll ends every stream after its final tallies
+    await poll_stub.ClosePoll(polling_pb2.PollRequest(uuid=poll.uuid))
+    await asyncio.wait(watch_tasks, timeout=30)
+
+    for channel in channels:
+        await channel.close()
+    await control.close()
+
+    snapshot_times = [w.first_message_at for w in watchers if w.first_message_at is not None]
+    latencies = [l for w in watchers for l in w.update_latencies]
+    errors: Dict[str, int] = {}
+    for w in watchers:
+        if w.error:
+            errors[w.error] = errors.get(w.error, 0) + 1
+
+    return {
+        "num_watchers": num_watchers,
+        "vote_rate": vote_rate,
+        "votes": votes,
+        "snapshot_median": statistics.median(snapshot_times) if snapshot_times else 0.0,
+        "snapshot_p99": percentile(snapshot_times, 0.99),
+        "update_median_latency": statistics.median(latencies) if latencies else 0.0,
+        "update_p99_latency": percentile(latencies, 0.99),
+        "messages_per_watcher": statistics.mean(w.messages for w in watchers),
+        "converged": sum(1 for w in watchers if w.tallies == expected),
+        "convergence_time": convergence,
+        "completed": sum(1 for w in watchers if w.completed),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Many concurrent WatchPollResults streams on one poll")
+    parser.add_argument("--url", default="localhost:8080", help="gRPC server URL")
+    parser.add_argument("--watchers", nargs="+", type=int, default=[100, 1000, 2000, 5000],
+                        help="Number of concurrent watchers to test")
+    parser.add_argument("--vote-rate", type=float, default=200, help="Votes per second while watching")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of voting per run")
+    parser.add_argument("--connect-rate", type=float, default=0,
+                        help="New watchers opened per second (0 opens them all at once)")
+    args = parser.parse_args()
+
+    print("🚀 Starting WatchPollResults Load Test")
+    print(f"👥 Watcher counts: {args.watchers}")
+    print()
+
+    all_results = []
+    for num_watchers in args.watchers:
+        result = asyncio.run(run_test(args.url, num_watchers, args.vote_rate, args.duration, args.connect_rate))
+        all_results.append(result)
+        print(f"  Watchers: {num_watchers}, update median: {result['update_median_latency']*1000:.2f}ms, "
+              f"p99: {result['update_p99_latency']*1000:.2f}ms, converged: {result['converged']}/{num_watchers}, "
+              f"errors: {result['errors'] or 'none'}")
+        print()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = f"watch_results_load_{timestamp}.json"
+    with open(results_file, 'w') as f:
+        json.dump(all_results, f, indent=2)
+    print(f"💾 Results saved to: {results_file}")
+
+    print(f"\n📊 WatchPollResults fan-out:")
+    print("| Watchers | Snapshot p99 (ms) | Update Median (ms) | Update p99 (ms) | Msgs/Watcher | Converged | Completed |")
+    print("|----------|-------------------|--------------------|-----------------|--------------|-----------|-----------|")
+    for r in all_results:
+        print(f"| {r['num_watchers']:<8} | {r['snapshot_p99']*1000:<17.2f} | {r['update_median_latency']*1000:<18.2f} "
+              f"| {r['update_p99_latency']*1000:<15.2f} | {r['messages_per_watcher']:<12.1f} "
+              f"| {r['converged']:<9} | {r['completed']:<9} |")
+
+
+if __name__ == "__main__":
+    main()